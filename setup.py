@@ -22,6 +22,7 @@ entry_points = {
         "nti_follow_entity = nti.dataserver.utils.nti_follow_entity:main",
         "nti_remove_user = nti.dataserver.utils.nti_remove_user:main",
         "nti_export_entities = nti.dataserver.utils.nti_export_entities:main",
+        "nti_compact_stream_caches = nti.dataserver.utils.nti_compact_stream_caches:main",
         # NOTE: The command line tools are deprecated. Leave the setup.py entry points
         # pointing to this package to get the deprecation notice
         'nti_bounced_email_batch = nti.appserver.bounced_email_workflow:process_sqs_messages',
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the Amazon SES client, for exercising and
+benchmarking the bulk email process loop without sending email.
+
+Assign an instance to the ``client`` attribute of a process before
+running it::
+
+    process.client = FakeSESClient(latency=0.05)
+    process.process_loop()
+    print(process.client.throughput)
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import uuid
+import collections
+
+from botocore.exceptions import ClientError
+
+from gevent import sleep
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class FakeSESClient(object):
+    """
+    Implements the ``send_raw_email`` and ``get_send_quota`` methods
+    of a boto3 SES client. Each send takes ``latency`` seconds
+    (cooperatively, so concurrent sends overlap). Like SES, sending
+    more than ``max_send_rate`` emails in one second fails with a
+    throttling :class:`~botocore.exceptions.ClientError`, as does
+    sending more than ``max_24_hour_send``.
+    """
+
+    def __init__(self, latency=0.0, max_send_rate=14.0, max_24_hour_send=50000.0):
+        self.latency = latency
+        self.max_send_rate = max_send_rate
+        self.max_24_hour_send = max_24_hour_send
+        self.sent = []
+        self.first_send_time = None
+        self.last_send_time = None
+        self._recent = collections.deque()
+
+    def get_send_quota(self):
+        return {u'Max24HourSend': self.max_24_hour_send,
+                u'MaxSendRate': self.max_send_rate,
+                u'SentLast24Hours': float(len(self.sent))}
+
+    def _throttle(self, message):
+        raise ClientError({'Error': {'Code': 'Throttling', 'Message': message}},
+                          'SendRawEmail')
+
+    def send_raw_email(self, RawMessage, Source, Destinations):
+        now = time.time()
+        recent = self._recent
+        while recent and recent[0] <= now - 1:
+            recent.popleft()
+        if len(recent) >= self.max_send_rate:
+            self._throttle('Maximum sending rate exceeded.')
+        if len(self.sent) >= self.max_24_hour_send:
+            self._throttle('Daily message quota exceeded.')
+        recent.append(now)
+
+        if self.latency:
+            sleep(self.latency)
+
+        self.sent.append((Source, Destinations, RawMessage['Data']))
+        if self.first_send_time is None:
+            self.first_send_time = now
+        self.last_send_time = time.time()
+        return {'MessageId': str(uuid.uuid4()),
+                'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+    @property
+    def throughput(self):
+        """
+        The emails sent per second, from the start of the first send
+        to the end of the last.
+        """
+        if not self.sent:
+            return 0.0
+        elapsed = self.last_send_time - self.first_send_time
+        return len(self.sent) / elapsed if elapsed else float('inf')
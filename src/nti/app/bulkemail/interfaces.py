@@ -159,3 +159,27 @@ class IBulkEmailProcessDelegate(interface.Interface):
         :meth:`collect_recipients`, return the subject line
         to use.
         """
+
+
+class IBulkEmailChunkedProcessDelegate(IBulkEmailProcessDelegate):
+    """
+    A delegate that can divide collecting its recipients into
+    independent chunks, each of which may be collected in its own
+    (short) transaction, possibly by a different process.
+    """
+
+    def collect_recipient_chunks():
+        """
+        Return a sequence of chunks, possibly a generator.
+
+        Each chunk is a pickle-able value describing a portion of
+        the recipients (for example, a list of user intids); it
+        should be cheap to compute.
+        """
+
+    def collect_recipients_for_chunk(chunk):
+        """
+        Return a sequence of the recipients described by a chunk
+        previously produced by :meth:`collect_recipient_chunks`, as for
+        :meth:`collect_recipients`.
+        """
@@ -21,6 +21,8 @@ import boto3
 from botocore.exceptions import BotoCoreError
 from botocore.exceptions import ClientError
 
+from gevent.pool import Pool
+
 from zope import component
 from zope import interface
 
@@ -42,6 +44,7 @@ from .interfaces import PreflightError
 from .interfaces import IBulkEmailProcessLoop
 from .interfaces import IBulkEmailProcessMetadata
 from .interfaces import IBulkEmailProcessDelegate
+from .interfaces import IBulkEmailChunkedProcessDelegate
 
 #: The redis lifetime of the objects used during the sending
 #: process. Should be long enough for the process to complete,
@@ -75,6 +78,10 @@ class _ProcessNames(object):
 		self.metadata_name = base + '/MetaData'
 		self.source_name = base + '/SourceSet'
 		self.dest_name = base + '/ResultSet'
+		self.in_flight_name = base + '/InFlightSet'
+		self.chunk_lock_name = base + '/ChunkLock'
+		self.chunks_name = base + '/ChunkQueue'
+		self.claimed_chunks_name = base + '/ClaimedChunks'
 		self.names = list(self.__dict__.values())
 
 @interface.implementer(IBulkEmailProcessMetadata)
@@ -112,6 +119,29 @@ class DefaultBulkEmailProcessLoop(object):
 	#: instances and being sure that we can finish the processing
 	lock_timeout = 60 * 10 # ten minutes
 
+	#: The amount of time a process may spend collecting one chunk
+	#: of recipients (see :class:`.IBulkEmailChunkedProcessDelegate`)
+	#: before we assume it died and let another process collect it.
+	chunk_claim_timeout = 60 * 10 # ten minutes
+
+	#: How long the sending loop waits for other processes
+	#: that are still collecting recipients.
+	collection_poll_interval = 5
+
+	#: If greater than zero, :meth:`process_loop` claims this many
+	#: recipients at a time and sends to them concurrently (see
+	#: :meth:`process_one_batch`) instead of one at a time.
+	pipeline_batch_size = 0
+
+	#: The number of greenlets rendering and sending the emails
+	#: of one batch.
+	pipeline_concurrency = 5
+
+	#: :meth:`process_one_batch` holds the lock while it sends, so
+	#: a batch shouldn't take much longer than this many seconds
+	#: at the average rate the :attr:`throttle` allows.
+	pipeline_batch_seconds = 60
+
 	#: If set to true, then we will include the current site name (if any)
 	#: in the process names in redis. This is useful if the process
 	#: needs to run for each site hosted in the same database.
@@ -156,7 +186,12 @@ class DefaultBulkEmailProcessLoop(object):
 		return self.redis.scard( self.names.dest_name )
 	@property
 	def remaining_count(self):
-		return self.redis.scard( self.names.source_name )
+		return self.redis.scard( self.names.source_name ) \
+			 + self.redis.scard( self.names.in_flight_name )
+	@property
+	def remaining_chunk_count(self):
+		return self.redis.llen( self.names.chunks_name ) \
+			 + self.redis.hlen( self.names.claimed_chunks_name )
 
 	def preflight_process(self):
 		"""
@@ -202,6 +237,18 @@ class DefaultBulkEmailProcessLoop(object):
 		fill_rate = (val/3)
 		return PersistentTokenBucket( burst_rate, fill_rate=fill_rate )
 
+	@property
+	def max_pipeline_batch_size(self):
+		"""
+		The largest :attr:`pipeline_batch_size` worth using: what the
+		:attr:`throttle` lets us send in :attr:`pipeline_batch_seconds`,
+		in whole rounds of the :attr:`pipeline_concurrency` pool.
+		"""
+		throttle = self.throttle
+		size = int(throttle.capacity + throttle.fill_rate * self.pipeline_batch_seconds)
+		concurrency = self.pipeline_concurrency
+		return max(size - size % concurrency, concurrency)
+
 	@Lazy
 	def max_send_rate(self):
 		try:
@@ -244,26 +291,127 @@ class DefaultBulkEmailProcessLoop(object):
 		self.metadata.status = 'Started'
 		self.metadata.save()
 
-		count = self.add_recipients( self.delegate.collect_recipients() )
-		logger.info( "Collected %d recipients", count )
-
-	def add_recipients( self, recipient_data ):
-		"""
-		Save the given recipient data, validating each one.
-		"""
-
+		delegate = self.delegate
+		if IBulkEmailChunkedProcessDelegate.providedBy( delegate ):
+			# The recipients are collected by collect_loop
+			count = self.add_recipient_chunks( delegate.collect_recipient_chunks() )
+			logger.info( "Queued %d chunks of recipients", count )
+		else:
+			count = self.add_recipients( delegate.collect_recipients() )
+			logger.info( "Collected %d recipients", count )
+
+	def _dump_recipients( self, recipient_data ):
 		values = []
 		for recipient in recipient_data:
 			if 'email' not in recipient or not recipient['email']:
 				raise ValueError('missing email')
 			values.append( zlib.compress( pickle.dumps( recipient, pickle.HIGHEST_PROTOCOL ) ) )
+		return values
 
+	def add_recipients( self, recipient_data ):
+		"""
+		Save the given recipient data, validating each one.
+		"""
+
+		values = self._dump_recipients( recipient_data )
 		if values:
 			self.redis.sadd( self.names.source_name, *values )
 			self.redis.expire( self.names.source_name, _TTL )
 
 		return len(values)
 
+	def add_recipient_chunks( self, chunks ):
+		"""
+		Queue the given chunk descriptions to have their recipients collected.
+		"""
+
+		values = [zlib.compress( pickle.dumps( chunk, pickle.HIGHEST_PROTOCOL ) )
+				  for chunk in chunks]
+		if values:
+			self.redis.rpush( self.names.chunks_name, *values )
+			self.redis.expire( self.names.chunks_name, _TTL )
+
+		return len(values)
+
+	@Lazy
+	def chunk_lock(self):
+		return self.redis.lock( self.names.chunk_lock_name, self.lock_timeout )
+
+	def _claim_chunk( self ):
+		names = self.names
+		with self.chunk_lock:
+			# Give back anything claimed by a process that died
+			# (or is taking far too long).
+			stale_time = time.time() - self.chunk_claim_timeout
+			claimed = self.redis.hgetall( names.claimed_chunks_name ) or {}
+			for member, claim_time in claimed.items():
+				if float(claim_time) < stale_time:
+					logger.warn( "Reclaiming a chunk of recipients for %s", self.__name__ )
+					self.redis.hdel( names.claimed_chunks_name, member )
+					self.redis.rpush( names.chunks_name, member )
+
+			member = self.redis.lpop( names.chunks_name )
+			if member is not None:
+				self.redis.hset( names.claimed_chunks_name, member, time.time() )
+				self.redis.expire( names.claimed_chunks_name, _TTL )
+			return member
+
+	def _collect_chunk( self, chunk ):
+		return list( self.delegate.collect_recipients_for_chunk( chunk ) )
+
+	def collect_one_chunk( self ):
+		"""
+		Generally called outside of a transaction to collect the
+		recipients of one chunk queued by :meth:`initialize`. Any
+		number of processes may do this at the same time.
+
+		The recipients are saved, and the chunk marked as done, in a
+		single Redis transaction. If we die before then, the chunk
+		is collected again (by any process) once its claim times out.
+
+		:return: ``None`` if there are no more chunks to claim. Otherwise,
+			the number of recipients collected.
+		"""
+
+		member = self._claim_chunk()
+		if member is None:
+			return None
+
+		chunk = pickle.loads( zlib.decompress( member ) )
+		values = self._dump_recipients( self._collect_chunk( chunk ) )
+
+		pipe = self.redis.pipeline()
+		if values:
+			pipe.sadd( self.names.source_name, *values )
+			pipe.expire( self.names.source_name, _TTL )
+		pipe.hdel( self.names.claimed_chunks_name, member )
+		pipe.execute()
+		return len(values)
+
+	def collect_loop( self ):
+		"""
+		Collect recipients, one chunk at a time, until there are no more
+		chunks to claim. This may be run in several processes at once to
+		collect in parallel. Generally called outside of a transaction.
+
+		:return: Whether we finished without errors.
+		"""
+
+		count = 0
+		while True:
+			try:
+				result = self.collect_one_chunk()
+			except Exception as e:
+				logger.exception( "Failed to collect recipients" )
+				self.handle_abort( e )
+				return False
+			if result is None:
+				break
+			count += result
+
+		logger.info( "Collected %d recipients for %s", count, self.__name__ )
+		return True
+
 	def process_one_recipient( self ):
 		"""
 		Generally called outside of a transaction to send an email.
@@ -280,7 +428,6 @@ class DefaultBulkEmailProcessLoop(object):
 			the (true-ish) value of sending the email.
 		"""
 
-		delegate = self.delegate
 		with self.lock:
 			member = self.redis.srandmember( self.names.source_name )
 			if member is None:
@@ -289,36 +436,12 @@ class DefaultBulkEmailProcessLoop(object):
 
 			recipient_data = pickle.loads(zlib.decompress(member))
 
-			fromaddr = delegate.compute_fromaddr_for_recipient( recipient_data )
-			sender = delegate.compute_sender_for_recipient( recipient_data )
-
-			# Probably if there were `template_args` and this method
-			# returns None, we should not send to this client: something
-			# changed behind our back. We should record a failure and keep going
-			template_args = delegate.compute_template_args_for_recipient(recipient_data)
-
 			result = {'SendEmailResult': 'Not sent'}
-			if sender is not None and template_args is not None:
-				pmail_msg = self.mailer.create_simple_html_text_email(
-					self.delegate.template_name,
-					subject=delegate.compute_subject_for_recipient(recipient_data),
-					request=self.request,
-					recipients=[recipient_data['email']],
-					template_args=template_args,
-					text_template_extension=delegate.text_template_extension)
-
-				pmail_msg.sender = fromaddr
-				mail_msg = pmail_msg.to_message()
-				msg_string = mail_msg.as_string()
-
+			message = self._prepare_message( recipient_data )
+			if message is not None:
 				# Now send the email. This might raise SESError or its subclasses. If it does,
 				# sending failed and we exit, having left the recipient still on the source list.
-				result = self.client.send_raw_email(
-					RawMessage={
-						'Data': msg_string
-					},
-					Source=sender,
-					Destinations=[pmail_msg.recipients[0]])
+				result = self._send_message( message )
 
 				# Result will be something like:
 				# { 'ResponseMetadata': {'RetryAttempts': 0, 'HTTPStatusCode': 200,
@@ -331,14 +454,140 @@ class DefaultBulkEmailProcessLoop(object):
 
 			# Record the result and remove the need to send again
 			self.redis.srem( self.names.source_name, member )
-			recipient_data.pop('template_args', None) # no need to repickle this
-			recipient_data['boto.ses.result'] = result
-			self.redis.sadd( self.names.dest_name, pickle.dumps( recipient_data,
-																 pickle.HIGHEST_PROTOCOL ) )
+			self.redis.sadd( self.names.dest_name, self._dump_result( recipient_data, result ) )
 			self.redis.expire( self.names.dest_name, _TTL )
 
 			return result
 
+	def _prepare_message( self, recipient_data ):
+		"""
+		Render the email for the recipient.
+
+		:return: A tuple ``(sender, destination, message_string)``,
+			or ``None`` if nothing should be sent.
+		"""
+		delegate = self.delegate
+		fromaddr = delegate.compute_fromaddr_for_recipient( recipient_data )
+		sender = delegate.compute_sender_for_recipient( recipient_data )
+
+		# Probably if there were `template_args` and this method
+		# returns None, we should not send to this client: something
+		# changed behind our back. We should record a failure and keep going
+		template_args = delegate.compute_template_args_for_recipient(recipient_data)
+		if sender is None or template_args is None:
+			return None
+
+		pmail_msg = self.mailer.create_simple_html_text_email(
+			delegate.template_name,
+			subject=delegate.compute_subject_for_recipient(recipient_data),
+			request=self.request,
+			recipients=[recipient_data['email']],
+			template_args=template_args,
+			text_template_extension=delegate.text_template_extension)
+
+		pmail_msg.sender = fromaddr
+		mail_msg = pmail_msg.to_message()
+		return sender, pmail_msg.recipients[0], mail_msg.as_string()
+
+	def _send_message( self, message ):
+		sender, destination, msg_string = message
+		return self.client.send_raw_email(
+			RawMessage={
+				'Data': msg_string
+			},
+			Source=sender,
+			Destinations=[destination])
+
+	def _dump_result( self, recipient_data, result ):
+		recipient_data.pop('template_args', None) # no need to repickle this
+		recipient_data['boto.ses.result'] = result
+		return pickle.dumps( recipient_data, pickle.HIGHEST_PROTOCOL )
+
+	def _claim_batch( self ):
+		names = self.names
+		pipe = self.redis.pipeline()
+		# We hold the lock, so anything still in flight was
+		# claimed by a process that died; send it again.
+		pipe.sunionstore( names.source_name, names.source_name, names.in_flight_name )
+		pipe.delete( names.in_flight_name )
+		pipe.expire( names.source_name, _TTL )
+		pipe.spop( names.source_name, self.pipeline_batch_size )
+		members = pipe.execute()[-1]
+		if members:
+			self.redis.sadd( names.in_flight_name, *members )
+			self.redis.expire( names.in_flight_name, _TTL )
+		return members
+
+	def _prepare_pipelined_message( self, recipient_data ):
+		# Subclasses that need a transaction to render establish
+		# it here. We send outside of it.
+		return self._prepare_message( recipient_data )
+
+	def _pipelined_send( self, member ):
+		recipient_data = pickle.loads(zlib.decompress(member))
+		result = {'SendEmailResult': 'Not sent'}
+		message = self._prepare_pipelined_message( recipient_data )
+		if message is not None:
+			result = self._send_message( message )
+		return recipient_data, result
+
+	def process_one_batch( self ):
+		"""
+		Like :meth:`process_one_recipient`, but for up to
+		:attr:`pipeline_batch_size` recipients at once. A pool of
+		:attr:`pipeline_concurrency` greenlets renders and sends the
+		emails as fast as the :attr:`throttle` allows, and the results
+		are recorded in one Redis transaction.
+
+		If sending any email fails, no more are started, the recipients
+		not sent go back to the source set, and the (first) error is
+		raised once the others are recorded.
+
+		:return: ``None`` if there are no more recipients. Otherwise,
+			the list of results of sending the emails.
+		"""
+
+		errors = []
+		def send(member):
+			try:
+				return self._pipelined_send( member )
+			except Exception as e: # pylint:disable=broad-except
+				errors.append( e )
+
+		with self.lock:
+			members = self._claim_batch()
+			if not members:
+				return None
+
+			pool = Pool( self.pipeline_concurrency )
+			greenlets = []
+			for member in members:
+				self.throttle.wait_for_token()
+				if errors:
+					break
+				greenlets.append( pool.spawn( send, member ) )
+			pool.join()
+
+			names = self.names
+			results = []
+			pipe = self.redis.pipeline()
+			for i, member in enumerate( members ):
+				sent = greenlets[i].value if i < len(greenlets) else None
+				if sent is None:
+					pipe.sadd( names.source_name, member )
+				else:
+					recipient_data, result = sent
+					results.append( result )
+					pipe.sadd( names.dest_name, self._dump_result( recipient_data, result ) )
+			pipe.srem( names.in_flight_name, *members )
+			pipe.expire( names.source_name, _TTL )
+			pipe.expire( names.dest_name, _TTL )
+			pipe.execute()
+
+		if errors:
+			raise errors[0]
+		return results
+
 	def process_loop( self ):
 		"""
 		Generally called outside of a transaction to send all the emails.
@@ -353,10 +602,18 @@ class DefaultBulkEmailProcessLoop(object):
 		"""
 		assert self.metadata.status != 'Completed'
 
+		# Collect any chunks that are left (or were abandoned)
+		# before sending
+		if not self.collect_loop():
+			return
+
 		while True:
-			self.throttle.wait_for_token()
 			try:
-				result = self.process_one_recipient()
+				if self.pipeline_batch_size > 0:
+					result = self.process_one_batch()
+				else:
+					self.throttle.wait_for_token()
+					result = self.process_one_recipient()
 			except ClientError as e:  #pragma: no cover
 				error = e.response.get('Error')
 				code = error.get('Code') if error is not None else None
@@ -388,6 +645,13 @@ class DefaultBulkEmailProcessLoop(object):
 				return
 
 			if not result:
+				if self.remaining_chunk_count:
+					# Someone else is still collecting, or died
+					# doing so; wait for them (or to take over)
+					sleep( self.collection_poll_interval )
+					if not self.collect_loop():
+						return
+					continue
 				break
 
 		num_sent = self.redis.scard( self.names.dest_name )
@@ -422,6 +686,8 @@ class SiteTransactedBulkEmailProcessLoop(DefaultBulkEmailProcessLoop):
 		super(SiteTransactedBulkEmailProcessLoop,self).__init__(request)
 		self.possible_site_names = request.possible_site_names
 		self._super_process_one_recipient = super(SiteTransactedBulkEmailProcessLoop,self).process_one_recipient
+		self._super_collect_chunk = super(SiteTransactedBulkEmailProcessLoop,self)._collect_chunk
+		self._super_prepare_message = super(SiteTransactedBulkEmailProcessLoop,self)._prepare_message
 
 	@Lazy
 	def _runner(self):
@@ -432,3 +698,17 @@ class SiteTransactedBulkEmailProcessLoop(DefaultBulkEmailProcessLoop):
 							site_names=self.possible_site_names,
 							job_name=text_(self.__name__),
 							side_effect_free=True)
+
+	def _collect_chunk(self, chunk):
+		# Collecting may update the recipients, so this is not
+		# side-effect free
+		return self._runner(lambda: self._super_collect_chunk(chunk),
+							site_names=self.possible_site_names,
+							job_name=text_(self.__name__))
+
+	def _prepare_pipelined_message(self, recipient_data):
+		# Each greenlet of the pool gets its own transaction.
+		return self._runner(lambda: self._super_prepare_message(recipient_data),
+							site_names=self.possible_site_names,
+							job_name=text_(self.__name__),
+							side_effect_free=True)
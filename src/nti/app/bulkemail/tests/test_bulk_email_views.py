@@ -30,6 +30,7 @@ from hamcrest import assert_that
 from hamcrest import is_
 from hamcrest import is_not as does_not
 from hamcrest import has_key
+from hamcrest import has_length
 from hamcrest import contains_string
 from hamcrest import has_property
 
@@ -41,6 +42,8 @@ from ..process import SiteTransactedBulkEmailProcessLoop
 from ..process import PreflightError
 from ..process import _RedisProcessMetaData as _ProcessMetaData
 from ..delegate import AbstractBulkEmailProcessDelegate
+from ..fake_ses import FakeSESClient
+from ..interfaces import IBulkEmailChunkedProcessDelegate
 
 from zope.security.interfaces import IPrincipal
 from nti.mailer.interfaces import IEmailAddressable
@@ -74,6 +77,15 @@ class Process(SiteTransactedBulkEmailProcessLoop,
 		result['context'] = self
 		return result
 
+@interface.implementer(IBulkEmailChunkedProcessDelegate)
+class ChunkedProcess(Process):
+
+	def collect_recipient_chunks(self):
+		return [['foo@bar', 'biz@baz'], ['baz@foo']]
+
+	def collect_recipients_for_chunk(self, chunk):
+		return [{'email': x} for x in chunk]
+
 @interface.implementer(IEmailAddressable,
 					   IPrincipal)
 class Recipient(object):
@@ -123,6 +135,30 @@ class TestBulkEmailProcess(ApplicationLayerTest):
 		process.add_recipients( [{'email': 'foo@bar'}, {'email': 'biz@baz'}] )
 		assert_that( process.redis.scard(process.names.source_name), is_( 2 ) )
 
+	@WithSharedApplicationMockDS
+	def test_collect_chunks(self):
+		process = ChunkedProcess(self.beginRequest())
+		process.preflight_process()
+
+		assert_that( process.add_recipient_chunks( process.collect_recipient_chunks() ), is_( 2 ) )
+		assert_that( process.remaining_chunk_count, is_( 2 ) )
+
+		assert_that( process.collect_one_chunk(), is_( 2 ) )
+		assert_that( process.redis.scard(process.names.source_name), is_( 2 ) )
+		assert_that( process.remaining_chunk_count, is_( 1 ) )
+
+		# A process that claimed a chunk and died...
+		member = process._claim_chunk()
+		assert_that( process.remaining_chunk_count, is_( 1 ) )
+		assert_that( process.collect_one_chunk(), is_( None ) )
+		# ...eventually has its chunk collected by someone else
+		process.redis.hset( process.names.claimed_chunks_name, member, 0 )
+		assert_that( process.collect_one_chunk(), is_( 1 ) )
+		assert_that( process.redis.scard(process.names.source_name), is_( 3 ) )
+		assert_that( process.remaining_chunk_count, is_( 0 ) )
+
+		assert_that( process.collect_loop(), is_( True ) )
+
 	def _test_process_one_recipient(self, fake_secret, expected_sender):
 		process = Process(self.beginRequest())
 		process.subject = 'Subject'
@@ -257,6 +293,53 @@ class TestBulkEmailProcess(ApplicationLayerTest):
 		fresh_metadata = _ProcessMetaData( process.redis, process.names.metadata_name )
 		assert_that( fresh_metadata, has_property( 'status', 'Completed' ) )
 
+	@WithSharedApplicationMockDS
+	@fudge.patch('nti.mailer._verp._get_signer_secret')
+	def test_process_loop_pipelined(self, fake_secret):
+		fake_secret.is_callable().returns('abc123')
+
+		process = Process(self.beginRequest())
+		process.subject = 'Subject'
+		process.pipeline_batch_size = 3
+		process.client = FakeSESClient()
+
+		process.add_recipients( [{'email': Recipient('%s@bar' % i)} for i in range(5)] )
+
+		process.process_loop()
+
+		assert_that( process.client.sent, has_length( 5 ) )
+		assert_that( process.remaining_count, is_( 0 ) )
+		assert_that( process.redis.scard(process.names.dest_name), is_( 5 ) )
+
+		fresh_metadata = _ProcessMetaData( process.redis, process.names.metadata_name )
+		assert_that( fresh_metadata, has_property( 'status', 'Completed' ) )
+
+	@WithSharedApplicationMockDS
+	@fudge.patch('nti.mailer._verp._get_signer_secret')
+	def test_process_one_batch_failure(self, fake_secret):
+		fake_secret.is_callable().returns('abc123')
+
+		process = Process(self.beginRequest())
+		process.subject = 'Subject'
+		process.pipeline_batch_size = 3
+		process.pipeline_concurrency = 1
+		process.client = FakeSESClient(max_24_hour_send=0)
+
+		process.add_recipients( [{'email': Recipient('%s@bar' % i)} for i in range(5)] )
+
+		assert_that( calling(process.process_one_batch), raises(ClientError) )
+		# Nothing was lost
+		assert_that( process.redis.scard(process.names.source_name), is_( 5 ) )
+		assert_that( process.redis.scard(process.names.in_flight_name), is_( 0 ) )
+		assert_that( process.redis.scard(process.names.dest_name), is_( 0 ) )
+
+		# If we die holding a batch, it is sent by the next process
+		process.pipeline_batch_size = 2
+		process._claim_batch()
+		assert_that( process.redis.scard(process.names.in_flight_name), is_( 2 ) )
+		process.pipeline_batch_size = 5
+		assert_that( process._claim_batch(), has_length( 5 ) )
+
 	@WithSharedApplicationMockDS
 	@fudge.test
 	def test_process_loop_invalid_throttle_exc(self):
@@ -376,6 +459,29 @@ class TestBulkEmailProcess(ApplicationLayerTest):
 		finally:
 			transaction.manager = old_manager
 
+	@WithSharedApplicationMockDS(users=True,testapp=True)
+	@fudge.patch('boto3.session.Session')
+	def test_application_bad_pipeline_batch_size(self, fake_session_factory):
+		session = fake_session_factory.is_callable().returns_fake(name='Session')
+		client_factory = session.provides('client').with_args('ses')
+		(client_factory.returns_fake()
+		 .provides('get_send_quota').returns( SEND_QUOTA ))
+
+		res = self.testapp.get( '/dataserver2/@@bulk_email_admin/failed_username_recovery_email' )
+		# A send rate of 14 sends about 286 in a minute
+		assert_that( res.body, contains_string( 'At most 285' ) )
+
+		for size in ('many', '-1', '286'):
+			res.form['pipeline_batch_size'] = size
+			error = res.form.submit( name='subFormTable.buttons.start', status=400 )
+			assert_that( error.body, contains_string( 'The batch size must be a whole number from 0 to 285.' ) )
+			# Nothing started
+			assert_that( bulk_email_views._BulkEmailView._greenlets, has_length( 0 ) )
+			assert_that( error.body, contains_string( 'Start' ) )
+
+		process = Process(self.beginRequest())
+		assert_that( process.metadata, has_property( 'startTime', 0 ) )
+
 	@WithSharedApplicationMockDS(users=True,testapp=True)
 	def test_application_get_template_dne(self):
 		# Initial condition
@@ -55,6 +55,20 @@ class _Status(object):
 		# to determine if the process loop is running somewhere
 		return self.redis.exists( self.names.lock_name )
 
+def _validated_pipeline_batch_size(process, value):
+	"""
+	Return the requested batch size, or raise :class:`ValueError`
+	with a message to show in the form.
+	"""
+	try:
+		size = int(value)
+	except (TypeError, ValueError):
+		size = -1
+	maximum = process.max_pipeline_batch_size
+	if size < 0 or size > maximum:
+		raise ValueError("The batch size must be a whole number from 0 to %s." % maximum)
+	return size
+
 @view_defaults( route_name='objects.generic.traversal',
 				name='bulk_email_admin',
 				permission=nauth.ACT_NTI_ADMIN,
@@ -105,7 +119,7 @@ class _BulkEmailView(object):
 		self.request.context = status
 		# Use a dict to override the context argument that pyramid
 		# directly inserts
-		return {'context': status}
+		return {'context': status, 'form_error': None}
 
 	@view_config(request_method='POST',
 				 renderer='templates/bulk_email_admin.pt')
@@ -123,6 +137,17 @@ class _BulkEmailView(object):
 		# CPython.
 		request.context = None
 		process = self._preflight()
+		if request.params.get('pipeline_batch_size'):
+			# Send in concurrent batches (see process_one_batch)
+			try:
+				process.pipeline_batch_size = _validated_pipeline_batch_size(process,
+																			 request.params['pipeline_batch_size'])
+			except ValueError as e:
+				# Redisplay the form, doing nothing
+				request.response.status_int = 400
+				status = _Status( process )
+				request.context = status
+				return {'context': status, 'form_error': str(e)}
 		if 'subFormTable.buttons.resume' in self.request.POST:
 			process.metadata.status = 'Resumed'
 			process.metadata.save()
@@ -133,6 +158,15 @@ class _BulkEmailView(object):
 		elif 'subFormTable.buttons.initialize' in self.request.POST:
 			# need to collect and then spawn the process
 			process.initialize()
+			if process.remaining_chunk_count:
+				# Chunked collection happens outside this request
+				greenlet = request.nti_gevent_spawn( run=process.collect_loop )
+				_BulkEmailView._greenlets.append( greenlet )
+		elif 'subFormTable.buttons.collect' in self.request.POST:
+			# Help collect the recipients of a chunked process
+			# already initialized (possibly by another worker)
+			greenlet = request.nti_gevent_spawn( run=process.collect_loop )
+			_BulkEmailView._greenlets.append( greenlet )
 		elif 'subFormTable.buttons.start' in self.request.POST:
 			# need to collect and then spawn the process
 			process.initialize()
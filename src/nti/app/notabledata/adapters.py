@@ -8,6 +8,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import time
+import hashlib
+import itertools
 from array import array
 
 from zope import component
@@ -26,8 +29,11 @@ from nti.app.base.abstract_views import AbstractAuthenticatedView
 from nti.app.notabledata.interfaces import IUserNotableData
 from nti.app.notabledata.interfaces import IUserNotableProvider
 from nti.app.notabledata.interfaces import IUserNotableDataStorage
+from nti.app.notabledata.interfaces import IUserNotableIntidIndex
 from nti.app.notabledata.interfaces import IUserNotableSharedWithIDProvider
 
+from nti.app.notabledata.job import queue_notable_intid_index_refresh
+
 from nti.dataserver.authentication import dynamic_memberships_that_participate_in_security
 
 from nti.dataserver.interfaces import IUser
@@ -73,6 +79,91 @@ def SafeResultSet(doc_ids, intids):
 _SafeResultSet = SafeResultSet  # BWC
 
 
+class LazyNotableIntids(object):
+    """
+    The notable intids for a user, some of which (the ``unverified``
+    intids) have not yet had the sharing security check applied.
+
+    Sorting is lazy and only checks as many objects as it takes to
+    produce the requested number of intids. Until everything has been
+    checked, the length is an upper bound; see :attr:`is_approximate`.
+    """
+
+    def __init__(self, catalog, candidates, unverified, verify, _verdicts=None):
+        """
+        :param candidates: An integer set of all the intids that may be notable,
+            including the ``unverified`` intids.
+        :param unverified: An integer set of the intids that must pass
+            the callable ``verify`` to be notable.
+        """
+        self._catalog = catalog
+        self.candidates = candidates
+        self.unverified = unverified
+        self._verify = verify
+        # intid -> verdict, for unverified intids
+        self._verdicts = {} if _verdicts is None else _verdicts
+
+    def _check(self, intid):
+        if intid not in self.unverified:
+            return True
+        try:
+            return self._verdicts[intid]
+        except KeyError:
+            result = self._verdicts[intid] = bool(self._verify(intid))
+            return result
+
+    @property
+    def is_approximate(self):
+        checked = sum(1 for x in self._verdicts if x in self.unverified)
+        return checked < len(self.unverified)
+
+    def __len__(self):
+        rejected = sum(1 for x, verdict in self._verdicts.items()
+                       if not verdict and x in self.unverified)
+        return len(self.candidates) - rejected
+
+    def __contains__(self, intid):
+        return intid in self.candidates and self._check(intid)
+
+    def __iter__(self):
+        return (x for x in self.candidates if self._check(x))
+
+    def with_verified(self, intids):
+        """
+        Return a new object that also includes the given intids,
+        which need no security check.
+        """
+        family = self._catalog.family
+        return type(self)(self._catalog,
+                          family.IF.union(self.candidates, intids),
+                          family.IF.difference(self.unverified, intids),
+                          self._verify,
+                          self._verdicts)
+
+    def exact(self):
+        """
+        Check everything, and return an integer set of the notable intids.
+        """
+        family = self._catalog.family
+        if not self.unverified:
+            return self.candidates
+        rejected = family.IF.LFSet(x for x in self.unverified if not self._check(x))
+        return family.IF.difference(self.candidates, rejected)
+
+    def sort(self, field_name='createdTime', limit=None, reverse=False):
+        """
+        Iterate the notable intids in the order of the catalog index
+        ``field_name``, checking them as we go.
+        """
+        count = 0
+        for intid in self._catalog[field_name].sort(self.candidates, reverse=reverse):
+            if limit is not None and count >= limit:
+                break
+            if self._check(intid):
+                count += 1
+                yield intid
+
+
 @interface.implementer(IUserNotableData)
 @component.adapter(IUser, interface.Interface)
 class UserNotableData(AbstractAuthenticatedView):
@@ -295,6 +386,36 @@ class UserNotableData(AbstractAuthenticatedView):
                 or (self.remoteUser.is_accepting_shared_data_from(creator)
                     and not self.remoteUser.is_muted(questionable_obj)))
 
+    @CachedProperty
+    def _security_check(self):
+        return self.make_sharing_security_check()
+
+    @CachedProperty
+    def _security_verdicts(self):
+        # intid -> whether it passed the sharing security check
+        return {}
+
+    def _is_safely_viewable(self, questionable_uid, apply_user_visibility=False):
+        # Loading objects to check them is the expensive part of
+        # finding notable data, and the same intid may be checked for
+        # several of our sets, so the verdicts are kept for as long as
+        # we are. They aren't persisted: reading must not write, and
+        # access can be granted or taken away without our knowing.
+        questionable_obj = None
+        verdicts = self._security_verdicts
+        try:
+            verdict = verdicts[questionable_uid]
+        except KeyError:
+            questionable_obj = self._intids.queryObject(questionable_uid)
+            verdict = questionable_obj is not None \
+                  and bool(self._security_check(questionable_obj))
+            verdicts[questionable_uid] = verdict
+        if not verdict or not apply_user_visibility:
+            return verdict
+        if questionable_obj is None:
+            questionable_obj = self._intids.queryObject(questionable_uid)
+        return self._is_user_visible(questionable_obj)
+
     def _add_safely_viewable(self,
                              questionable_intids,
                              safely_viewable_intids,
@@ -303,16 +424,10 @@ class UserNotableData(AbstractAuthenticatedView):
         if self._intids_in_time_range is not None:
             questionable_intids = self._intersection(self._intids_in_time_range,
                                                      questionable_intids)
-        uidutil = self._intids
-        security_check = self.make_sharing_security_check()
         for questionable_uid in questionable_intids:
             if questionable_uid in safely_viewable_intids:
                 continue
-            questionable_obj = uidutil.queryObject(questionable_uid)
-            if questionable_obj is not None \
-                    and security_check(questionable_obj) \
-                    and (not apply_user_visibility
-                         or self._is_user_visible(questionable_obj)):
+            if self._is_safely_viewable(questionable_uid, apply_user_visibility):
                 safely_viewable_intids.add(questionable_uid)
 
     def _remove_deleted(self, current_intids):
@@ -335,13 +450,31 @@ class UserNotableData(AbstractAuthenticatedView):
 
         return self._remove_deleted(safely_viewable_intids)
 
+    @CachedProperty('_time_range')
+    def _lazy_notable_intids(self):
+        return self._lazy_non_mention_notable_intids.with_verified(self._mention_notable_intids)
+
     @CachedProperty('_time_range')
     def _notable_intids(self):
-        return self._catalog.family.IF.union(self._non_mention_notable_intids,
-                                             self._mention_notable_intids)
+        return self._lazy_notable_intids.exact()
+
+    @CachedProperty
+    def _tagged_to_usernames_or_intids(self):
+        # Me or my security-aware dynamic memberships
+        result = {self.remoteUser.username}
+        # Note the use of private API, a signal to cleanup soon
+        for membership in dynamic_memberships_that_participate_in_security(self.remoteUser,
+                                                                           as_principals=False):
+            if IDynamicSharingTargetFriendsList.providedBy(membership):
+                result.add(membership.NTIID)
+        return result
 
     @CachedProperty('_time_range')
-    def _non_mention_notable_intids(self):
+    def _non_mention_notable_plan(self):
+        """
+        A tuple of integer sets: the intids that are notable, and the
+        intids that are notable if they pass the sharing security check.
+        """
         # TODO: See about optimizing this query plan. ZCatalog has a
         # CatalogPlanner object that we might could use.
         catalog = self._catalog
@@ -351,15 +484,9 @@ class UserNotableData(AbstractAuthenticatedView):
 
         # Things tagged to me or my security-aware dynamic memberships
         # XXX: This is probably slow? How many unions does this wind up doing?
-        # it definitely slows down over time
-        tagged_to_usernames_or_intids = {self.remoteUser.username}
-        # Note the use of private API, a signal to cleanup soon
-        for membership in dynamic_memberships_that_participate_in_security(self.remoteUser,
-                                                                           as_principals=False):
-            if IDynamicSharingTargetFriendsList.providedBy(membership):
-                tagged_to_usernames_or_intids.add(membership.NTIID)
-
-        query = {'any_of': tagged_to_usernames_or_intids}
+        # it definitely slows down over time, which is why the results
+        # are materialized in our IUserNotableIntidIndex
+        query = {'any_of': self._tagged_to_usernames_or_intids}
         intids_tagged_to_me = catalog[IX_TAGGEDTO].apply(query)
 
         safely_viewable_intids = self._safely_viewable_notable_intids
@@ -390,12 +517,11 @@ class UserNotableData(AbstractAuthenticatedView):
         topic_intids_by_priority_creators = self._intersection(topic_intids,
                                                                intids_by_priority_creators)
 
-        # Sadly, to be able to provide the "TotalItemCount" we have to
-        # apply security to all the intids not guaranteed to be
-        # viewable; if we didn't have to do that we could imagine
-        # doing so incrementally, as needed, on the theory that there
-        # are probably more things shared directly with me or replied
-        # to me than created by others that I happen to be able to see
+        # We have to apply security to all the intids not guaranteed
+        # to be viewable. That's done lazily, as needed, by
+        # LazyNotableIntids, on the theory that there are probably
+        # more things shared directly with me or replied to me than
+        # created by others that I happen to be able to see
         questionable_intids = [
             intids_tagged_to_me,
             topic_intids_by_priority_creators,
@@ -403,21 +529,187 @@ class UserNotableData(AbstractAuthenticatedView):
         ]
         self._notable_storage.add_intids(questionable_intids, safe=False)
         questionable_intids = catalog.family.IF.multiunion(questionable_intids)
-        self._add_safely_viewable(questionable_intids, safely_viewable_intids)
+        if self._intids_in_time_range is not None:
+            questionable_intids = self._intersection(self._intids_in_time_range,
+                                                     questionable_intids)
+        questionable_intids = self._difference(questionable_intids,
+                                               safely_viewable_intids)
 
         # 2015-07-11 Subtract any message info
         query = {'any_of': (_MESSAGEINFO_MYMETYPE,)}
         messageinfo_intids = catalog['mimeType'].apply(query)
-        safely_viewable_intids = self._difference(safely_viewable_intids,
-                                                  messageinfo_intids)
-
         # Make sure none of the stuff we created got in
         intids_created_by_me = self._intids_created_by_me
-        safely_viewable_intids = self._difference(safely_viewable_intids,
-                                                  intids_created_by_me)
 
-        # Make sure nothing that's deleted got in
-        return (safely_viewable_intids - deleted_intids_extent)
+        result = []
+        for intids in (safely_viewable_intids, questionable_intids):
+            intids = self._difference(intids, messageinfo_intids)
+            intids = self._difference(intids, intids_created_by_me)
+            # Make sure nothing that's deleted got in
+            result.append(intids - deleted_intids_extent)
+        return tuple(result)
+
+    @CachedProperty('_time_range')
+    def _lazy_non_mention_notable_intids(self):
+        catalog = self._catalog
+        min_created_time, max_created_time = self._time_range
+        index = self._notable_index
+        if index is None or not self._notable_index_covers(index, min_created_time):
+            safely_viewable_intids, questionable_intids = self._non_mention_notable_plan
+            return LazyNotableIntids(catalog,
+                                     catalog.family.IF.union(safely_viewable_intids,
+                                                             questionable_intids),
+                                     questionable_intids,
+                                     self._is_safely_viewable)
+        normalize = catalog[IX_CREATEDTIME].normalizer.value
+        result = index.intids(None if min_created_time is None else normalize(min_created_time),
+                              None if max_created_time is None else normalize(max_created_time))
+        # Things may have been deleted since they were indexed
+        result = self._remove_deleted(result)
+        unverified = self._intersection(index.unverified, result)
+        # Things that became notable since the last refresh aren't
+        # indexed yet, so the plan is run over that window too
+        recent = self._notable_index_recent(index)
+        if recent is not None:
+            safely_viewable_intids, questionable_intids = recent
+            unverified = self._difference(catalog.family.IF.union(unverified,
+                                                                  questionable_intids),
+                                          safely_viewable_intids)
+            result = catalog.family.IF.multiunion([result,
+                                                   safely_viewable_intids,
+                                                   questionable_intids])
+        return LazyNotableIntids(catalog,
+                                 result,
+                                 unverified,
+                                 self._is_safely_viewable)
+
+    @CachedProperty('_time_range')
+    def _non_mention_notable_intids(self):
+        return self._lazy_non_mention_notable_intids.exact()
+
+    # The materialized index.
+    #
+    # Running the query plan over a window of created times gives the
+    # complete set of notable objects created in that window, so the
+    # index is refreshed by re-running the plan over the window of
+    # things created since the last refresh, and replacing that part
+    # of the index with the results. That happens in a job (see
+    # :mod:`.job`) queued by the stream changes targeted at the user,
+    # never while reading. Intids that still need the security check
+    # are stored as unverified, and checked when they are read.
+    # Stream changes for older objects (e.g., they were just shared
+    # with us) are noted as pending and widen the next window. If the
+    # sharing targets the plan is based on change, the index is
+    # rebuilt. Reads add the results of running the plan over the
+    # window since the last refresh, and run the whole plan instead
+    # of using an index that isn't current.
+
+    #: How far before the last refresh the next refresh starts, to
+    #: allow for deferred catalog indexing.
+    notable_index_refresh_overlap = 3600
+
+    #: The index is fully rebuilt at least this often, as a backstop
+    #: for anything that changes notability without a stream change
+    #: (e.g., notable providers).
+    notable_index_max_rebuild_age = 7 * 86400
+
+    #: Reads don't use an index that hasn't been refreshed in this
+    #: many seconds, since they run the plan over everything created
+    #: since the last refresh.
+    notable_index_max_staleness = 3600
+
+    #: If not None, the number of seconds of notable data to keep in
+    #: the index. Queries for older data run the query plan.
+    notable_index_max_age = None
+
+    @CachedProperty
+    def _notable_index(self):
+        """
+        The materialized index, if it is current enough to read.
+        """
+        index = notable_intid_index_factory(self.remoteUser, False)
+        if     index is None \
+            or index.built_through is None \
+            or time.time() - index.built_through > self.notable_index_max_staleness \
+            or index.fingerprint != self._notable_index_fingerprint:
+            return None
+        return index
+
+    @CachedProperty
+    def _notable_index_fingerprint(self):
+        shared_with_ids = self._group_ntiids | self._shared_with_ids
+        shared_with_ids.add(self.remoteUser.username)
+        ids = (sorted(shared_with_ids), sorted(self._tagged_to_usernames_or_intids))
+        return hashlib.md5(repr(ids).encode('utf-8')).hexdigest()
+
+    def _notable_index_covers(self, index, min_created_time):
+        return index.horizon is None \
+            or (min_created_time is not None and min_created_time >= index.horizon)
+
+    def _non_mention_notable_plan_between(self, min_created_time, max_created_time):
+        time_range = self._time_range
+        self._time_range = (min_created_time, max_created_time)
+        try:
+            return self._non_mention_notable_plan
+        finally:
+            self._time_range = time_range
+
+    def _notable_index_recent(self, index):
+        """
+        The query plan for the requested time range, limited to
+        things created since the last refresh of the index (allowing
+        for deferred indexing), or None if the range ends before that.
+        """
+        min_created_time, max_created_time = self._time_range
+        start = index.built_through - self.notable_index_refresh_overlap
+        if min_created_time is not None:
+            start = max(start, min_created_time)
+        if max_created_time is not None and max_created_time < start:
+            return None
+        return self._non_mention_notable_plan_between(start, max_created_time)
+
+    def _notable_index_window(self, index, min_created_time, max_created_time):
+        created_index = self._catalog[IX_CREATEDTIME]
+        safely_viewable_intids, questionable_intids = \
+            self._non_mention_notable_plan_between(min_created_time, max_created_time)
+        # Whatever may be viewable is checked when read
+        unverified = list(questionable_intids)
+        keys = created_index.index.documents_to_values
+        normalize = created_index.normalizer.value
+        entries = itertools.chain(safely_viewable_intids, unverified)
+        index.replace_range(None if min_created_time is None else normalize(min_created_time),
+                            None if max_created_time is None else normalize(max_created_time),
+                            ((x, keys[x]) for x in entries if x in keys),
+                            unverified)
+
+    def refresh_notable_index(self):
+        now = time.time()
+        index = notable_intid_index_factory(self.remoteUser)
+        max_age = self.notable_index_max_age
+        oldest = None if max_age is None else now - max_age
+        fingerprint = self._notable_index_fingerprint
+        if     index.built_through is None \
+            or index.fingerprint != fingerprint \
+            or now - index.lastRebuilt > self.notable_index_max_rebuild_age:
+            index.clear()
+            self._notable_index_window(index, oldest, None)
+            index.horizon = oldest
+            index.fingerprint = fingerprint
+            index.lastRebuilt = now
+        else:
+            start = index.built_through - self.notable_index_refresh_overlap
+            for obj in self._results(index.pending):
+                created = getattr(obj, 'createdTime', None)
+                if      created is not None \
+                    and (index.horizon is None or created >= index.horizon):
+                    start = min(start, created)
+            self._notable_index_window(index, start, None)
+        index.pending.clear()
+        index.built_through = now
+        if oldest is not None:
+            index.trim(self._catalog[IX_CREATEDTIME].normalizer.value(oldest))
+            index.horizon = max(index.horizon, oldest)
+        return index
 
     def get_notable_intids(self, min_created_time=None,
                            max_created_time=None,
@@ -429,6 +721,16 @@ class UserNotableData(AbstractAuthenticatedView):
 
         return self._notable_intids
 
+    def get_lazy_notable_intids(self, min_created_time=None,
+                                max_created_time=None,
+                                include_mentions=True):
+        self._time_range = (min_created_time, max_created_time)
+
+        if not include_mentions:
+            return self._lazy_non_mention_notable_intids
+
+        return self._lazy_notable_intids
+
 
     def __len__(self):
         return len(self.get_notable_intids())
@@ -449,9 +751,12 @@ class UserNotableData(AbstractAuthenticatedView):
                             reify=False):
         # Sorting returns a generator which is fine unless we need to get a length.
         # In many cases we don't so we let the caller decide
-        _sorted = self._catalog[field_name].sort(notable_intids,
-                                                 limit=limit,
-                                                 reverse=reverse)
+        if isinstance(notable_intids, LazyNotableIntids):
+            _sorted = notable_intids.sort(field_name, limit=limit, reverse=reverse)
+        else:
+            _sorted = self._catalog[field_name].sort(notable_intids,
+                                                     limit=limit,
+                                                     reverse=reverse)
         if not reify:
             return _sorted
 
@@ -475,7 +780,7 @@ class UserNotableData(AbstractAuthenticatedView):
         if iid is None:
             return False
 
-        notables = self._notable_intids
+        notables = self._lazy_notable_intids
         return iid in notables
 
     _NKEY = 'nti.appserver.ugd_query_views._NotableUGD_ExcludedOIDs'
@@ -491,12 +796,21 @@ class UserNotableData(AbstractAuthenticatedView):
             if not_notable is None:
                 not_notable = self._not_notable_oids = Set()
             not_notable.add(to_external_ntiid_oid(maybe_notable))
+            # Comments in the topic are no longer notable
+            index = notable_intid_index_factory(self.remoteUser, False)
+            if index is not None:
+                index.invalidate()
+                queue_notable_intid_index_refresh(self.remoteUser)
+
 
+import BTrees
 
 from zope import lifecycleevent
 
 from zope.annotation.factory import factory as an_factory
 
+from zope.annotation.interfaces import IAnnotations
+
 from zope.container.contained import Contained
 
 from persistent import Persistent
@@ -587,3 +901,116 @@ class UserNotableDataStorage(Persistent, Contained):
         if s in self.__dict__:  # has Lazy kicked in?
             ids.append(getattr(self, s))
 UserNotableDataStorageFactory = an_factory(UserNotableDataStorage)
+
+
+@interface.implementer(IUserNotableIntidIndex)
+class UserNotableIntidIndex(Persistent, Contained):
+    """
+    Stores the notable intids of a user by created time. See
+    :class:`UserNotableData` for how it is kept current.
+    """
+
+    family = BTrees.family64
+
+    built_through = None
+    horizon = None
+
+    #: A digest of the sharing targets the index was built for
+    fingerprint = None
+
+    #: The timestamp of the last full rebuild
+    lastRebuilt = 0
+
+    def __init__(self):
+        # intid -> key
+        self._keys = self.family.II.BTree()
+        # key -> intids
+        self._by_key = self.family.IO.BTree()
+        self.pending = self.family.IF.TreeSet()
+        self.unverified = self.family.IF.TreeSet()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, intid):
+        return intid in self._keys
+
+    def intids(self, min_key=None, max_key=None):
+        if min_key is None and max_key is None:
+            return self.family.IF.LFSet(self._keys.keys())
+        return self.family.IF.multiunion(list(self._by_key.values(min_key, max_key)))
+
+    def add(self, intid, key):
+        old_key = self._keys.get(intid)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self.remove(intid)
+        self._keys[intid] = key
+        intids = self._by_key.get(key)
+        if intids is None:
+            intids = self._by_key[key] = self.family.IF.TreeSet()
+        intids.add(intid)
+
+    def remove(self, intid):
+        key = self._keys.pop(intid, None)
+        if key is None:
+            return
+        intids = self._by_key[key]
+        intids.remove(intid)
+        if not intids:
+            del self._by_key[key]
+        self.verified(intid)
+
+    def verified(self, intid):
+        try:
+            self.unverified.remove(intid)
+        except KeyError:
+            pass
+
+    def _remove_keys(self, keys):
+        for key in keys:
+            for intid in self._by_key.pop(key):
+                del self._keys[intid]
+                self.verified(intid)
+
+    def replace_range(self, min_key, max_key, entries, unverified=()):
+        self._remove_keys(list(self._by_key.keys(min_key, max_key)))
+        for intid, key in entries:
+            self.add(intid, key)
+        for intid in unverified:
+            if intid in self._keys:
+                self.unverified.add(intid)
+
+    def trim(self, min_key):
+        self._remove_keys(list(self._by_key.keys(max=min_key, excludemax=True)))
+
+    def invalidate(self):
+        self.built_through = None
+
+    def clear(self):
+        self._keys.clear()
+        self._by_key.clear()
+        self.pending.clear()
+        self.unverified.clear()
+        self.built_through = self.horizon = self.fingerprint = None
+        self.lastRebuilt = 0
+
+
+_NOTABLE_INTID_INDEX_KEY = 'nti.app.notabledata.adapters.UserNotableIntidIndex'
+
+
+@component.adapter(IUser)
+@interface.implementer(IUserNotableIntidIndex)
+def notable_intid_index_factory(user, create=True):
+    result = None
+    annotations = IAnnotations(user)
+    try:
+        result = annotations[_NOTABLE_INTID_INDEX_KEY]
+    except KeyError:
+        if create:
+            result = UserNotableIntidIndex()
+            annotations[_NOTABLE_INTID_INDEX_KEY] = result
+            result.__name__ = _NOTABLE_INTID_INDEX_KEY
+            result.__parent__ = user
+    return result
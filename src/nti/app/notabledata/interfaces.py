@@ -82,6 +82,17 @@ class IUserNotableData(IIterable):
                 created before that time (inclusive) will be returned.
         """
 
+    def get_lazy_notable_intids(min_created_time=None,
+                                max_created_time=None,
+                                include_mentions=True):
+        """
+        Like :meth:`get_notable_intids`, but the sharing security check
+        is only applied to objects as they are needed. The result can be
+        passed to :meth:`sort_notable_intids`, which then only checks as
+        many objects as it takes to produce ``limit`` intids. Its length
+        is an upper bound unless its ``is_approximate`` attribute is false.
+        """
+
     def sort_notable_intids(notable_intids,
                             field_name='createdTime',
                             limit=None,
@@ -110,6 +121,13 @@ class IUserNotableData(IIterable):
         notable set for this user, returning a truthy-value.
         """
 
+    def refresh_notable_index():
+        """
+        Bring the materialized :class:`IUserNotableIntidIndex` of the
+        user up to date, creating it if needed, and return it. This
+        writes, so it is done in the background, not when reading.
+        """
+
     def object_is_not_notable(maybe_notable):
         """"
         Given some object, attempt to record that whatever its notability
@@ -190,3 +208,77 @@ class IUserNotableDataStorage(interface.Interface):
         Remove the object from underlying data stores, in case an object
         needs to go away.
         """
+
+
+class IUserNotableIntidIndex(interface.Interface):
+    """
+    A materialized copy of the (non-mention) notable intids for a user,
+    keyed by the normalized created time of each object, so that
+    time-bounded queries are range reads instead of a fresh query
+    plan over the metadata catalog.
+
+    The index is maintained by :meth:`IUserNotableData.refresh_notable_index`,
+    which refreshes it incrementally in the background and decides when
+    it must be rebuilt; this object only stores the results. Reads only
+    use an index that is current. Keys are the values of the
+    metadata catalog's created time index.
+    """
+
+    built_through = Number(title=u"The timestamp through which the index is current",
+                           description=u"None if the index must be rebuilt.",
+                           required=False,
+                           default=None)
+
+    horizon = Number(title=u"The timestamp of the oldest created time covered",
+                     description=u"None if everything is covered.",
+                     required=False,
+                     default=None)
+
+    pending = interface.Attribute(
+        "A set of intids whose notability must be re-evaluated at the next refresh.")
+
+    unverified = interface.Attribute(
+        "A set of the indexed intids that must still pass the sharing security check.")
+
+    def intids(min_key=None, max_key=None):
+        """
+        Return a :mod:`BTrees` integer set of the intids whose keys
+        fall within the inclusive range.
+        """
+
+    def add(intid, key):
+        """
+        Record that the intid is notable, with the given created time key.
+        """
+
+    def remove(intid):
+        """
+        Forget about the intid, if present.
+        """
+
+    def verified(intid):
+        """
+        Record that the intid passed the sharing security check.
+        """
+
+    def replace_range(min_key, max_key, entries, unverified=()):
+        """
+        Discard everything in the inclusive range and then add each
+        ``(intid, key)`` pair of ``entries``. Those intids also in
+        ``unverified`` are added to :attr:`unverified`.
+        """
+
+    def trim(min_key):
+        """
+        Discard everything with a key less than ``min_key``.
+        """
+
+    def invalidate():
+        """
+        Mark the index as needing a rebuild before it can be used again.
+        """
+
+    def clear():
+        """
+        Discard everything and invalidate the index.
+        """
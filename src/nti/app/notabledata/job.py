@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Refreshing the materialized notable data index of users in the
+background.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from pyramid.threadlocal import get_current_request
+
+from zope import component
+from zope import interface
+
+from zope.cachedescriptors.property import Lazy
+
+from nti.app.notabledata.interfaces import IUserNotableData
+
+from nti.dataserver.interfaces import IRedisClient
+
+from nti.dataserver.job.decorators import RunJobInSite
+
+from nti.dataserver.job.interfaces import IScheduledJob
+
+from nti.dataserver.job.job import AbstractJob
+
+from nti.dataserver.job.utils import queue_scheduled_job
+
+from nti.dataserver.users.users import User
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IScheduledJob)
+class NotableIntidIndexRefreshJob(AbstractJob):
+    """
+    Refreshes (or builds) the materialized notable data index of a
+    user, shortly after the changes that may affect it, so that
+    several changes close together share one refresh.
+    """
+
+    job_id_prefix = u'NotableIntidIndexRefresh'
+
+    #: How long, in seconds, after being queued the job runs.
+    execution_buffer = 60
+
+    def __init__(self, user):
+        super(NotableIntidIndexRefreshJob, self).__init__(user)
+        self.job_kwargs['username'] = user.username
+        request = get_current_request()
+        self.job_kwargs['application_url'] = getattr(request, 'application_url', None)
+
+    @Lazy
+    def execution_time(self):
+        return self.utc_now + self.execution_buffer
+
+    @Lazy
+    def job_id(self):
+        return '%s_%s_%s' % (self.job_id_prefix,
+                             self.job_kwargs['username'],
+                             self.utc_now)
+
+    @RunJobInSite
+    def __call__(self, *args, **kwargs):
+        username = kwargs.get('username')
+        user = User.get_user(username)
+        if user is None:
+            logger.debug(u'User %s no longer exists', username)
+            return
+        request = self.get_request(user, kwargs.get('application_url'))
+        notable_data = component.getMultiAdapter((user, request),
+                                                 IUserNotableData)
+        index = notable_data.refresh_notable_index()
+        logger.debug(u'Refreshed notable data index of %s (%s intids)',
+                     username, len(index))
+
+
+def _refresh_key(username):
+    return 'notabledata/index/refresh/' + username
+
+
+def queue_notable_intid_index_refresh(user):
+    """
+    Queue a job to refresh the materialized notable data index of the
+    user, unless one is already waiting to run.
+    """
+    redis = component.queryUtility(IRedisClient)
+    if      redis is not None \
+        and not redis.set(_refresh_key(user.username), b'1', nx=True,
+                          ex=NotableIntidIndexRefreshJob.execution_buffer):
+        return None
+    return queue_scheduled_job(NotableIntidIndexRefreshJob(user))
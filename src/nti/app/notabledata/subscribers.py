@@ -9,10 +9,57 @@ __docformat__ = "restructuredtext en"
 
 logger = __import__('logging').getLogger(__name__)
 
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.notabledata.adapters import UserNotableData
+from nti.app.notabledata.adapters import notable_intid_index_factory
+
+from nti.app.notabledata.job import queue_notable_intid_index_refresh
+
 from nti.app.notabledata.interfaces import IUserNotableDataStorage
 
+from nti.dataserver.activitystream_change import Change
+
+from nti.dataserver.interfaces import IUser
+from nti.dataserver.interfaces import ITargetedStreamChangeEvent
+
 
 def store_circled_event_notable(change, event):
     owner = change.__parent__
     storage = IUserNotableDataStorage(owner)
     storage.store_object(change, safe=True, take_ownership=False)
+
+
+@component.adapter(ITargetedStreamChangeEvent)
+def update_notable_intid_index(event):
+    """
+    Keep the materialized notable index of the targeted user up to date.
+    Deleted objects are dropped right away; objects too old to be
+    picked up by the next refresh are marked to be re-evaluated then,
+    and a refresh is queued.
+    """
+    user = event.entity
+    if not IUser.providedBy(user):
+        return
+    change = event.object
+    if change.type not in (Change.CREATED, Change.SHARED,
+                           Change.MODIFIED, Change.DELETED):
+        return
+    index = notable_intid_index_factory(user, False)
+    if index is not None and index.built_through is not None:
+        intids = component.queryUtility(IIntIds)
+        intid = intids.queryId(change.object) if intids is not None else None
+        if intid is None:
+            return
+        if change.type == Change.DELETED:
+            index.remove(intid)
+            return
+        created = getattr(change.object, 'createdTime', None) or 0
+        if created < index.built_through - UserNotableData.notable_index_refresh_overlap:
+            index.pending.add(intid)
+    elif change.type == Change.DELETED:
+        return
+    # The first change for a user builds their index
+    queue_notable_intid_index_refresh(user)
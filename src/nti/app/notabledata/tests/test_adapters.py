@@ -9,6 +9,10 @@ from __future__ import absolute_import
 # pylint: disable=W0212,R0904
 
 from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import has_length
 from hamcrest import raises
 from hamcrest import calling
 from hamcrest import not_none
@@ -17,12 +21,21 @@ from hamcrest import has_property
 
 from nti.testing.matchers import validly_provides
 
+import fudge
 import pickle
 
 from zope import component
 
+from zope.intid.interfaces import IIntIds
+
 from nti.app.notabledata.interfaces import IUserNotableData
 from nti.app.notabledata.interfaces import IUserNotableDataStorage
+from nti.app.notabledata.interfaces import IUserNotableIntidIndex
+
+from nti.app.notabledata.adapters import notable_intid_index_factory
+
+from nti.app.notabledata.job import _refresh_key
+from nti.app.notabledata.job import queue_notable_intid_index_refresh
 
 from nti.app.testing.decorators import WithSharedApplicationMockDS
 
@@ -30,6 +43,8 @@ from nti.app.testing.layers import AppLayerTest
 
 from nti.dataserver.activitystream_change import Change
 
+from nti.dataserver.interfaces import IRedisClient
+
 from nti.dataserver.tests.mock_dataserver import mock_db_trans
 
 
@@ -82,3 +97,140 @@ class TestUserNotableDataStorage(AppLayerTest):
 
             data.remove_object(change)
             assert_that(change in data._owned_objects, is_(False))
+
+
+class TestUserNotableIntidIndex(AppLayerTest):
+
+    @WithSharedApplicationMockDS(users=True)
+    def test_interface(self):
+
+        with mock_db_trans():
+            user = self._get_user()
+            index = component.getAdapter(user, IUserNotableIntidIndex)
+            assert_that(index, validly_provides(IUserNotableIntidIndex))
+            assert_that(index.built_through, is_(none()))
+
+    @WithSharedApplicationMockDS(users=True)
+    def test_ranges(self):
+
+        with mock_db_trans():
+            user = self._get_user()
+            index = component.getAdapter(user, IUserNotableIntidIndex)
+            index.add(1, 10)
+            index.add(2, 20)
+            index.add(3, 30)
+            assert_that(list(index.intids(15, 30)), contains(2, 3))
+
+            index.replace_range(20, None, [(4, 25)])
+            assert_that(list(index.intids()), contains(1, 4))
+
+            index.trim(20)
+            assert_that(list(index.intids()), contains(4))
+
+            index.replace_range(None, None, [(5, 40), (6, 50)], unverified=[6])
+            assert_that(list(index.unverified), contains(6))
+            index.verified(6)
+            assert_that(index.unverified, has_length(0))
+
+            index.clear()
+            assert_that(index, has_length(0))
+
+    @WithSharedApplicationMockDS(users=True)
+    def test_verdicts_kept_per_request(self):
+
+        with mock_db_trans():
+            user = self._get_user()
+            uid = component.getUtility(IIntIds).getId(user)
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+
+            data._security_check = lambda unused_obj: False
+            assert_that(data._is_safely_viewable(uid), is_(False))
+
+            # Remembered while we last, but not by the next request
+            data._security_check = lambda unused_obj: True
+            assert_that(data._is_safely_viewable(uid), is_(False))
+
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            data._security_check = lambda unused_obj: True
+            assert_that(data._is_safely_viewable(uid), is_(True))
+
+    @WithSharedApplicationMockDS(users=True)
+    def test_only_refreshed_in_background(self):
+
+        with mock_db_trans():
+            user = self._get_user()
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            data.get_notable_intids(include_mentions=False)
+            # Reading doesn't build the index
+            assert_that(notable_intid_index_factory(user, False), is_(none()))
+
+            index = data.refresh_notable_index()
+            assert_that(index.built_through, is_(not_none()))
+            assert_that(index.horizon, is_(none()))
+
+        with mock_db_trans():
+            user = self._get_user()
+            index = notable_intid_index_factory(user, False)
+            built_through = index.built_through
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            assert_that(data._notable_index, is_(index))
+            data.get_notable_intids(include_mentions=False)
+            # Nor change it
+            assert_that(index.built_through, is_(built_through))
+            assert_that(index._p_changed, is_not(True))
+
+            # Indexes that aren't current aren't read
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            data.notable_index_max_staleness = -1
+            assert_that(data._notable_index, is_(none()))
+
+    @WithSharedApplicationMockDS(users=True)
+    def test_recent_changes_read_before_refresh(self):
+
+        with mock_db_trans():
+            user = self._get_user()
+            uid = component.getUtility(IIntIds).getId(user)
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            index = data.refresh_notable_index()
+
+            # Things that became notable since the refresh are found
+            # by the plan over the window since then
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            windows = []
+            def plan(min_created_time, max_created_time):
+                windows.append((min_created_time, max_created_time))
+                return (index.family.IF.LFSet([uid]), index.family.IF.LFSet())
+            data._non_mention_notable_plan_between = plan
+            assert_that(data.get_notable_intids(include_mentions=False),
+                        contains(uid))
+            start = index.built_through - data.notable_index_refresh_overlap
+            assert_that(windows, contains((start, None)))
+
+            # But not if the query ends before the window
+            data = component.getMultiAdapter((user, self.beginRequest()),
+                                             IUserNotableData)
+            data._non_mention_notable_plan_between = plan
+            assert_that(data.get_notable_intids(max_created_time=start - 1,
+                                                include_mentions=False),
+                        has_length(0))
+            assert_that(windows, has_length(1))
+
+    @WithSharedApplicationMockDS(users=True)
+    @fudge.patch('nti.app.notabledata.job.queue_scheduled_job')
+    def test_refresh_queued_once(self, fake_queue):
+        fake_queue.expects_call().times_called(1).returns(u'job')
+
+        with mock_db_trans():
+            user = self._get_user()
+            assert_that(queue_notable_intid_index_refresh(user), is_(u'job'))
+            # Already waiting
+            assert_that(queue_notable_intid_index_refresh(user), is_(none()))
+            redis = component.getUtility(IRedisClient)
+            redis.delete(_refresh_key(user.username))
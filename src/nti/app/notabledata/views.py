@@ -26,6 +26,9 @@ from nti.app.base.abstract_views import AbstractAuthenticatedView
 from nti.app.externalization.view_mixins import ModeledContentUploadRequestUtilsMixin
 
 from nti.app.notabledata.adapters import IUserNotableData
+from nti.app.notabledata.adapters import notable_intid_index_factory
+
+from nti.app.notabledata.job import queue_notable_intid_index_refresh
 
 from nti.app.renderers.interfaces import IUGDExternalCollection
 
@@ -34,6 +37,14 @@ from nti.appserver.interfaces import INamedLinkView
 from nti.appserver.ugd_query_views import _UGDView
 
 from nti.dataserver.authorization import ACT_READ
+from nti.dataserver.authorization import ACT_NTI_ADMIN
+
+from nti.dataserver.interfaces import IUser
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IShardLayout
+from nti.dataserver.interfaces import IDataserverFolder
+
+from nti.dataserver.users.users import User
 
 from nti.externalization.interfaces import LocatedExternalDict
 from nti.externalization.interfaces import StandardExternalFields
@@ -44,6 +55,8 @@ from nti.mimetype.mimetype import nti_mimetype_with_class
 
 from nti.securitypolicy.utils import is_impersonating
 
+TOTAL = StandardExternalFields.TOTAL
+ITEM_COUNT = StandardExternalFields.ITEM_COUNT
 LAST_MODIFIED = StandardExternalFields.LAST_MODIFIED
 _NOTABLE_NAME = 'RUGDByOthersThatIMightBeInterestedIn'
 
@@ -111,9 +124,12 @@ class _NotableRecursiveUGDView(_UGDView):
 		result.mimeType = nti_mimetype_with_class(None)
 		interface.alsoProvides(result, IUGDExternalCollection)
 
-		safely_viewable_intids = user_notable_data.get_notable_intids()
-
-		result['TotalItemCount'] = len(safely_viewable_intids)
+		# Unless the client wants exact counts, security is only applied
+		# to as many objects as we need to return.
+		if self._wants_exact_counts():
+			safely_viewable_intids = user_notable_data.get_notable_intids()
+		else:
+			safely_viewable_intids = user_notable_data.get_lazy_notable_intids()
 
 		# Our best LastModified time will be that of the most recently
 		# modified object; unfortunately, we have no way of tracking deletes...
@@ -140,6 +156,9 @@ class _NotableRecursiveUGDView(_UGDView):
 								   number_items_needed=limit,
 								   batch_size=batch_size,
 								   batch_start=batch_start)
+		result['TotalItemCount'] = len(safely_viewable_intids)
+		if getattr(safely_viewable_intids, 'is_approximate', False):
+			result['TotalItemCountIsApproximate'] = True
 		# Note that we insert lastViewed into the result set as a convenience,
 		# but we don't change the last-modified header based on this;
 		# eventually we want this to go away (?)
@@ -209,3 +228,43 @@ class _NotableUGDLastViewed(AbstractAuthenticatedView,
 		last_viewed = self._notable_data.lastViewed
 		self.request.response.last_modified = last_viewed
 		return last_viewed
+
+@view_config(route_name='objects.generic.traversal',
+			 renderer='rest',
+			 request_method='POST',
+			 context=IDataserverFolder,
+			 permission=ACT_NTI_ADMIN,
+			 name='RebuildNotableDataIndex')
+class RebuildNotableDataIndexView(AbstractAuthenticatedView):
+	"""
+	Clear the materialized notable data index of the users named by the
+	``usernames`` parameter (a comma separated list), or of all users,
+	and queue jobs to rebuild them. They cannot be rebuilt here because
+	notability depends on what the user (not the administrator) can see.
+	"""
+
+	def _iter_users(self):
+		usernames = self.request.params.get('usernames')
+		if usernames:
+			for username in usernames.split(','):
+				user = User.get_user(username.strip())
+				if user is not None:
+					yield user
+		else:
+			dataserver = component.getUtility(IDataserver)
+			users_folder = IShardLayout(dataserver).users_folder
+			for entity in users_folder.values():
+				if IUser.providedBy(entity):
+					yield entity
+
+	def __call__(self):
+		count = 0
+		for user in self._iter_users():
+			index = notable_intid_index_factory(user, False)
+			if index is not None:
+				index.clear()
+				queue_notable_intid_index_refresh(user)
+				count += 1
+		result = LocatedExternalDict()
+		result[ITEM_COUNT] = result[TOTAL] = count
+		return result
@@ -40,7 +40,7 @@ from pyramid.traversal import find_interface
 
 from nti.app.bulkemail.delegate import AbstractBulkEmailProcessDelegate
 
-from nti.app.bulkemail.interfaces import IBulkEmailProcessDelegate
+from nti.app.bulkemail.interfaces import IBulkEmailChunkedProcessDelegate
 
 from nti.app.notabledata.interfaces import IUserNotableData
 
@@ -74,6 +74,7 @@ from nti.dataserver.users.interfaces import IFriendlyNamed
 from nti.dataserver.users.users import User
 
 from nti.dataserver.users.utils import get_users_by_site
+from nti.dataserver.users.utils import intids_of_users_by_sites
 
 from nti.externalization.singleton import Singleton
 
@@ -462,7 +463,7 @@ class _StreamChangeEventDispatcher(_AbstractClassifier):
 class _FeedbackClassifier(_AbstractClassifier):
 	classification = 'feedback'
 
-@interface.implementer(IBulkEmailProcessDelegate)
+@interface.implementer(IBulkEmailChunkedProcessDelegate)
 class DigestEmailProcessDelegate(AbstractBulkEmailProcessDelegate):
 
 	_subject = "Your ${site_name} Updates"
@@ -471,6 +472,9 @@ class DigestEmailProcessDelegate(AbstractBulkEmailProcessDelegate):
 
 	template_name = 'nti.app.pushnotifications:templates/digest_email'
 
+	#: How many users to collect in each chunk (and transaction)
+	recipient_chunk_size = 50
+
 	@Lazy
 	def _dataserver(self):
 		return component.getUtility(IDataserver)
@@ -497,10 +501,39 @@ class DigestEmailProcessDelegate(AbstractBulkEmailProcessDelegate):
 		elif site_name:
 			return get_users_by_site()
 
+	def get_process_site_user_intids(self):
+		site_name = self.get_process_site()
+		if site_name and site_name == 'dataserver2':
+			intids = component.getUtility(IIntIds)
+			result = (intids.queryId(x) for x in self._dataserver.users_folder.values())
+			return [x for x in result if x is not None]
+		elif site_name:
+			return intids_of_users_by_sites(site_name)
+
 	def _display_name(self, user):
 		return component.getMultiAdapter((user, self.request), IDisplayNameGenerator)()
 
+	def collect_recipient_chunks(self):
+		# All the chunks share a collection time, just as
+		# if they were collected at once
+		now = time.time()
+		intids = list(self.get_process_site_user_intids() or ())
+		size = self.recipient_chunk_size
+		for i in range(0, len(intids), size):
+			yield {'collection_time': now,
+				   'intids': intids[i:i + size]}
+
+	def collect_recipients_for_chunk(self, chunk):
+		intids = component.getUtility(IIntIds)
+		users = (intids.queryObject(x) for x in chunk['intids'])
+		return self._collect_recipients_for_users(users, chunk['collection_time'])
+
 	def collect_recipients(self):
+		for chunk in self.collect_recipient_chunks():
+			for recipient in self.collect_recipients_for_chunk(chunk):
+				yield recipient
+
+	def _collect_recipients_for_users(self, users, now):
 		# We are in an outer request, but we need to get the
 		# notable data for different users. In some cases
 		# this depends on the authentication policy to get
@@ -510,8 +543,7 @@ class DigestEmailProcessDelegate(AbstractBulkEmailProcessDelegate):
 		auth_policy = component.getUtility(IAuthenticationPolicy)
 		imp_policy = IImpersonatedAuthenticationPolicy(auth_policy)
 
-		now = time.time()
-		for user in self.get_process_site_users() or ():
+		for user in users:
 			if self._accept_user(user):
 				# pylint: disable=too-many-function-args
 				imp_user = imp_policy.impersonating_userid(user.username)
@@ -593,8 +625,8 @@ class DigestEmailProcessTestingDelegate(DigestEmailProcessDelegate):
 			collector.last_collected = collector.last_sent = 0
 		return collector
 
-	def collect_recipients(self):
-		for possible_recipient in super(DigestEmailProcessTestingDelegate, self).collect_recipients():
+	def collect_recipients_for_chunk(self, chunk):
+		for possible_recipient in super(DigestEmailProcessTestingDelegate, self).collect_recipients_for_chunk(chunk):
 			# Reset the sent and collected times if desired
 			self._collector_for_user(User.get_user(possible_recipient['email'].id, self._dataserver))
 
@@ -31,6 +31,7 @@ from nti.app.renderers.interfaces import IUserActivityExternalCollection
 from nti.app.renderers.interfaces import IETagCachedUGDExternalCollection
 from nti.app.renderers.interfaces import IPreRenderResponseCacheController
 from nti.app.renderers.interfaces import ILongerCachedUGDExternalCollection
+from nti.app.renderers.interfaces import IVersionStampedUGDExternalCollection
 
 from nti.dataserver import flagging
 from nti.dataserver import interfaces as nti_interfaces
@@ -391,6 +392,43 @@ class _ETagCachedUGDExternalCollectionCacheController(_ExternalCollectionCacheCo
 	def _context_lastModified(self):
 		return 0
 
+@interface.implementer(IPreRenderResponseCacheController)
+@component.adapter(IVersionStampedUGDExternalCollection)
+class VersionStampCacheController(object):
+	"""
+	For collections whose data is determined by a version stamp that
+	is cheap to compute before doing any of the work (such as
+	:meth:`nti.dataserver.sharing.SharingTargetMixin.getReadableContainerVersion`),
+	along with the remote user and the query.
+
+	Views call this with the request context and the stamp before
+	they do anything else, raising the not-modified if the client is
+	current. If they do have to do the work, their result provides
+	:class:`.IVersionStampedUGDExternalCollection`, so we produce the
+	same ETag again when it is rendered.
+	"""
+
+	max_age = 0  # XXX arbitrary
+
+	def __init__(self, context, version_stamp=None):
+		self.context = context
+		if version_stamp is None:
+			version_stamp = context.__version_stamp__
+		self.version_stamp = version_stamp
+
+	def __call__(self, context, system):
+		request = system['request']
+		response = request.response
+		response.etag = _md5_etag(repr(self.version_stamp),
+								  request.authenticated_userid,
+								  request.query_string)
+		# We don't know this until the view has run, and
+		# can only claim it once it has.
+		response.last_modified = getattr(context, 'lastModified', None) or None
+		response.cache_control.max_age = self.max_age
+		# Let this raise the not-modified if it will
+		return default_cache_controller(context, system)
+
 from nti.app.authentication import get_remote_user
 
 @component.adapter(IUserActivityExternalCollection)
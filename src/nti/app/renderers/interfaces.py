@@ -119,6 +119,18 @@ class IUseTheRequestContextUGDExternalCollection(IUGDExternalCollection):
     """
 
 
+class IVersionStampedUGDExternalCollection(IUGDExternalCollection):
+    """
+    The data in this collection is determined by its version stamp
+    (along with the remote user and the query), which the view could
+    compute, and check against, before doing any of the work. See
+    :class:`nti.app.renderers.caching.VersionStampCacheController`.
+    """
+
+    __version_stamp__ = interface.Attribute(
+        "A hashable value that changes whenever the data may have")
+
+
 class IExternalizationCatchComponentAction(interface.Interface):
     """
     To allow swizzling out the replacement during devmode and testing,
@@ -12,6 +12,8 @@ from __future__ import absolute_import
 
 import collections
 
+import six
+
 from zope import component
 from zope import interface
 
@@ -22,16 +24,22 @@ from zope.mimetype.interfaces import IContentTypeAware
 from perfmetrics import metric
 
 from nti.app.renderers.interfaces import INoHrefInResponse
+from nti.app.renderers.interfaces import IExternalCollection
 from nti.app.renderers.interfaces import IResponseRenderer
 from nti.app.renderers.interfaces import IExternalizationCatchComponentAction
 
+from nti.dataserver.externalization_cache import audience_key
+
 from nti.dataserver.interfaces import IContent
 from nti.dataserver.interfaces import IEnclosedContent
+from nti.dataserver.interfaces import IExternalizationCache
 from nti.dataserver.interfaces import IShouldHaveTraversablePath
 
 from nti.externalization.externalization import toExternalObject
 from nti.externalization.externalization import catch_replace_action
 
+from nti.externalization.interfaces import StandardExternalFields
+
 from nti.externalization.representation import to_json_representation_externalized
 
 from nti.links.externalization import render_link
@@ -50,6 +58,13 @@ from nti.ntiids.oids import to_external_ntiid_oid
 
 from nti.traversal import traversal as nti_traversal
 
+ITEMS = StandardExternalFields.ITEMS
+
+#: Collections with at least this many items, whose ETag was set
+#: before rendering, are externalized and serialized one item at a time.
+#: See :func:`render_externalizable`.
+INCREMENTAL_RENDER_MIN_ITEMS = 100
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -123,6 +138,85 @@ def find_content_type(request, data=None):
     return best_match or MIME_BASE_JSON
 
 
+def _externalization_audience(request):
+    try:
+        return request._v_nti_externalization_audience
+    except AttributeError:
+        result = request._v_nti_externalization_audience = audience_key(request)
+        return result
+
+
+def _to_external_object(obj, request):
+    catch_component_action = component.queryUtility(IExternalizationCatchComponentAction,
+                                                    default=_extended_catch_replace_action)
+    name = getattr(request, '_v_nti_render_externalizable_name', '')
+
+    def factory():
+        return toExternalObject(obj,
+                                name=name,
+                                # Catch *nested* errors during externalization. We got this far,
+                                # at least send back some data for the main object. The exception will be logged.
+                                # AttributeError is usually a migration problem,
+                                # LookupError is usually a programming problem.
+                                # AssertionError is one or both
+                                catch_components=(AttributeError, LookupError, AssertionError),
+                                catch_component_action=catch_component_action,
+                                request=request)
+
+    cache = component.queryUtility(IExternalizationCache)
+    if cache is None:
+        return factory()
+    return cache.externalize(obj, factory, name,
+                             _externalization_audience(request))
+
+
+def _items_to_render_incrementally(data, request):
+    """
+    Return the items of the collection `data` if it should be
+    rendered incrementally, otherwise None.
+    """
+    # Without an ETag from the pre-render cache controller, one would
+    # have to be computed from the whole body
+    if      not IExternalCollection.providedBy(data) \
+        or not isinstance(data, collections.MutableMapping) \
+        or not request.response.etag:
+        return None
+    try:
+        items = data[ITEMS]
+    except (KeyError, TypeError):
+        return None
+    if      not isinstance(items, collections.Sequence) \
+        or len(items) < INCREMENTAL_RENDER_MIN_ITEMS:
+        return None
+    content_type = find_content_type(request, data)
+    if not content_type.startswith(MIME_BASE) or not content_type.endswith('json'):
+        return None
+    return items
+
+
+def _to_bytes(chunk):
+    return chunk.encode('utf-8') if isinstance(chunk, six.text_type) else chunk
+
+
+def _render_json_incrementally(body, items, request):
+    """
+    Return the JSON for the external `body` with `items` as its
+    ``Items``, as a list of chunks. Each item is externalized and
+    serialized in turn, so the external form of only one is ever in
+    memory, and the chunks are never joined.
+    """
+    body.pop(ITEMS, None)
+    head = _to_bytes(to_json_representation_externalized(body)).rstrip()
+    assert head.endswith(b'}')
+    head = head[:-1].rstrip()
+    result = [head + (b',' if head != b'{' else b'') + b'"' + ITEMS.encode('ascii') + b'":[']
+    for i, item in enumerate(items):
+        chunk = _to_bytes(to_json_representation_externalized(_to_external_object(item, request)))
+        result.append(b',' + chunk if i else chunk)
+    result.append(b']}')
+    return result
+
+
 @metric
 @interface.provider(IResponseRenderer)
 def render_externalizable(data, system):
@@ -130,23 +224,25 @@ def render_externalizable(data, system):
     .. note:: As an ad-hoc protocol, if the request object has an attribute
             `_v_nti_render_externalizable_name`, then that will be the name we pass
             to :func:`toExternalObject`. Otherwise, we will use the default name.
+
+    Large collections (see :data:`INCREMENTAL_RENDER_MIN_ITEMS`) are
+    sent as the response's ``app_iter``, one chunk per item, and
+    nothing is returned.
     """
     request = system['request']
     response = request.response
     __traceback_info__ = data, request, response, system
 
-    catch_component_action = component.queryUtility(IExternalizationCatchComponentAction,
-                                                    default=_extended_catch_replace_action)
-    body = toExternalObject(data,
-                            name=getattr(request, '_v_nti_render_externalizable_name', ''),
-                            # Catch *nested* errors during externalization. We got this far,
-                            # at least send back some data for the main object. The exception will be logged.
-                            # AttributeError is usually a migration problem,
-                            # LookupError is usually a programming problem.
-                            # AssertionError is one or both
-                            catch_components=(AttributeError, LookupError, AssertionError),
-                            catch_component_action=catch_component_action,
-                            request=request)
+    items = _items_to_render_incrementally(data, request)
+    if items is not None:
+        # The items are externalized as they are serialized
+        data[ITEMS] = ()
+        try:
+            body = _to_external_object(data, request)
+        finally:
+            data[ITEMS] = items
+    else:
+        body = _to_external_object(data, request)
     # There's some possibility that externalizing an object alters its
     # modification date (usually decorators do this), so check it after
     # externalizing
@@ -211,6 +307,11 @@ def render_externalizable(data, system):
     if response.content_type.startswith(MIME_BASE):
         # Only transform this if it was one of our objects
         if response.content_type.endswith('json'):
+            if items is not None:
+                # The transaction is over by the time the server iterates
+                # the response, so this is all done now
+                response.app_iter = _render_json_incrementally(body, items, request)
+                return None
             body = to_json_representation_externalized(body)
     return body
 
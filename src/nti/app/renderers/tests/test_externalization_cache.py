@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import has_entry
+from hamcrest import assert_that
+
+from zope import component
+
+from nti.contentrange.contentrange import ContentRangeDescription
+
+from nti.dataserver.contenttypes.highlight import Highlight
+
+from nti.dataserver.externalization_cache import ExternalizationCache
+
+from nti.dataserver.interfaces import IExternalizationCache
+
+from nti.ntiids.ntiids import find_object_with_ntiid
+
+from nti.ntiids.oids import to_external_ntiid_oid
+
+from nti.app.testing.application_webtest import ApplicationLayerTest
+
+from nti.app.testing.decorators import WithSharedApplicationMockDS
+
+from nti.dataserver.tests import mock_dataserver
+
+
+class TestExternalizationCache(ApplicationLayerTest):
+
+    def _register_cache(self):
+        cache = ExternalizationCache()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(cache, IExternalizationCache)
+        self.addCleanup(gsm.unregisterUtility, cache, IExternalizationCache)
+        return cache
+
+    @WithSharedApplicationMockDS(users=True, testapp=True)
+    def test_highlight_rendered_from_cache(self):
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = self._get_user()
+            hl = Highlight()
+            hl.applicableRange = ContentRangeDescription()
+            hl.containerId = u'tag:nti:foo'
+            hl.selectedText = u'Bankai'
+            user.addContainedObject(hl)
+            ntiid = to_external_ntiid_oid(hl)
+
+        cache = self._register_cache()
+        path = '/dataserver2/Objects/' + ntiid
+
+        res = self.testapp.get(path)
+        assert_that(res.json_body, has_entry('selectedText', u'Bankai'))
+        assert_that(cache.misses, is_(1))
+        assert_that(cache.hits, is_(0))
+
+        res2 = self.testapp.get(path)
+        assert_that(cache.misses, is_(1))
+        assert_that(cache.hits, is_(1))
+        assert_that(res2.json_body, is_(res.json_body))
+
+        # Changing the highlight changes its serial, so it
+        # is externalized again
+        with mock_dataserver.mock_db_trans(self.ds):
+            hl = find_object_with_ntiid(ntiid)
+            hl.selectedText = u'Shikai'
+
+        res = self.testapp.get(path)
+        assert_that(res.json_body, has_entry('selectedText', u'Shikai'))
+        assert_that(cache.misses, is_(2))
+        assert_that(cache.hits, is_(1))
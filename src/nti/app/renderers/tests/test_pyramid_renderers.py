@@ -8,16 +8,30 @@ __docformat__ = "restructuredtext en"
 # pylint: disable=W0212,R0904
 
 from hamcrest import is_
+from hamcrest import none
+from hamcrest import has_entry
+from hamcrest import has_length
 from hamcrest import assert_that
+from hamcrest import has_entries
+
+import json
 
 from ZODB.broken import Broken
 
 from pyramid.request import Request
 
+from zope import interface
+
+from nti.app.renderers.interfaces import IExternalCollection
+
 from nti.app.renderers.rest import find_content_type
+from nti.app.renderers.rest import render_externalizable
+from nti.app.renderers.rest import INCREMENTAL_RENDER_MIN_ITEMS
 
 from nti.externalization.externalization import toExternalObject
 
+from nti.externalization.interfaces import LocatedExternalDict
+
 from nti.app.testing.layers import NewRequestLayerTest
 
 class TestContentType(NewRequestLayerTest):
@@ -68,3 +82,32 @@ class TestRender(NewRequestLayerTest):
 
 		assert_that( toExternalObject( [Broken()] ),
 					 is_( [{ "Class": "BrokenObject"}] ) )
+
+	def _collection(self, count):
+		result = LocatedExternalDict()
+		result['Title'] = 'Things'
+		result['Items'] = [{'ID': i} for i in range(count)]
+		interface.alsoProvides(result, IExternalCollection)
+		return result
+
+	def test_large_collection_rendered_incrementally(self):
+		count = INCREMENTAL_RENDER_MIN_ITEMS + 1
+		data = self._collection(count)
+		response = self.request.response
+		response.etag = 'from-the-cache-controller'
+
+		assert_that( render_externalizable( data, {'request': self.request} ),
+					 is_( none() ) )
+		chunks = list(response.app_iter)
+		assert_that( chunks, has_length( count + 2 ) )
+		body = json.loads( b''.join( chunks ) )
+		assert_that( body, has_entries( 'Title', 'Things',
+										'Items', has_length( count ) ) )
+		assert_that( body['Items'][-1], has_entry( 'ID', count - 1 ) )
+		# The collection is left alone
+		assert_that( data['Items'], has_length( count ) )
+
+	def test_collection_without_etag_rendered_whole(self):
+		count = INCREMENTAL_RENDER_MIN_ITEMS + 1
+		body = render_externalizable( self._collection(count), {'request': self.request} )
+		assert_that( json.loads( body ), has_entry( 'Items', has_length( count ) ) )
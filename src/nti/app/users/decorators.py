@@ -67,6 +67,8 @@ from nti.dataserver.users.interfaces import IDisallowActivityLink
 from nti.dataserver.users.interfaces import IDisallowHiddenMembership
 from nti.dataserver.users.interfaces import IDisallowSuggestedContacts
 
+from nti.dataserver.users.last_seen import get_last_seen_time
+
 from nti.externalization.interfaces import StandardExternalFields
 from nti.externalization.interfaces import IExternalMappingDecorator
 
@@ -152,7 +154,7 @@ class _UserAdminInfoDecorator(AbstractAuthenticatedRequestAwareDecorator):
         external_ids = get_external_identifiers(context)
         if external_ids:
             result['external_ids'] = external_ids
-        result['lastSeenTime'] = context.lastSeenTime
+        result['lastSeenTime'] = get_last_seen_time(context, self.request)
         result['lastLoginTime'] = context.lastLoginTime
         result['CreationSite'] = get_user_creation_sitename(context)
         
@@ -60,10 +60,13 @@ from nti.dataserver.interfaces import IUser
 from nti.dataserver.interfaces import IUserBlacklistedStorage
 
 from nti.dataserver.users.interfaces import IUserProfile
+from nti.dataserver.users.interfaces import ILastSeenWriteBehindQueue
 from nti.dataserver.users.interfaces import IWillUpdateEntityEvent
 from nti.dataserver.users.interfaces import BlacklistedUsernameError
 from nti.dataserver.users.interfaces import IWillCreateNewEntityEvent
 
+from nti.dataserver.users.last_seen import get_last_seen_time
+
 from nti.dataserver.users.utils import get_communities_by_site
 from nti.dataserver.users.utils import reindex_email_verification
 
@@ -165,8 +168,13 @@ def _on_user_lastseen(user, event):
     request = event.request
     if request is not None and not is_impersonating(request):
         # Only update last seen if we are past our buffer threshold
-        if      user.lastSeenTime \
-            and user.lastSeenTime + LAST_SEEN_UPDATE_BUFFER_IN_SEC > event.timestamp:
+        last_seen_time = get_last_seen_time(user)
+        if      last_seen_time \
+            and last_seen_time + LAST_SEEN_UPDATE_BUFFER_IN_SEC > event.timestamp:
+            return
+        # Keep the user out of this transaction if we can
+        queue = component.queryUtility(ILastSeenWriteBehindQueue)
+        if queue is not None and queue.record(user, event.timestamp):
             return
         user.update_last_seen_time(event.timestamp)
         notify(UserLastSeenUpdatedEvent(user))
@@ -241,6 +249,10 @@ def _on_user_deletion(user, unused_event=None):
 
 @component.adapter(IUser, IUserProcessedContextsEvent)
 def _on_user_processed_contexts(user, event):
+    queue = component.queryUtility(ILastSeenWriteBehindQueue)
+    if      queue is not None and event.context_ids \
+        and queue.record_contexts(user, event.context_ids, event.timestamp):
+        return
     container = IContextLastSeenContainer(user, None)
     if container is not None and event.context_ids:
         # pylint: disable=too-many-function-args
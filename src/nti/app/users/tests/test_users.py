@@ -9,6 +9,7 @@ from __future__ import absolute_import
 # pylint: disable=W0212,R0904
 
 from hamcrest import is_
+from hamcrest import none
 from hamcrest import raises
 from hamcrest import calling
 from hamcrest import has_entry
@@ -35,8 +36,12 @@ from nti.dataserver.users.communities import Community
 from nti.dataserver.users.friends_lists import DynamicFriendsList
 
 from nti.dataserver.users.interfaces import IRecreatableUser
+from nti.dataserver.users.interfaces import ILastSeenWriteBehindQueue
 from nti.dataserver.users.interfaces import BlacklistedUsernameError
 
+from nti.dataserver.users.last_seen import get_last_seen_time
+from nti.dataserver.users.last_seen import RedisLastSeenWriteBehindQueue
+
 from nti.dataserver.users.users import User
 
 from nti.app.testing.application_webtest import ApplicationLayerTest
@@ -71,6 +76,46 @@ class TestUsers(ApplicationLayerTest):
             notify(UserLastSeenEvent(user, t0_buffer_plus_one, request))
             assert_that(user.lastSeenTime, is_(t0_buffer_plus_one))
 
+    @WithSharedApplicationMockDSWithChanges
+    def test_user_last_seen_write_behind(self):
+        username = u'herodotus_writebehind'
+        queue = RedisLastSeenWriteBehindQueue()
+        # Flush by hand
+        queue._ensure_flusher = lambda: None
+        def runner(func, **unused_kwargs):
+            with mock_dataserver.mock_db_trans(self.ds):
+                return func()
+        queue._runner = runner
+
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(queue, ILastSeenWriteBehindQueue)
+        self.addCleanup(gsm.unregisterUtility, queue, ILastSeenWriteBehindQueue)
+
+        request = DummyRequest()
+        t0 = time.time()
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = User.create_user(username=username)
+            notify(UserLastSeenEvent(user, t0, request))
+            # Not stored yet, but readable
+            assert_that(user.lastSeenTime, is_(0))
+            assert_that(get_last_seen_time(user), is_(t0))
+            # And still buffered
+            notify(UserLastSeenEvent(user, t0 + 30, request))
+            assert_that(get_last_seen_time(user), is_(t0))
+
+            # Listings read all the pending times once per request
+            listing_request = DummyRequest()
+            assert_that(get_last_seen_time(user, listing_request), is_(t0))
+            assert_that(listing_request._v_nti_pending_last_seen_times,
+                        is_({username: t0}))
+
+        assert_that(queue.flush(), is_(1))
+        assert_that(queue.flush(), is_(0))
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = User.get_user(username)
+            assert_that(user.lastSeenTime, is_(t0))
+            assert_that(queue.last_seen_time(username), is_(none()))
+
     @WithSharedApplicationMockDSWithChanges
     def test_user_blacklist(self):
 
@@ -30,9 +30,11 @@ from zope.location.interfaces import LocationError
 from zope.traversing.interfaces import ITraversable
 
 from nti.appserver.interfaces import IUserSearchPolicy
-from nti.appserver.interfaces import IIntIdUserSearchPolicy
 from nti.appserver.interfaces import IExternalFieldResource
 from nti.appserver.interfaces import IExternalFieldTraversable
+from nti.appserver.interfaces import IPrefixIntIdUserSearchPolicy
+
+from nti.appserver.usersearch_index import get_user_search_prefix_index
 
 from nti.dataserver.interfaces import IUser
 from nti.dataserver.interfaces import IEntity
@@ -472,10 +474,13 @@ class _RealnameAliasUserSearchPolicy(_AliasUserSearchPolicy):
         return result
 
 
-@interface.implementer(IIntIdUserSearchPolicy)
+@interface.implementer(IPrefixIntIdUserSearchPolicy)
 class _ComprehensiveUserSearchPolicy(object):
     """
     Searches on username, plus the profile fields.
+
+    :meth:`iter_intids` answers the same query from this process's
+    :mod:`prefix index <nti.appserver.usersearch_index>`.
     """
 
     def __init__(self, context):
@@ -492,6 +497,9 @@ class _ComprehensiveUserSearchPolicy(object):
             return ent_catalog.family.IF.multiunion(intid_sets)
         return ent_catalog.family.IF.Set()
 
+    def iter_intids(self, search_term):
+        return get_user_search_prefix_index().iter_intids(search_term)
+
     def query(self, search_term, provided=IEntity.providedBy):
         result = set()
         intids = self.query_intids(search_term)
@@ -258,7 +258,7 @@ def _ugd_odata_views(pyramid_config):
 										permission=nauth.ACT_READ,
 										request_method='GET')
 
-	_m = {'UserGeneratedData': '_UGDView',
+	_m = {'UserGeneratedData': '_CatalogUGDView',
 		  'RecursiveUserGeneratedData': '_RecursiveUGDView',
 		  'Stream': '_UGDStreamView',
 		  'RecursiveStream': '_RecursiveUGDStreamView',
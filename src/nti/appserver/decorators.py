@@ -38,6 +38,7 @@ from nti.common.nameparser import constants as np_constants
 from nti.dataserver.interfaces import IUser
 from nti.dataserver.interfaces import IContainerContext
 from nti.dataserver.interfaces import IContextAnnotatable
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 from nti.dataserver.interfaces import IDeletedObjectPlaceholder
 
 from nti.externalization.interfaces import StandardExternalFields
@@ -62,11 +63,11 @@ class _SiteNameAdder(Singleton):
 
 
 @component.adapter(IContextAnnotatable)
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class _ContainerContextDecorator(Singleton):
     """
     For :class:`~.IContextAnnotatable` objects, decorate the
-    result with the context_id.
+    result with the context_id (which is set when they are created).
     """
 
     def decorateExternalMapping(self, context, mapping):
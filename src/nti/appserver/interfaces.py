@@ -636,6 +636,19 @@ class IIntIdUserSearchPolicy(IUserSearchPolicy):
         """
 
 
+class IPrefixIntIdUserSearchPolicy(IIntIdUserSearchPolicy):
+
+    def iter_intids(search_term):
+        """
+        Return the intids of the entity objects that match the query,
+        in order of their matching name, without loading any of them.
+
+        :param string search_term: The (already lowercased) term to search for.
+
+        :return: An iterable of intids, without duplicates.
+        """
+
+
 # Additional indexed data storage
 
 
@@ -27,6 +27,7 @@ from nti.dataserver import liking
 
 from nti.dataserver.interfaces import ILikeable
 from nti.dataserver.interfaces import IFavoritable
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 
 from nti.externalization.interfaces import IExternalMappingDecorator
 
@@ -34,7 +35,7 @@ logger = __import__('logging').getLogger(__name__)
 
 
 @component.adapter(ILikeable, IRequest)
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class LikeLinkDecorator(AbstractTwoStateViewLinkDecorator):
     """
     Adds the appropriate like or unlike link.
@@ -80,7 +81,7 @@ def _UnlikeView(request):
     return uncached_in_response(request.context)
 
 
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 @component.adapter(IFavoritable, IRequest)
 class FavoriteLinkDecorator(AbstractTwoStateViewLinkDecorator):
     """
@@ -30,6 +30,7 @@ from nti.appserver.pyramid_authorization import is_deletable
 from nti.dataserver.interfaces import IUser
 from nti.dataserver.interfaces import ICreated
 from nti.dataserver.interfaces import IShouldHaveTraversablePath
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 
 # make sure we use nti.dataserver.traversal to find the root site
 from nti.dataserver.traversal import find_nearest_site as ds_find_nearest_site
@@ -119,7 +120,7 @@ class DefaultEditLinkMaker(object):
 _DefaultEditLinkMaker = DefaultEditLinkMaker  # BWC
 
 
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class EditLinkDecorator(AbstractAuthenticatedRequestAwareDecorator):
     """
     Adds the ``edit`` link relationship to objects that are persistent
@@ -40,11 +40,12 @@ from nti.dataserver import authorization as nauth
 from nti.dataserver import rating as ranking
 
 from nti.dataserver.interfaces import IRatable
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 
 logger = __import__('logging').getLogger(__name__)
 
 
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 @component.adapter(IRatable, IRequest)
 class RatingLinkDecorator(AbstractTwoStateViewLinkDecorator):
     false_view = 'rate'
@@ -9,6 +9,7 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 from paste.deploy.converters import asint
+from paste.deploy.converters import asbool
 
 from zope import component
 from zope import interface
@@ -48,3 +49,13 @@ class SocketSessionSettings(object):
     def SessionServerHeartbeatTimeout(self):
         result = self._settings.get('session_server_heartbeat_timeout')
         return asint(result) if result is not None else result
+
+    @Lazy
+    def SessionReaderMaxFramesPerTransaction(self):
+        result = self._settings.get('session_reader_max_frames_per_transaction')
+        return asint(result) if result is not None else result
+
+    @Lazy
+    def SessionClusterMessageEnvelopes(self):
+        result = self._settings.get('session_cluster_message_envelopes')
+        return asbool(result) if result is not None else result
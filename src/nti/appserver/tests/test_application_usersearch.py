@@ -290,6 +290,31 @@ class TestApplicationUserSearch(ApplicationLayerTest):
         res = testapp.get(path, extra_environ=self._make_extra_environ())
         assert_that(res.json_body['Items'], has_length(5))
 
+    @WithSharedApplicationMockDS
+    @fudge.patch('nti.appserver.usersearch_views._max_results')
+    def test_user_search_max_results_keeps_local_matches(self, max_results):
+        max_results.is_callable().returns(3)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = self._create_user()
+            community = Community.create_community(username=u'TheCommunity')
+            user.record_dynamic_membership(community)
+            for i in range(5):
+                newuser = self._create_user(username=u'sjfriend' + unicode(i))
+                newuser.record_dynamic_membership(community)
+
+            fl = FriendsList(username=u'sjfriends')
+            fl.creator = user
+            user.addContainedObject(fl)
+
+        testapp = TestApp(self.app)
+        path = '/dataserver2/UserSearch/sjfriend'
+        res = testapp.get(path, extra_environ=self._make_extra_environ())
+        # Our friends list isn't cut off by the users found
+        assert_that(res.json_body['Items'], has_length(3))
+        assert_that(res.json_body['Items'][0],
+                    has_entry('Username', 'sjfriends'))
+
     @WithSharedApplicationMockDS
     def test_user_search_username_is_prefix(self):
         with mock_dataserver.mock_db_trans(self.ds):
@@ -18,12 +18,14 @@ from hamcrest import has_length
 from hamcrest import assert_that
 from hamcrest import has_entries
 from hamcrest import has_property
+from hamcrest import same_instance
 from hamcrest import contains_string
 does_not = is_not
 
 from nti.testing.time import time_monotonically_increases
 
 import fudge
+import itertools
 import unittest
 import UserList
 from datetime import datetime
@@ -49,6 +51,8 @@ from pyramid.testing import DummySecurityPolicy
 from nti.appserver import pyramid_authorization
 
 from nti.appserver.ugd_query_views import _UGDView
+from nti.appserver.ugd_query_views import _CatalogUGDView
+from nti.appserver.ugd_query_views import _UGDQueryPlanner
 from nti.appserver.ugd_query_views import _UGDStreamView
 from nti.appserver.ugd_query_views import _RecursiveUGDView
 from nti.appserver.ugd_query_views import _RecursiveUGDStreamView
@@ -313,6 +317,30 @@ class TestUGDQueryViews(NewRequestLayerTest):
 
 			transaction.doom()
 
+	@WithMockDSTrans
+	def test_version_stamp_across_users(self):
+		user = users.User.create_user(self.ds, username='jason.madden@nextthought.com')
+		user2 = users.User.create_user(self.ds, username='steve.johnson@nextthought.com')
+
+		def stamp():
+			request = get_current_request()
+			class Context(object): pass
+			request.context = Context()
+			request.context.user = user
+			request.context.ntiid = u'tag:nti:foo'
+			self.security_policy.userid = user2.username
+			view = _CatalogUGDView(request)
+			return view._get_version_stamp()
+
+		before = stamp()
+		assert_that(before, is_(stamp()))
+
+		# Joining a community that may read the owner's data
+		# changes what the other user can see
+		community = users.Community.create_community(self.ds, username='MathCounts')
+		user2.record_dynamic_membership(community)
+		assert_that(stamp(), is_not(before))
+
 	@WithMockDSTrans
 	def test_ugdrstream_withUGD_not_found_404(self):
 		child_ntiid = ntiids.make_ntiid(provider='ou', specific='test2', nttype='test')
@@ -494,6 +522,49 @@ class TestApplicationUGDQueryViews(ApplicationLayerTest):
 		res = testapp.get(path, params={'accept': USER_MIME_TYPE, 'exclude': USER_MIME_TYPE})
 		assert_that(res.json_body, has_entry('Items', has_length(1)))
 
+	@WithSharedApplicationMockDS
+	def test_not_modified_from_version_stamp(self):
+		with mock_dataserver.mock_db_trans(self.ds):
+			user = self._create_user()
+			note = contenttypes.Note()
+			note.applicableRange = contentrange.ContentRangeDescription()
+			note.containerId = u'tag:nti:foo'
+			note.body = ("Top",)
+			user.addContainedObject(note)
+
+		testapp = TestApp(self.app, extra_environ=self._make_extra_environ())
+		# Queries the planner answers aren't stamped, so use one it doesn't
+		path = '/dataserver2/users/sjohnson@nextthought.com/Pages(tag:nti:foo)/UserGeneratedData?filter=TopLevel'
+		res = testapp.get(path)
+		etag = res.headers['ETag']
+		assert_that(res.json_body, has_entry('Items', has_length(1)))
+
+		testapp.get(path, headers={'If-None-Match': etag}, status=304)
+		# The query is part of it
+		testapp.get(path, params={'batchSize': 1}, headers={'If-None-Match': etag}, status=200)
+
+		with mock_dataserver.mock_db_trans(self.ds):
+			user = users.User.get_user('sjohnson@nextthought.com')
+			note = contenttypes.Note()
+			note.applicableRange = contentrange.ContentRangeDescription()
+			note.containerId = u'tag:nti:foo'
+			note.body = ("Another",)
+			user.addContainedObject(note)
+			note_id = note.id
+
+		res = testapp.get(path, headers={'If-None-Match': etag}, status=200)
+		assert_that(res.json_body, has_entry('Items', has_length(2)))
+		assert_that(res.headers['ETag'], is_not(etag))
+
+		etag = res.headers['ETag']
+		with mock_dataserver.mock_db_trans(self.ds):
+			user = users.User.get_user('sjohnson@nextthought.com')
+			note = user.getContainedObject(u'tag:nti:foo', note_id)
+			note.body = ("Changed",)
+			lifecycleevent.modified(note)
+
+		testapp.get(path, headers={'If-None-Match': etag}, status=200)
+
 	@WithSharedApplicationMockDS
 	def test_sort_filter_page(self):
 		with mock_dataserver.mock_db_trans(self.ds):
@@ -1630,6 +1701,136 @@ class TestApplicationUGDQueryViews(ApplicationLayerTest):
 		matchers = [has_entry('OID', expected_ntiid) for expected_ntiid in expected_ntiids]
 		assert_that(ugd_res['Items'], contains(*matchers))
 
+	@WithSharedApplicationMockDS(users=True, testapp=True)
+	@time_monotonically_increases
+	def test_planned_query(self):
+		"""
+		Queries on just the owner's container are answered from the catalog.
+		"""
+		note_ids = []
+		with mock_dataserver.mock_db_trans(self.ds):
+			user = users.User.get_user(self.extra_environ_default_user)
+			for i in range(10):
+				note = contenttypes.Note()
+				note.applicableRange = contentrange.ContentRangeDescription()
+				note.containerId = u'tag:nti:planned'
+				note.body = ("Note" + str(i),)
+				user.addContainedObject(note)
+				note_ids.append(note.id)
+			for _ in range(3):
+				hl = contenttypes.Highlight()
+				hl.applicableRange = contentrange.ContentRangeDescription()
+				hl.containerId = u'tag:nti:planned'
+				user.addContainedObject(hl)
+		# Newest first
+		note_ids.reverse()
+
+		planned = []
+		original_plan = _UGDQueryPlanner.plan
+		def plan(planner, objects):
+			result = original_plan(planner, objects)
+			planned.append(result)
+			return result
+
+		with fudge.patched_context(_UGDQueryPlanner, 'plan', plan):
+			res = self.fetch_user_ugd('tag:nti:planned',
+									  params={'accept': contenttypes.Note.mime_type,
+											  'batchSize': 3,
+											  'batchStart': 3})
+			assert_that(planned[-1], is_not(none()))
+			res = res.json_body
+			assert_that(res, has_entries('TotalItemCount', 13,
+										 'FilteredTotalItemCount', 10))
+			assert_that(res['Items'],
+						contains(*[has_entry('ID', x) for x in note_ids[3:6]]))
+			self.require_link_href_with_rel(res, 'batch-next')
+			self.require_link_href_with_rel(res, 'batch-prev')
+
+			res = self.fetch_user_ugd('tag:nti:planned',
+									  params={'exclude': contenttypes.Note.mime_type,
+											  'sortOn': 'createdTime'})
+			assert_that(planned[-1], is_not(none()))
+			assert_that(res.json_body['Items'], has_length(3))
+
+			res = self.fetch_user_ugd('tag:nti:planned',
+									  params={'accept': contenttypes.Note.mime_type,
+											  'sortOn': 'createdTime',
+											  'sortOrder': 'ascending',
+											  'batchSize': 2,
+											  'batchStart': 0})
+			assert_that(res.json_body['Items'],
+						contains(*[has_entry('ID', x) for x in reversed(note_ids[-2:])]))
+
+			# Things that need the objects themselves are not planned
+			res = self.fetch_user_ugd('tag:nti:planned',
+									  params={'filter': 'TopLevel',
+											  'accept': contenttypes.Note.mime_type})
+			assert_that(planned[-1], is_(none()))
+			assert_that(res.json_body['Items'], has_length(10))
+
+			res = self.fetch_user_ugd('tag:nti:planned',
+									  params={'sortOn': 'LikeCount'})
+			assert_that(planned[-1], is_(none()))
+			assert_that(res.json_body['Items'], has_length(13))
+
+	@WithSharedApplicationMockDS(users=True, testapp=True)
+	@time_monotonically_increases
+	def test_planned_query_security_counts(self):
+		"""
+		Planned queries that need security report approximate counts,
+		unless exact counts are requested.
+		"""
+		note_ids = []
+		with mock_dataserver.mock_db_trans(self.ds):
+			user = users.User.get_user(self.extra_environ_default_user)
+			for i in range(10):
+				note = contenttypes.Note()
+				note.applicableRange = contentrange.ContentRangeDescription()
+				note.containerId = u'tag:nti:planned_security'
+				note.body = (u"Note" + str(i),)
+				user.addContainedObject(note)
+				note_ids.append(note.id)
+		# Newest first, and only the even ones are visible
+		note_ids.reverse()
+		visible_ids = [x for i, x in enumerate(note_ids) if i % 2 == 1]
+
+		def make_sharing_security_check(unused_view):
+			return lambda x: int(x.body[0][4:]) % 2 == 0
+
+		planned = []
+		original_plan = _UGDQueryPlanner.plan
+		def plan(planner, objects):
+			result = original_plan(planner, objects)
+			planned.append(result)
+			return result
+
+		with fudge.patched_context(_UGDQueryPlanner, 'plan', plan), \
+			 fudge.patched_context(_CatalogUGDView, '_force_apply_security', True), \
+			 fudge.patched_context(_CatalogUGDView, 'make_sharing_security_check',
+								   make_sharing_security_check):
+			res = self.fetch_user_ugd('tag:nti:planned_security',
+									  params={'batchSize': 3,
+											  'batchStart': 0})
+			assert_that(planned[-1], is_not(none()))
+			res = res.json_body
+			assert_that(res, has_entries('FilteredTotalItemCount', 10,
+										 'FilteredTotalItemCountIsApproximate', True))
+			assert_that(res['Items'],
+						contains(*[has_entry('ID', x) for x in visible_ids[:3]]))
+			self.require_link_href_with_rel(res, 'batch-next')
+
+			res = self.fetch_user_ugd('tag:nti:planned_security',
+									  params={'batchSize': 3,
+											  'batchStart': 3,
+											  'exactCounts': 'true'})
+			assert_that(planned[-1], is_not(none()))
+			res = res.json_body
+			assert_that(res, has_entry('FilteredTotalItemCount', 5))
+			assert_that(res, does_not(has_key('FilteredTotalItemCountIsApproximate')))
+			assert_that(res['Items'],
+						contains(*[has_entry('ID', x) for x in visible_ids[3:]]))
+			self.forbid_link_with_rel(res, 'batch-next')
+
 from nti.testing.matchers import is_true, is_false
 
 from nti.appserver.ugd_query_views import _MimeFilter, _ChangeMimeFilter
@@ -1670,3 +1871,35 @@ class TestMime(unittest.TestCase):
 
 	def test_mime_filter_stream_exclude_subclass_order(self):
 		_do_test_mime_filter_exclude_subclass_order(_ChangeMimeFilter, True)
+
+from nti.appserver.ugd_query_views import _LazilySortedTuples
+
+class TestLazilySortedTuples(unittest.TestCase):
+
+	def test_sorts_lazily_and_stably(self):
+		class Uncomparable(object):
+			def __lt__(self, other):
+				raise AssertionError("Values should not be compared")
+			__gt__ = __le__ = __ge__ = __eq__ = __lt__
+
+		values = [Uncomparable() for _ in range(5)]
+		keys = [3, 1, 3, 0, 2]
+		lazy = _LazilySortedTuples(zip(keys, values))
+		assert_that(lazy, has_length(5))
+
+		sorted_tuples = list(lazy)
+		assert_that([x[0] for x in sorted_tuples], is_([0, 1, 2, 3, 3]))
+		# Equal keys keep their original order
+		assert_that(sorted_tuples[3][1], is_(same_instance(values[0])))
+		assert_that(sorted_tuples[4][1], is_(same_instance(values[2])))
+
+	def test_security_only_checks_page(self):
+		checked = []
+		def security_check(x):
+			checked.append(x)
+			return x[0] % 2 == 0
+
+		lazy = _LazilySortedTuples((x, x) for x in reversed(range(100)))
+		page = list(itertools.islice(itertools.ifilter(security_check, lazy), 3))
+		assert_that([x[0] for x in page], is_([0, 2, 4]))
+		assert_that(checked, has_length(5))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import assert_that
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+
+from zope.lifecycleevent import modified
+
+from nti.appserver.usersearch_index import UserSearchPrefixIndex
+from nti.appserver.usersearch_index import get_user_search_prefix_index
+
+from nti.dataserver.users.communities import Community
+
+from nti.dataserver.users.entity import Entity
+
+from nti.dataserver.users.interfaces import IFriendlyNamed
+
+from nti.dataserver.users.users import User
+
+from nti.app.testing.application_webtest import ApplicationLayerTest
+
+from nti.app.testing.decorators import WithSharedApplicationMockDS
+
+from nti.dataserver.tests import mock_dataserver
+
+
+class TestUserSearchPrefixIndex(ApplicationLayerTest):
+
+    @WithSharedApplicationMockDS
+    def test_iter_intids(self):
+        index = get_user_search_prefix_index()
+        with mock_dataserver.mock_db_trans(self.ds):
+            users = [self._create_user(username=u'prefixalpha1'),
+                     self._create_user(username=u'prefixalpha2'),
+                     self._create_user(username=u'prefixbeta')]
+            intids = component.getUtility(IIntIds)
+            alpha1, alpha2, beta = [intids.getId(x) for x in users]
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            assert_that(list(index.iter_intids(u'prefixalpha')),
+                        contains(alpha1, alpha2))
+            assert_that(list(index.iter_intids(u'prefix')),
+                        contains(alpha1, alpha2, beta))
+
+            user = User.get_user(u'prefixbeta')
+            IFriendlyNamed(user).alias = u'Prefixalpha0'
+            modified(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            # Found by its new alias, first
+            assert_that(list(index.iter_intids(u'prefixalpha')),
+                        contains(beta, alpha1, alpha2))
+
+            user = User.get_user(u'prefixbeta')
+            IFriendlyNamed(user).alias = u'Other'
+            modified(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            # But not by its old one
+            assert_that(list(index.iter_intids(u'prefixalpha')),
+                        contains(alpha1, alpha2))
+
+    @WithSharedApplicationMockDS
+    def test_member_intids(self):
+        index = get_user_search_prefix_index()
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = self._create_user(username=u'prefixmember1')
+            community = Community.create_community(username=u'prefixcommunity')
+            user.record_dynamic_membership(community)
+            intids = component.getUtility(IIntIds)
+            member1 = intids.getId(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            community = Entity.get_entity(u'prefixcommunity')
+            assert_that(list(index.member_intids(community)),
+                        contains(member1))
+
+            user = self._create_user(username=u'prefixmember2')
+            user.record_dynamic_membership(community)
+            member2 = intids.getId(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            community = Entity.get_entity(u'prefixcommunity')
+            assert_that(list(index.member_intids(community)),
+                        contains(*sorted((member1, member2))))
+
+    @WithSharedApplicationMockDS
+    def test_changes_from_other_processes(self):
+        # The index of another process, as if subscribed to changes
+        index = UserSearchPrefixIndex()
+        index._ensure_listener = lambda: None
+        index._handle_message({'type': 'subscribe', 'data': 1})
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = self._create_user(username=u'prefixgamma')
+            intid = component.getUtility(IIntIds).getId(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            assert_that(list(index.iter_intids(u'prefixgamma')),
+                        contains(intid))
+            built = index.built
+
+            user = User.get_user(u'prefixgamma')
+            IFriendlyNamed(user).alias = u'Prefixdelta'
+            modified(user)
+
+        with mock_dataserver.mock_db_trans(self.ds):
+            # We weren't told yet
+            assert_that(list(index.iter_intids(u'prefixdelta')),
+                        contains())
+            index._handle_message({'type': 'message', 'data': str(intid)})
+            assert_that(list(index.iter_intids(u'prefixdelta')),
+                        contains(intid))
+            # Without rebuilding
+            assert_that(index.built, is_(built))
@@ -11,6 +11,11 @@ This tween instruments the following metrics:
 
  - <workerid>.connection_pool.used : The number of low level connections currently being used for the given worker
  - <workerid>.connection_pool.free : The number of remaining connections for the given worker.
+ - <workerid>.memcache_pool.used : The number of memcache clients currently being used for the given worker
+ - <workerid>.memcache_pool.free : The number of remaining memcache clients for the given worker.
+ - <workerid>.externalization_cache.hits : The number of externalizations the given worker found in its cache.
+ - <workerid>.externalization_cache.misses : The number of cacheable externalizations the given worker did not find.
+ - <workerid>.externalization_cache.size : The number of externalizations cached by the given worker.
 
 .. note:: workerid is filled in from the environment variable `NTI_WORKER_IDENTIFIER`.
           This is environment is established when the worker is initially forked.
@@ -33,8 +38,13 @@ from perfmetrics import statsd_client
 from perfmetrics import statsd_client_from_uri
 from perfmetrics import statsd_client_stack
 
+from zope import component
+
 from zope.cachedescriptors.property import Lazy
 
+from nti.dataserver.interfaces import IMemcacheClient
+from nti.dataserver.interfaces import IExternalizationCache
+
 
 def includeme(config):
     statsd_uri = config.registry.settings.get('statsd_uri')
@@ -71,6 +81,18 @@ class PerformanceHandler(object):
     def free_metric_name(self):
         return self.worker_id + '.connection_pool.free'
 
+    @Lazy
+    def memcache_used_metric_name(self):
+        return self.worker_id + '.memcache_pool.used'
+
+    @Lazy
+    def memcache_free_metric_name(self):
+        return self.worker_id + '.memcache_pool.free'
+
+    @Lazy
+    def externalization_cache_metric_prefix(self):
+        return self.worker_id + '.externalization_cache.'
+
     def classify_request(self, request):
         """
         Classifies the request for segmenting the count
@@ -134,6 +156,21 @@ class PerformanceHandler(object):
 
                     statsd_client.gauge(self.used_metric_name, used_count)
                     statsd_client.gauge(self.free_metric_name, free)
+
+                    # Not all memcache clients are pools
+                    memcache_pool = component.queryUtility(IMemcacheClient)
+                    if hasattr(memcache_pool, 'free_count'):
+                        free = memcache_pool.free_count()
+                        statsd_client.gauge(self.memcache_used_metric_name,
+                                            memcache_pool.size - free)
+                        statsd_client.gauge(self.memcache_free_metric_name, free)
+
+                    externalization_cache = component.queryUtility(IExternalizationCache)
+                    if externalization_cache is not None:
+                        prefix = self.externalization_cache_metric_prefix
+                        statsd_client.gauge(prefix + 'hits', externalization_cache.hits)
+                        statsd_client.gauge(prefix + 'misses', externalization_cache.misses)
+                        statsd_client.gauge(prefix + 'size', len(externalization_cache))
         finally:
             statsd_client_stack.pop()
 
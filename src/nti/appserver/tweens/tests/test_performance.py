@@ -22,8 +22,14 @@ from pyramid.testing import DummyRequest as PyramidDummyRequest
 from perfmetrics import statsd_client
 from perfmetrics import statsd_client_stack
 
+from zope import component
+
 from nti.appserver.tweens.performance import performance_tween_factory
 
+from nti.dataserver.interfaces import IMemcacheClient
+
+from nti.dataserver.memcache_client import PooledMemcacheClient
+
 from nti.fakestatsd import FakeStatsDClient
 from nti.fakestatsd.matchers import is_counter
 from nti.fakestatsd.matchers import is_timer
@@ -99,6 +105,27 @@ class TestConnectionPoolStats(unittest.TestCase):
         assert_that(guages, has_entries('ds1-local.foo.connection_pool.used', '1',
                                         'ds1-local.foo.connection_pool.free', '99'))
 
+    def test_tween_logs_memcache_pool(self):
+        request, response = self.mock_request_response()
+
+        pool = PooledMemcacheClient(['localhost:11211'], size=5,
+                                    client_factory=object)
+        with pool._client():
+            pass
+        with pool._client():
+            gsm = component.getGlobalSiteManager()
+            gsm.registerUtility(pool, IMemcacheClient)
+            try:
+                tween = performance_tween_factory(lambda unused_x: response, None)
+                tween(request)
+            finally:
+                gsm.unregisterUtility(pool, IMemcacheClient)
+
+        guages, _ = self.sent_stats()
+
+        assert_that(guages, has_entries('ds1-local.foo.memcache_pool.used', '1',
+                                        'ds1-local.foo.memcache_pool.free', '4'))
+
     def test_response_counter(self):
 
         request, response = self.mock_request_response()
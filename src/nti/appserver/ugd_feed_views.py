@@ -119,6 +119,8 @@ class AbstractFeedView(object):
         response = request.response
 
         stream_view = self._data_callable_factory(request)
+        # Its conditional request handling is for its own representation
+        stream_view._use_version_stamp = False
         ext_dict = stream_view()  # May raise HTTPNotFound
         response.last_modified = ext_dict['Last Modified']
 
@@ -16,6 +16,8 @@ import itertools
 import functools
 from numbers import Number
 
+from perfmetrics import statsd_client
+
 from zope import component
 from zope import interface
 
@@ -27,8 +29,11 @@ from nti.app.authentication import get_remote_user
 
 from nti.app.base.abstract_views import AbstractAuthenticatedView
 
+from nti.app.renderers.caching import VersionStampCacheController
+
 from nti.app.renderers.interfaces import IUncacheableInResponse
 from nti.app.renderers.interfaces import IUGDExternalCollection
+from nti.app.renderers.interfaces import IVersionStampedUGDExternalCollection
 
 from nti.appserver import MessageFactory as _
 from nti.appserver import httpexceptions as hexc
@@ -43,6 +48,8 @@ from nti.appserver.interfaces import get_principal_ugd_filter
 
 from nti.appserver.pyramid_authorization import is_readable
 
+from nti.common.string import is_true
+
 from nti.coremetadata.interfaces import IDeletedObjectPlaceholder
 
 from nti.dataserver import liking
@@ -61,6 +68,16 @@ from nti.dataserver.interfaces import IThreadable
 from nti.dataserver.interfaces import IUsernameIterable
 from nti.dataserver.interfaces import IStreamChangeEvent
 
+from nti.dataserver.metadata.index import IX_TOPICS
+from nti.dataserver.metadata.index import IX_CREATOR
+from nti.dataserver.metadata.index import IX_MIMETYPE
+from nti.dataserver.metadata.index import IX_SHAREDWITH
+from nti.dataserver.metadata.index import IX_CONTAINERID
+from nti.dataserver.metadata.index import IX_CREATEDTIME
+from nti.dataserver.metadata.index import IX_LASTMODIFIED
+from nti.dataserver.metadata.index import TP_DELETED_PLACEHOLDER
+from nti.dataserver.metadata.index import ValidatingContainerId
+
 from nti.dataserver.metadata.index import get_metadata_catalog
 
 from nti.dataserver.sharing import SharingContextCache
@@ -309,7 +326,7 @@ def _creator_based_predicate_factory(accepted_usernames):
 		return creator_username in accepted_usernames
 	return _filter
 
-def _ifollow_predicate_factory( request, and_me=False, expand_nested=True ):
+def _ifollow_usernames( request, and_me=False, expand_nested=True ):
 	# the 'I' means the current user, not the one whose date we look at
 	# (not  request.context.user)
 	me = get_remote_user(request)
@@ -324,7 +341,10 @@ def _ifollow_predicate_factory( request, and_me=False, expand_nested=True ):
 			# Expand things that should be expanded, such as DFLs
 			for nested_username in IUsernameIterable(followed, ()):
 				following_usernames.add( nested_username )
+	return following_usernames
 
+def _ifollow_predicate_factory( request, and_me=False, expand_nested=True ):
+	following_usernames = _ifollow_usernames( request, and_me, expand_nested )
 	result = _creator_based_predicate_factory( following_usernames )
 	return result
 
@@ -488,6 +508,196 @@ def _communityforum_xxx_isReadableByAnyIdOfUser( self, user, ids, family ):
 from nti.dataserver.contenttypes.forums.forum import CommunityForum
 CommunityForum.xxx_isReadableByAnyIdOfUser = _communityforum_xxx_isReadableByAnyIdOfUser
 
+class _LazilySortedTuples(object):
+	"""
+	An iterable of the ``(key, value)`` tuples from `iterable`, in
+	ascending key order, sorted lazily: the tuples are heapified up front,
+	and each one is only put in order as it is read. Equal keys keep the
+	order they had in `iterable`, and the values are never compared.
+	"""
+
+	__slots__ = ('_heap',)
+
+	def __init__(self, iterable):
+		self._heap = [(key, index, value) for index, (key, value) in enumerate(iterable)]
+		heapq.heapify(self._heap)
+
+	def __len__(self):
+		return len(self._heap)
+
+	def __iter__(self):
+		heap = self._heap
+		heappop = heapq.heappop
+		while heap:
+			key, _, value = heappop(heap)
+			yield key, value
+
+class _UGDQueryPlan(object):
+	"""
+	The result of planning a UGD query: sets of intids from the
+	metadata catalog, and how to order them.
+	"""
+
+	def __init__(self, catalog, total_intids, intids, sort_on, reverse):
+		self.catalog = catalog
+		#: All the intids in the owner's container
+		self.total_intids = total_intids
+		#: The intids that pass all the (non-security) filters
+		self.intids = intids
+		self.sort_on = sort_on
+		self.reverse = reverse
+
+	def sorted_intids(self, limit=None):
+		"""
+		Return the filtered intids in the requested order, reading
+		the sort index only as far as needed for `limit` items.
+		"""
+		return self.catalog[self.sort_on].sort(self.intids,
+											   limit=limit,
+											   reverse=self.reverse)
+
+class _UGDQueryPlanner(object):
+	"""
+	Translates the query parameters of a :class:`_UGDView` into
+	intersections of intid sets from the metadata catalog plus a sorted
+	index scan, so that only the requested page of objects has to be
+	loaded.
+
+	Not every query can be answered this way; :meth:`plan` returns
+	None when the objects themselves must be examined (for example, the
+	``TopLevel`` and ``Favorite`` filters, sorting on ``LikeCount``,
+	batching around an object, or data shared with the user).
+	"""
+
+	#: Filters that restrict the creator of the objects; these map
+	#: to a function of the request returning the acceptable usernames.
+	CREATOR_FILTERS = {
+		'OnlyMe': lambda request: (request.authenticated_userid,),
+		'IFollow': _ifollow_usernames,
+		'IFollowDirectly': lambda request: _ifollow_usernames(request, expand_nested=False),
+		'IFollowAndMe': lambda request: _ifollow_usernames(request, and_me=True),
+	}
+
+	#: Filters that exclude deleted placeholders
+	NOT_DELETED_FILTERS = ('NotDeleted', '_NotDeleted')
+
+	#: Sort keys we can answer with an index, mapped to that index
+	SORT_INDEXES = {
+		'lastModified': IX_LASTMODIFIED,
+		'createdTime': IX_CREATEDTIME,
+		'CreatedTime': IX_CREATEDTIME,
+	}
+
+	#: Batching parameters that require looking at the objects
+	UNSUPPORTED_PARAMS = ('batchAround', 'batchContaining',
+						  'batchAfterOID', 'batchBeforeOID')
+
+	def __init__(self, view, catalog=None):
+		self.view = view
+		self.request = view.request
+		self.catalog = get_metadata_catalog() if catalog is None else catalog
+
+	def _has_only_default_principal_filters(self):
+		filters = component.subscribers((self.view.user,), IPrincipalUGDFilter)
+		return all(isinstance(f, _DefaultPrincipalUGDFilter) for f in filters)
+
+	def _is_plannable(self, objects):
+		view = self.view
+		if self.catalog is None or view.user is None or not view.ntiid:
+			return False
+		# Only the owner's own container may contribute
+		if not objects or any(x for x in objects[1:]):
+			return False
+		# Container ids the catalog refuses to index (mostly)
+		if ntiids.is_ntiid_of_types(view.ntiid, ValidatingContainerId._IGNORED_TYPES):
+			return False
+		if view.top_level_context_filters or view.transcript_user_filter:
+			return False
+		params = self.request.params
+		if any(params.get(name) for name in self.UNSUPPORTED_PARAMS):
+			return False
+		if view._get_sort_key_order()[0] not in self.SORT_INDEXES:
+			return False
+
+		filter_names = view._get_filter_names()
+		if 'Pinned' in filter_names or 'NotPinned' in filter_names:
+			return False
+		predicate_count = 0
+		for name in filter_names:
+			if name in self.CREATOR_FILTERS or name in self.NOT_DELETED_FILTERS:
+				predicate_count += 1
+			elif name in view.FILTER_NAMES:
+				return False
+		if view._get_accept_types() or view._get_exclude_types():
+			predicate_count += 1
+		# A union of several filters is not worth planning
+		if predicate_count > 1 and view._get_filter_operator() == Operator.union:
+			return False
+		return self._has_only_default_principal_filters()
+
+	def _apply(self, name, query):
+		return self.catalog[name].apply(query)
+
+	def plan(self, objects):
+		"""
+		Return a :class:`_UGDQueryPlan` for the query, or None if the query
+		cannot be answered from the catalog.
+
+		:param objects: The sequence returned by ``getObjectsForId``.
+		"""
+		if not self._is_plannable(objects):
+			return None
+
+		view = self.view
+		catalog = self.catalog
+		family = catalog.family
+		intersection = family.IF.intersection
+		difference = family.IF.difference
+
+		total_intids = intersection(self._apply(IX_CONTAINERID, {'any_of': (view.ntiid,)}),
+									self._apply(IX_CREATOR, {'any_of': (view.user.username,)}))
+		intids = total_intids
+
+		accept_types = view._get_accept_types()
+		exclude_types = view._get_exclude_types()
+		if accept_types:
+			if '*/*' not in accept_types:
+				intids = intersection(intids, self._apply(IX_MIMETYPE, {'any_of': accept_types}))
+		elif exclude_types and '*/*' not in exclude_types:
+			intids = difference(intids, self._apply(IX_MIMETYPE, {'any_of': exclude_types}))
+
+		for name in view._get_filter_names():
+			if name in self.CREATOR_FILTERS:
+				usernames = self.CREATOR_FILTERS[name](self.request)
+				intids = intersection(intids, self._apply(IX_CREATOR, {'any_of': tuple(usernames)}))
+			elif name in self.NOT_DELETED_FILTERS:
+				deleted = catalog[IX_TOPICS][TP_DELETED_PLACEHOLDER].getExtent()
+				intids = difference(intids, deleted)
+
+		# Like the predicate, ignore names that do not resolve
+		shared_with = [name for name in view._get_shared_with_names()
+					   if Entity.get_entity(name) is not None]
+		if shared_with:
+			intids = intersection(intids, self._apply(IX_SHAREDWITH, {'any_of': shared_with}))
+
+		batch_before_time, batch_after_time = view._get_batch_times()
+		if batch_before_time or batch_after_time:
+			created_index = catalog[IX_CREATEDTIME]
+			normalize = created_index.normalizer.value
+			# Mutually exclusive, and both exclusive of the boundary
+			if batch_before_time:
+				query = (None, normalize(batch_before_time), False, True)
+			else:
+				query = (normalize(batch_after_time), None, True, False)
+			intids = intersection(intids, created_index.index.apply({'between': query}))
+
+		sort_on, sort_order = view._get_sort_key_order()
+		return _UGDQueryPlan(catalog,
+							 total_intids if total_intids is not None else family.IF.LFSet(),
+							 intids if intids is not None else family.IF.LFSet(),
+							 self.SORT_INDEXES[sort_on],
+							 sort_order != 'ascending')
+
 from nti.app.externalization.view_mixins import BatchingUtilsMixin
 
 @interface.implementer(INamedLinkView)
@@ -519,6 +729,35 @@ class _UGDView(AbstractAuthenticatedView,
 	#: Skip any security checks
 	_skip_security = False
 
+	#: Set this to true if queries that only involve the owner's own
+	#: container may be answered with the metadata catalog instead of
+	#: loading, filtering and sorting every object in the container.
+	#: Only views that use the default ``getObjectsForId``, ``get_owned``
+	#: and filtering should do so. See :class:`_UGDQueryPlanner`.
+	_use_query_planner = False
+
+	#: Set this to true if the results are determined by the
+	#: :meth:`~.SharingTargetMixin.getReadableContainerVersion` of the
+	#: user for the container (along with the remote user and the query),
+	#: so conditional requests can be answered before doing any work.
+	#: Only views that use the default ``getObjectsForId`` with
+	#: ``get_owned``, ``get_shared`` or ``getContainedStream`` should do so.
+	#: Results from the query planner aren't stamped, because the
+	#: metadata catalog may not have indexed what the stamp includes.
+	_use_version_stamp = False
+
+	#: Set this to true if the view looks in all the containers of the
+	#: user, and so must use the version stamp of all of them.
+	_version_stamp_all_containers = False
+
+	#: Filtering by these parameters depends on more than the data in
+	#: the containers, so requests that use them can't be answered
+	#: from the version stamp.
+	_VERSION_STAMP_EXCLUDED_PARAMS = ('topLevelContextFilter', 'transcriptUser')
+
+	#: The version stamp checked before doing any work, if any.
+	version_stamp = None
+
 	#: Set this to false, either dynamically or at the class level,
 	#: if _sort_filter_batch_objects does not need to do any sort of further
 	#: filtering: not the value from _make_complete_predicate, nor
@@ -583,18 +822,67 @@ class _UGDView(AbstractAuthenticatedView,
 			if self.user != self.remoteUser:
 				raise hexc.HTTPForbidden()
 
+	def _get_version_stamp(self):
+		if not self._use_version_stamp:
+			return None
+		params = self.request.params
+		if any(params.get(x) for x in self._VERSION_STAMP_EXCLUDED_PARAMS):
+			return None
+		get_version = getattr(self.user, 'getReadableContainerVersion', None)
+		if get_version is None:
+			return None
+		containerId = None if self._version_stamp_all_containers else self.ntiid
+		result = get_version(containerId)
+		remote_user = self.remoteUser
+		if remote_user is not None and remote_user != self.user:
+			# What another user may see of our user's data also
+			# depends on their own relationships (e.g., joining a
+			# community that can read it)
+			get_relationships_version = getattr(remote_user, 'getRelationshipsVersion', None)
+			if get_relationships_version is None:
+				return None
+			result += ((remote_user.username, get_relationships_version()),)
+		return result
+
+	def check_version_stamp(self):
+		"""
+		If the client already has the current version of our results,
+		raise :class:`.HTTPNotModified` before we compute them.
+		"""
+		stamp = self._get_version_stamp()
+		if stamp is None:
+			return
+		context = self.request.context
+		VersionStampCacheController(context, stamp)(context, {'request': self.request})
+		self.version_stamp = stamp
+		self.result_iface = IVersionStampedUGDExternalCollection
+
 	def __call__( self ):
 		self.check_cross_user()
+		if not self._use_query_planner:
+			self.check_version_stamp()
 		# Pre-flight the batch; save in case we mutate later.
 		self.user_batch_size, self.user_batch_start = self._get_batch_size_start()
 
 		user, ntiid = self.user, self.ntiid
 		the_objects = self.getObjectsForId( user, ntiid )
 
-		result = self._sort_filter_batch_objects( the_objects )
+		result = None
+		if self._use_query_planner:
+			plan = _UGDQueryPlanner(self).plan( the_objects )
+			if plan is not None:
+				result = self._planned_sort_filter_batch_objects( the_objects, plan )
+			else:
+				# The metadata catalog is indexed after the version
+				# stamp changes, so only unplanned results are stamped
+				self.check_version_stamp()
+		if result is None:
+			result = self._sort_filter_batch_objects( the_objects )
 		result.__parent__ = self.request.context
 		result.__name__ = ntiid
 		result.__data_owner__ = user
+		if self.version_stamp is not None:
+			result.__version_stamp__ = self.version_stamp
 		if self.request.method == 'HEAD':
 			result['Items'] = () # avoid externalization
 		return result
@@ -881,15 +1169,20 @@ class _UGDView(AbstractAuthenticatedView,
 			items = (x for x in items if x[1].createdTime > batch_after_time)
 		return items, did_filter
 
-	def __do_batch(self, merged, number_items_needed):
+	def __do_batch(self, merged, number_items_needed, security_check=None):
 		"""
 		Do whatever batch support we need, whether batching by timestamp
 		or batching around a given OID.
+
+		If given, the `security_check` is applied lazily to the
+		(key, value) tuples after the (cheap) timestamp filtering.
 		"""
 		merged, did_filter = self._do_timestamp_filtering( merged )
 
 		# Mutually exclusive.
 		if not did_filter:
+			if security_check is not None:
+				merged = itertools.ifilter( security_check, merged )
 			batch_size, batch_start = self._get_batch_size_start()
 			batch_object = 	self.request.params.get( 'batchAround', '' ) \
 						or 	self.request.params.get( 'batchContaining', '' ) \
@@ -915,9 +1208,13 @@ class _UGDView(AbstractAuthenticatedView,
 		else:
 			# Make sure we set number_items_needed to our new filtered size.
 			# This prevents extra batch links when no more items exist.
+			# Counting happens before the security check so that it
+			# only has to look at the batch (so this may overestimate).
 			# TODO: Need some work to clear/update the counts reported.
 			merged = tuple( merged )
 			number_items_needed = len( merged )
+			if security_check is not None:
+				merged = itertools.ifilter( security_check, merged )
 		return merged, number_items_needed
 
 	def _sort_filter_batch_objects( self, objects ):
@@ -1073,6 +1370,13 @@ class _UGDView(AbstractAuthenticatedView,
 			contained within these top-level-contexts. Currently, only a union of given
 			contexts is supported.
 
+		exactCounts
+			If true, the (expensive) cross-user security check is applied
+			to every matching object so that ``FilteredTotalItemCount`` is
+			exact. By default, the security check only runs on as many objects
+			as needed to fill the requested page, and when it applies,
+			``FilteredTotalItemCountIsApproximate`` is added to the result.
+
 		:param dict result: The result dictionary that will be returned to the client.
 			Contains the ``Items`` list of all items found. You may add keys to the dictionary.
 			You may (and should) modify the Items list directly.
@@ -1098,6 +1402,7 @@ class _UGDView(AbstractAuthenticatedView,
 				return security_check(x[1])
 		else:
 			tuple_security_check = security_check
+		exact_counts = needs_security and self._wants_exact_counts()
 
 		total_item_count = sum((len(x) for x in objects if x is not None))
 
@@ -1132,22 +1437,12 @@ class _UGDView(AbstractAuthenticatedView,
 		# These are reified.
 		heap_key = lambda x: (sort_key_function(x), x)
 		sortable_iterables = [itertools.imap(heap_key, x) for x in iterables]
-		if number_items_needed < total_item_count and number_items_needed < 500: # Works best for "small values"
-			# If we can get away with just partially sorting the iterables,
-			# because we're paging, do it
-			# TODO: This is experimental. By doing this, we have fewer total objects
-			# and smaller lists in memory at once. But the consequence is that our
-			# permission check gets done on every object, which may be the bottleneck
-			# NOTE: At least in alpha, this is the bottleneck. we're better off pulling the filtered
-			# list in to memory
-			_USE_SMALLEST = False
-			if _USE_SMALLEST:
-				if needs_security:
-					sortable_iterables = [itertools.ifilter( tuple_security_check, x ) for x in sortable_iterables]
-					needs_security = False
-				sorted_sublists = [heapq.nsmallest( number_items_needed, x ) for x in sortable_iterables]
-			else:
-				sorted_sublists = [sorted(x, key=lambda x: x[0]) for x in sortable_iterables]
+		if number_items_needed < total_item_count and not exact_counts:
+			# We're paging, so we only need the first few items in order.
+			# Heapify each list (linear) and pop items lazily; the security
+			# check below will then only see as many items as it takes
+			# to fill the page.
+			sorted_sublists = [_LazilySortedTuples(x) for x in sortable_iterables]
 		else:
 			# Note that we are already computing the key once, no need to include the other
 			# object in the comparison
@@ -1155,13 +1450,9 @@ class _UGDView(AbstractAuthenticatedView,
 
 		self._update_last_modified_after_sort( objects, result )
 
-		result['FilteredTotalItemCount'] = sum((len(x) for x in sorted_sublists)) # this may be an approximation
-
-		# Apply cross-user security if needed
-		# Do this after all the filtering because it's the most expensive
-		# filter of all
-		if needs_security:
-			sorted_sublists = [itertools.ifilter( tuple_security_check, x ) for x in sorted_sublists]
+		# This does not take security into account unless exact counts were
+		# requested, and so may be an overestimate
+		result['FilteredTotalItemCount'] = sum((len(x) for x in sorted_sublists))
 
 		# Now merge the lists altogether if we didn't already
 		# `merged` will be an iterable of the sorted tuples: (key, value)
@@ -1172,18 +1463,101 @@ class _UGDView(AbstractAuthenticatedView,
 		else:
 			merged = ()
 
+		# Apply cross-user security if needed. Do this after all the filtering
+		# because it's the most expensive filter of all. Unless we need
+		# exact counts, this is lazy, and only runs until the batch is filled.
+		if needs_security:
+			if exact_counts:
+				merged = [x for x in merged if tuple_security_check(x)]
+				result['FilteredTotalItemCount'] = len(merged)
+				if batch_size is not None and batch_start is not None:
+					number_items_needed = min(batch_size + batch_start + 2, len(merged))
+				else:
+					number_items_needed = len(merged)
+				tuple_security_check = None
+			else:
+				result['FilteredTotalItemCountIsApproximate'] = True
+		else:
+			tuple_security_check = None
+
 		# Before batching, bubble pinned items to the top, if necessary.
-		merged, number_items_needed = self.__do_batch(merged, number_items_needed)
+		merged, number_items_needed = self.__do_batch(merged, number_items_needed,
+													  tuple_security_check)
 		# These may have changed, pull them right before we need them
 		batch_size, batch_start = self._get_batch_size_start()
 		self._batch_tuple_iterable(result, merged, number_items_needed, batch_size, batch_start)
 		return result
 
+	def _wants_exact_counts(self):
+		"""
+		Whether the client asked for exact counts (``exactCounts=true``),
+		at the cost of applying security to every object.
+		"""
+		return is_true(self.request.params.get('exactCounts'))
+
 	def _update_last_modified_after_sort(self, objects, result ):
 		result['Last Modified'] = result.lastModified
 
+	def _planned_sort_filter_batch_objects( self, objects, plan ):
+		"""
+		Like :meth:`_sort_filter_batch_objects`, but answers the query
+		using the metadata catalog, materializing only the objects
+		on the requested page, as given by the :class:`_UGDQueryPlan`.
+		"""
+		result = LocatedExternalDict()
+		interface.alsoProvides( result, self.result_iface )
+		result.lastModified = _lists_and_dicts_to_iterables( objects[:1] )[1]
+		if not result.lastModified:
+			interface.alsoProvides( result, IUncacheableInResponse )
+		self._update_last_modified_after_sort( objects, result )
+
+		result['TotalItemCount'] = len(plan.total_intids)
+		filtered_count = len(plan.intids)
+
+		needs_security, security_check = self._get_security_check()
+		uidutil = component.getUtility(IIntIds)
+		items = None
+		if needs_security and self._wants_exact_counts():
+			items = [x for x in ResultSet( plan.sorted_intids(), uidutil, True )
+					 if security_check(x)]
+			filtered_count = len(items)
+		elif needs_security:
+			# With security, we may reject some; keep reading the
+			# index lazily until we have enough. As in
+			# _sort_filter_batch_objects, the count is then taken
+			# before security.
+			items = itertools.ifilter( security_check,
+									   ResultSet( plan.sorted_intids(), uidutil, True ) )
+			result['FilteredTotalItemCountIsApproximate'] = True
+		result['FilteredTotalItemCount'] = filtered_count
+
+		batch_size, batch_start = self._get_batch_size_start()
+		number_items_needed = filtered_count
+		if batch_size is not None and batch_start is not None:
+			number_items_needed = min(batch_size + batch_start + 2, filtered_count)
+		if items is None:
+			items = ResultSet( plan.sorted_intids( number_items_needed or None ), uidutil, True )
+
+		self._batch_items_iterable( result, items,
+									number_items_needed=number_items_needed,
+									batch_size=batch_size,
+									batch_start=batch_start,
+									ignore_invalid=self.ignore_broken )
+		return result
+
 UGDView = _UGDView # make public
 
+@interface.implementer(INamedLinkView)
+class _CatalogUGDView(_UGDView):
+	"""
+	The view registered for ``UserGeneratedData``. Queries that
+	only involve the owner's container are answered with the metadata
+	catalog.
+	"""
+
+	_use_query_planner = True
+	_use_version_stamp = True
+
 @interface.implementer(INamedLinkView)
 class RecursiveUGDView(_UGDView):
 	"""
@@ -1392,20 +1766,40 @@ class _ChangeMimeFilter(_MimeFilter):
 	def _object( self, o ):
 		return o.object
 
+class _StreamChangesLoadedMixin(object):
+	"""
+	Reports how many change objects were loaded from the stream
+	containers to answer the request, as the statsd metric
+	``nti.ugd.stream.changes_loaded`` (and in the debug log).
+	"""
+
+	changes_loaded_metric_name = 'nti.ugd.stream.changes_loaded'
+
+	def __call__( self ):
+		result = super(_StreamChangesLoadedMixin, self).__call__()
+		changes_loaded = self.context_cache.changes_loaded
+		logger.debug("Loaded %s change(s) for stream of %s in %s",
+					 changes_loaded, self.user, self.ntiid)
+		client = statsd_client()
+		if client is not None:
+			client.incr(self.changes_loaded_metric_name, changes_loaded)
+		return result
+
 @interface.implementer(INamedLinkView)
-class _UGDStreamView(_UGDView):
+class _UGDStreamView(_StreamChangesLoadedMixin, _UGDView):
 
 	get_owned = User.getContainedStream
 	get_shared = None
 	_my_objects_may_be_empty = False
 	_support_cross_user = False
+	_use_version_stamp = True
 
 	_MIME_FILTER_FACTORY = _ChangeMimeFilter
 
 UGDStreamView = _UGDStreamView
 
 @interface.implementer(INamedLinkView)
-class _RecursiveUGDStreamView(RecursiveUGDView):
+class _RecursiveUGDStreamView(_StreamChangesLoadedMixin, RecursiveUGDView):
 	"""
 	Accepts all the regular sorting and paging parameters (though note, you
 	probably do not want to sort by anything other than the default, lastModified descending).
@@ -1433,6 +1827,9 @@ class _RecursiveUGDStreamView(RecursiveUGDView):
 	get_owned = User.getContainedStream
 	get_shared = None
 
+	_use_version_stamp = True
+	_version_stamp_all_containers = True
+
 	# Default to paging us
 	_DEFAULT_BATCH_SIZE = 100
 	_DEFAULT_BATCH_START = 0
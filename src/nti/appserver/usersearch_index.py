@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A per-process, in-memory prefix index of the names that user search
+matches on, used to answer autocomplete queries without loading
+entities that won't be returned.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from bisect import bisect_left
+
+import six
+
+import gevent
+
+import transaction
+
+from zope import component
+
+from zope.catalog.interfaces import ICatalog
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdAddedEvent
+from zope.intid.interfaces import IIntIdRemovedEvent
+
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from nti.coremetadata.interfaces import IX_ALIAS
+from nti.coremetadata.interfaces import IX_TOPICS
+from nti.coremetadata.interfaces import IX_USERNAME
+from nti.coremetadata.interfaces import IX_IS_COMMUNITY
+from nti.coremetadata.interfaces import IX_IS_DEACTIVATED
+from nti.coremetadata.interfaces import IX_REALNAME_PARTS
+
+from nti.dataserver.interfaces import IUser
+from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IEntity
+from nti.dataserver.interfaces import ICommunity
+from nti.dataserver.interfaces import IStopDynamicMembershipEvent
+from nti.dataserver.interfaces import IStartDynamicMembershipEvent
+
+from nti.dataserver.users import index as user_index
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The entity catalog indexes whose (lower case) keys we match
+#: prefixes against. These are the names the comprehensive user
+#: search policy matches.
+INDEX_NAMES = (IX_USERNAME, IX_ALIAS, IX_REALNAME_PARTS)
+
+
+def _keys_of(value):
+    if value is None:
+        return ()
+    if isinstance(value, six.string_types):
+        return (value,)
+    return value
+
+
+class UserSearchPrefixIndex(object):
+    """
+    Parallel sorted arrays of name keys and the intids they belong to,
+    built from the forward indexes of the entity catalog, plus the
+    intids of the members of each community asked about.
+
+    Nothing here activates a user. Changes committed by any process
+    are published to :attr:`channel_name`, and a greenlet in each
+    process subscribed to it applies them at the next lookup: the new
+    names of a changed entity are added, and its old names are
+    filtered out when they match. The whole index is rebuilt every
+    :attr:`max_age` seconds to drop those. Until the subscription is
+    confirmed (or after it is lost), we can't know what other
+    processes changed, so it is rebuilt every
+    :attr:`unsubscribed_max_age` seconds instead.
+    """
+
+    channel_name = 'users/search/prefix/invalidations'
+
+    #: How long, in seconds, we use the index before rebuilding it.
+    max_age = 3600
+
+    #: How long, in seconds, we use the index before rebuilding it
+    #: when we aren't told about changes made by other processes.
+    unsubscribed_max_age = 300
+
+    #: Don't try to subscribe more often than this, in seconds.
+    resubscribe_interval = 10
+
+    def __init__(self):
+        self.db = None
+        self.built = 0
+        self._keys = []
+        self._intids = []
+        self._members = {}
+        self._changed = set()
+        self._dirty_entities = set()
+        self._listening = False
+        self._listener = None
+        self._listener_started = 0
+
+    @property
+    def _redis(self):
+        return component.queryUtility(IRedisClient)
+
+    def _ensure_listener(self):
+        if self._listener is not None and not self._listener.dead:
+            return
+        now = time.time()
+        if     self._redis is not None \
+           and now - self._listener_started >= self.resubscribe_interval:
+            self._listener_started = now
+            self._listener = gevent.spawn(self._listen)
+
+    def _listen(self):
+        try:
+            sub = self._redis.pubsub()
+            sub.subscribe(self.channel_name)
+            for msg in sub.listen():
+                self._handle_message(msg)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Lost user search index invalidations")
+        finally:
+            # We can't know what we missed
+            self._listening = False
+            self.built = 0
+
+    def _handle_message(self, msg):
+        if msg['type'] == 'subscribe':
+            # Changes from before now may have been missed
+            self._listening = True
+            self.built = 0
+        elif msg['type'] == 'message':
+            self.invalidate(int(msg['data']))
+
+    def _catalog(self):
+        return component.getUtility(ICatalog, name=user_index.CATALOG_NAME)
+
+    def _rebuild(self, catalog):
+        # Keep changes committed while we build (we may yield)
+        self._dirty_entities = set()
+        entries = set()
+        for name in INDEX_NAMES:
+            index = catalog[name]
+            # pylint: disable=protected-access
+            for key, docids in index._fwd_index.iteritems():
+                entries.update((key, docid) for docid in docids)
+        entries = sorted(entries)
+        self._keys = [x[0] for x in entries]
+        self._intids = [x[1] for x in entries]
+        self._members = {}
+        self._changed = set()
+        self.built = time.time()
+        self.db = catalog._p_jar.db() if catalog._p_jar is not None else None
+        logger.info("Built user search prefix index with %d keys", len(entries))
+
+    def _current_keys(self, catalog, intid):
+        result = set()
+        for name in INDEX_NAMES:
+            # pylint: disable=protected-access
+            result.update(_keys_of(catalog[name]._rev_index.get(intid)))
+        return result
+
+    def _reindex(self, catalog, intid):
+        keys = self._keys
+        intids = self._intids
+        self._changed.add(intid)
+        for key in self._current_keys(catalog, intid):
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key and intids[i] < intid:
+                i += 1
+            if i == len(keys) or keys[i] != key or intids[i] != intid:
+                keys.insert(i, key)
+                intids.insert(i, intid)
+
+    def _current(self):
+        catalog = self._catalog()
+        db = catalog._p_jar.db() if catalog._p_jar is not None else None
+        self._ensure_listener()
+        max_age = self.max_age if self._listening else self.unsubscribed_max_age
+        if db is not self.db or time.time() - self.built > max_age:
+            self._rebuild(catalog)
+        while self._dirty_entities:
+            self._reindex(catalog, self._dirty_entities.pop())
+        return catalog
+
+    def invalidate(self, intid):
+        """
+        Note that the names or memberships of the entity with the given
+        intid have changed.
+        """
+        self._dirty_entities.add(intid)
+        self._members.pop(intid, None)
+
+    def changed(self, intid):
+        """
+        Tell this and every other process that the names or
+        memberships of the entity with the given intid have changed.
+        """
+        self.invalidate(intid)
+        redis = self._redis
+        if redis is not None:
+            redis.publish(self.channel_name, str(intid))
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.kill()
+            self._listener = None
+
+    def clear(self):
+        self.close()
+        self.__init__()
+
+    def iter_intids(self, prefix):
+        """
+        Return the intids of the entities with a name starting with
+        ``prefix`` (lower case), in order of their matching name and
+        without duplicates.
+        """
+        catalog = self._current()
+        # Everything up to the next prefix, alphabetically
+        end = prefix[0:-1] + six.unichr(ord(prefix[-1]) + 1)
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, end)
+        changed = self._changed
+        seen = set()
+        for intid in self._intids[lo:hi]:
+            if intid in seen:
+                continue
+            seen.add(intid)
+            if intid in changed:
+                # We may have matched an old name
+                keys = self._current_keys(catalog, intid)
+                if not any(k.startswith(prefix) for k in keys):
+                    continue
+            yield intid
+
+    def member_intids(self, community):
+        """
+        Return a set of the intids of the members of the community.
+        """
+        intids = component.getUtility(IIntIds)
+        cid = intids.queryId(community)
+        result = self._members.get(cid)
+        if result is None:
+            family = self._current().family
+            result = family.IF.Set(community.iter_intids_of_possible_members())
+            if cid is not None:
+                self._members[cid] = result
+        return result
+
+    def is_community(self, intid):
+        topics = self._catalog()[IX_TOPICS]
+        return intid in topics[IX_IS_COMMUNITY].getIds()
+
+    def is_deactivated(self, intid):
+        topics = self._catalog()[IX_TOPICS]
+        return intid in topics[IX_IS_DEACTIVATED].getIds()
+
+
+_prefix_index = UserSearchPrefixIndex()
+
+
+def get_user_search_prefix_index():
+    return _prefix_index
+
+
+def _invalidate_after_commit(obj):
+    intids = component.queryUtility(IIntIds)
+    intid = intids.queryId(obj) if intids is not None else None
+    if intid is None:
+        return
+
+    def after_commit(success):
+        if success:
+            _prefix_index.changed(intid)
+    transaction.get().addAfterCommitHook(after_commit)
+
+
+@component.adapter(IEntity, IIntIdAddedEvent)
+def _entity_added(entity, unused_event):
+    _invalidate_after_commit(entity)
+
+
+@component.adapter(IEntity, IObjectModifiedEvent)
+def _entity_modified(entity, unused_event):
+    _invalidate_after_commit(entity)
+
+
+@component.adapter(IEntity, IIntIdRemovedEvent)
+def _entity_removed(entity, unused_event):
+    _invalidate_after_commit(entity)
+
+
+@component.adapter(IUser, IStartDynamicMembershipEvent)
+def _membership_started(unused_user, event):
+    if ICommunity.providedBy(event.target):
+        _invalidate_after_commit(event.target)
+
+
+@component.adapter(IUser, IStopDynamicMembershipEvent)
+def _membership_stopped(unused_user, event):
+    if ICommunity.providedBy(event.target):
+        _invalidate_after_commit(event.target)
+
+
+import zope.testing.cleanup
+zope.testing.cleanup.addCleanUp(_prefix_index.clear)
@@ -25,6 +25,8 @@ from six.moves.urllib_parse import unquote
 from zope import component
 from zope import interface
 
+from zope.intid.interfaces import IIntIds
+
 from zope.mimetype.interfaces import IContentTypeAware
 
 from ZODB.utils import u64
@@ -47,12 +49,16 @@ from nti.appserver import httpexceptions as hexc
 from nti.appserver.interfaces import INamedLinkView
 from nti.appserver.interfaces import IResolveUserUtility
 from nti.appserver.interfaces import IUserSearchPolicy
+from nti.appserver.interfaces import IPrefixIntIdUserSearchPolicy
+
+from nti.appserver.usersearch_index import get_user_search_prefix_index
 
 from nti.base._compat import text_
 
 from nti.common.string import is_false
 
 from nti.coremetadata.interfaces import IDeactivatedCommunity
+from nti.coremetadata.interfaces import IUnscopedGlobalCommunity
 
 from nti.dataserver import authorization as nauth
 
@@ -61,6 +67,7 @@ from nti.dataserver.interfaces import IEntity
 from nti.dataserver.interfaces import ICommunity
 from nti.dataserver.interfaces import IDataserver
 from nti.dataserver.interfaces import IEntityContainer
+from nti.dataserver.interfaces import IEntityIntIdIterable
 from nti.dataserver.interfaces import IDataserverFolder
 from nti.dataserver.interfaces import ISiteAdminUtility
 from nti.dataserver.interfaces import ICoppaUserWithoutAgreement
@@ -176,7 +183,8 @@ class UserSearchView(AbstractAuthenticatedView,
             # (DynamicFriendsLists, specifically). We should probably lock that down
             result = _authenticated_search(remote_user,
                                            partialMatch,
-                                           request)
+                                           request,
+                                           limit=_max_results())
         elif partialMatch and remote_user:
             # Even if it's not a valid global search, we still want to
             # look at things local to the user
@@ -407,7 +415,13 @@ def _provide_location(result, dataserver):
     return result
 
 
-def _authenticated_search(remote_user, search_term, request):
+def _authenticated_search(remote_user, search_term, request, limit=None):
+    """
+    :keyword int limit: If given, we may stop after finding this many
+        matches from the user search policy. Those local to the user
+        come first, followed by the policy's; policies that can,
+        return their best matches first.
+    """
     # Match Users and Communities here. Do not match IFriendsLists, because
     # that would get private objects from other users.
     def _selector(x):
@@ -415,10 +429,6 @@ def _authenticated_search(remote_user, search_term, request):
             or (ICommunity.providedBy(x) and x.public)
         return result
 
-    user_search_matcher = IUserSearchPolicy(remote_user)
-    result = user_search_matcher.query(search_term,
-                                       provided=_selector)
-
     # By default, filter by site community for admins.
     admin_filter_by_site_community = not is_false(
         request.params.get('filter_by_site_community'))
@@ -426,11 +436,44 @@ def _authenticated_search(remote_user, search_term, request):
     # Filter to things that share a common community
     # FIXME: Hack in a policy of limiting searching to overlapping communities
     test = _make_visibility_test(remote_user, admin_filter_by_site_community)
-    result = {x for x in result if test(x)}  # ensure a set
+
+    user_search_matcher = IUserSearchPolicy(remote_user)
+    if IPrefixIntIdUserSearchPolicy.providedBy(user_search_matcher):
+        result = _prefix_search(user_search_matcher, remote_user, search_term,
+                                _selector, test, limit)
+    else:
+        result = user_search_matcher.query(search_term,
+                                           provided=_selector)
+        result = [x for x in result if test(x)]
 
     # Add locally matching friends lists, etc. These don't need to go through the
-    # filter since they won't be users
-    result.update(_search_scope_to_remote_user(remote_user, search_term))
+    # filter since they won't be users. They come first, so that results
+    # cut off at the limit still include them.
+    local = list(_search_scope_to_remote_user(remote_user, search_term))
+    seen = set(local)
+    local.extend(x for x in result if x not in seen)
+    return local
+
+
+def _prefix_search(user_search_matcher, remote_user, search_term,
+                   selector, test, limit=None):
+    """
+    Load the entities matched by an :class:`.IPrefixIntIdUserSearchPolicy`,
+    in order, until we have ``limit`` that pass the ``selector`` and
+    visibility ``test``. Entities that the prefix index tells us
+    cannot be visible are never loaded.
+    """
+    intids = component.getUtility(IIntIds)
+    might_be_visible = _make_visibility_prefilter(remote_user)
+    result = []
+    for uid in user_search_matcher.iter_intids(search_term):
+        if might_be_visible is not None and not might_be_visible(uid):
+            continue
+        x = intids.queryObject(uid)
+        if x is not None and selector(x) and test(x):
+            result.append(x)
+            if limit and len(result) >= limit:
+                break
     return result
 
 
@@ -494,6 +537,53 @@ def _search_scope_to_remote_user(remote_user, search_term, op=_scoped_search_pre
     return result
 
 
+def _make_visibility_prefilter(remote_user):
+    """
+    Return a predicate on the intid of an entity that is false if
+    :func:`_make_visibility_test` would certainly be false for the entity,
+    using only the :mod:`prefix index <nti.appserver.usersearch_index>`
+    (its community member sets and the entity catalog). If there is
+    no cheap way to tell, returns None.
+
+    This only applies to normal users; admins can see nearly everyone.
+    """
+    if     nauth.is_admin_or_content_admin(remote_user) \
+        or nauth.is_site_admin(remote_user):
+        return None
+
+    prefix_index = get_user_search_prefix_index()
+    intids = component.getUtility(IIntIds)
+    member_sets = []
+    for membership in remote_user.dynamic_memberships:
+        if IUnscopedGlobalCommunity.providedBy(membership):
+            # Everyone, and the like, don't track their members.
+            # Sharing only these doesn't make users visible.
+            if membership.username == 'Everyone':
+                continue
+            return None
+        if ICommunity.providedBy(membership):
+            member_sets.append(prefix_index.member_intids(membership))
+            continue
+        container = IEntityIntIdIterable(membership, None)
+        if container is None:
+            return None
+        member_sets.append(list(container.iter_intids()))
+
+    members = set()
+    for member_set in member_sets:
+        members.update(member_set)
+    members.add(intids.queryId(remote_user))
+
+    def test(uid):
+        if prefix_index.is_community(uid):
+            # Let the real test decide
+            return not prefix_index.is_deactivated(uid)
+        # The creation site isn't reliably indexed, so leave
+        # checking that to the real test
+        return uid in members
+    return test
+
+
 def _make_visibility_test(remote_user, admin_filter_by_site_community=True):
     """
     NT Admins can see any user
@@ -10,6 +10,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import weakref
+
 from pyramid.interfaces import IView
 from pyramid.interfaces import IViewClassifier
 
@@ -436,6 +438,51 @@ class CollectionContentTypeAware(object):
         pass
 
 
+def _is_named_link_view(view):
+    # Views created with the @view_config decorator tend to get wrapped
+    # in a pyramid proxy, which would hide anything they declare to implement
+    # (at least view functions). This is done at venusian scan time, which is after
+    # the module is loaded. Fortunately, the underlying view seems to be preserved
+    # through all the wrappings on the topmost layer of the onion as __original_view__,
+    # so check it as well
+
+    for v in view, getattr(view, '__original_view__', None):
+        # View Functions will directly provide the interface;
+        # view classes, OTOH, will tend to implement it (because using
+        # the @implementer() decorator is easy)
+        if INamedLinkView.providedBy(v) or INamedLinkView.implementedBy(v):
+            return True
+    return False
+
+
+def _lookup_named_link_views(adapters, request_iface, provided, parent_provided, request_provided):
+    """
+    Return the names of the named link views and path adapters
+    registered for ``provided`` and the path adapters registered for
+    ``parent_provided``, which might not apply, as a tuple of ``(name, factory)``
+    pairs.
+    """
+    # Order matters. traversing wins, so views first (?)
+    names = [
+        name for name, view in adapters.lookupAll((IViewClassifier, request_iface, provided), IView)
+        if name and _is_named_link_view(view)
+    ]
+    names.extend(name for name, _ in adapters.lookupAll((provided, request_provided),
+                                                        INamedLinkPathAdapter))
+    path_adapters = tuple((name, factory) for name, factory
+                          in adapters.lookupAll((parent_provided, request_provided),
+                                                INamedLinkPathAdapter)
+                          if name not in names)
+    return frozenset(names), path_adapters
+
+
+#: Adapter registry -> (its generation, {lookup key: lookup result})
+_named_link_views_cache = weakref.WeakKeyDictionary()
+
+#: The number of lookups kept for each adapter registry.
+NAMED_LINK_VIEWS_CACHE_SIZE = 1000
+
+
 def _find_named_link_views(parent, provided=None):
     """
     Introspect the component registry to find the things that
@@ -445,6 +492,10 @@ def _find_named_link_views(parent, provided=None):
     if we want to stop
     traversing (and possibly access the subpath).
 
+    What's registered for each combination of specifications is
+    remembered until the registrations of the current site manager
+    (or its bases) change.
+
     Returns a set of names.
     """
     # pylint: disable=no-member,no-value-for-parameter
@@ -461,35 +512,30 @@ def _find_named_link_views(parent, provided=None):
     # If it isn't loaded because the app hasn't been scanned, we have no
     # way to route, and no views either. So we get None, which is a fine
     # discriminator.
+    parent_provided = interface.providedBy(parent)
     if provided is None:
-        provided = interface.providedBy(parent)
-
-    def _test(unused_name, view):
-        # Views created with the @view_config decorator tend to get wrapped
-        # in a pyramid proxy, which would hide anything they declare to implement
-        # (at least view functions). This is done at venusian scan time, which is after
-        # the module is loaded. Fortunately, the underlying view seems to be preserved
-        # through all the wrappings on the topmost layer of the onion as __original_view__,
-        # so check it as well
-
-        for v in view, getattr(view, '__original_view__', None):
-            # View Functions will directly provide the interface;
-            # view classes, OTOH, will tend to implement it (because using
-            # the @implementer() decorator is easy)
-            if INamedLinkView.providedBy(v) or INamedLinkView.implementedBy(v):
-                return True
-    adapters = component.getSiteManager().adapters
-    # Order matters. traversing wins, so views first (?)
-    names = [
-        name for name, view in adapters.lookupAll((IViewClassifier, request_iface, provided), IView)
-        if name and _test(name, view)
-    ]
-    names.extend(name for name, _ in component.getAdapters((parent, request),
-                                                           INamedLinkPathAdapter))
+        provided = parent_provided
+    request_provided = interface.providedBy(request)
 
-    names.extend(name for name, _ in adapters.lookupAll((provided, interface.providedBy(request)),
-                                                        INamedLinkPathAdapter))
-    return set(names)
+    adapters = component.getSiteManager().adapters
+    # Changing any registration, here or in a base, bumps the generation
+    generation, lookups = _named_link_views_cache.get(adapters, (None, None))
+    if generation != adapters._generation:
+        lookups = {}
+        _named_link_views_cache[adapters] = (adapters._generation, lookups)
+    key = (request_iface, provided, parent_provided, request_provided)
+    result = lookups.get(key)
+    if result is None:
+        if len(lookups) >= NAMED_LINK_VIEWS_CACHE_SIZE:
+            lookups.clear()
+        result = lookups[key] = _lookup_named_link_views(adapters, request_iface, provided,
+                                                         parent_provided, request_provided)
+    names, path_adapters = result
+    names = set(names)
+    # Path adapters for the parent itself may decline by returning None
+    names.update(name for name, factory in path_adapters
+                 if factory(parent, request) is not None)
+    return names
 
 
 def _make_named_view_links(parent, pseudo_target=False, **kwargs):
@@ -8,6 +8,10 @@ from __future__ import absolute_import
 # disable: accessing protected members, too many methods
 # pylint: disable=W0212,R0904
 
+import os
+import time
+import unittest
+
 import fudge
 
 from hamcrest import is_
@@ -45,11 +49,15 @@ from zope.schema.interfaces import IVocabularyFactory
 
 from persistent import Persistent
 
+from nti.appserver.interfaces import INamedLinkPathAdapter
+
 from nti.appserver.policies.interfaces import ISitePolicyUserEventListener
 
 from nti.appserver.tests import TestBaseMixin
 
 from nti.appserver.workspaces import Service
+from nti.appserver.workspaces import _find_named_link_views
+from nti.appserver.workspaces import _named_link_views_cache
 from nti.appserver.workspaces import UserService
 from nti.appserver.workspaces import UserPagesCollection
 from nti.appserver.workspaces import FriendsListContainerCollection
@@ -428,6 +436,83 @@ class TestUserService(ApplicationLayerTest):
                     is_not(is_in(terms)))
 
 
+class _ILinked(interface.Interface):
+    pass
+
+
+@interface.implementer(_ILinked)
+class _Linked(object):
+    declines = False
+
+
+def _path_adapter(context, unused_request):
+    return None if context.declines else context
+
+
+class TestNamedLinkViews(ApplicationLayerTest):
+
+    def _register(self, name, required=_ILinked):
+        gsm = component.getGlobalSiteManager()
+        gsm.registerAdapter(_path_adapter, (required, interface.Interface),
+                            INamedLinkPathAdapter, name=name)
+        self.addCleanup(gsm.unregisterAdapter, _path_adapter,
+                        (required, interface.Interface),
+                        INamedLinkPathAdapter, name=name)
+
+    def test_cached_until_registrations_change(self):
+        self._register(u'Linked')
+        assert_that(_find_named_link_views(_Linked()), is_({u'Linked'}))
+
+        self._register(u'Other')
+        assert_that(_find_named_link_views(_Linked()),
+                    is_({u'Linked', u'Other'}))
+
+        component.getGlobalSiteManager().unregisterAdapter(
+            _path_adapter, (_ILinked, interface.Interface),
+            INamedLinkPathAdapter, name=u'Other')
+        assert_that(_find_named_link_views(_Linked()), is_({u'Linked'}))
+
+    def test_declining_path_adapters(self):
+        class ILinkedAs(interface.Interface):
+            pass
+        self._register(u'Linked')
+        parent = _Linked()
+        assert_that(_find_named_link_views(parent, provided=ILinkedAs),
+                    is_({u'Linked'}))
+
+        # Path adapters for the parent are asked each time
+        parent.declines = True
+        assert_that(_find_named_link_views(parent, provided=ILinkedAs),
+                    is_(set()))
+
+        # But not those for what it's linked as
+        self._register(u'Linked', required=ILinkedAs)
+        assert_that(_find_named_link_views(parent, provided=ILinkedAs),
+                    is_({u'Linked'}))
+
+    @unittest.skipUnless(os.environ.get('NTI_RUN_BENCHMARKS'),
+                         "Set NTI_RUN_BENCHMARKS to time the service document")
+    @mock_dataserver.WithMockDSTrans
+    def test_service_document_benchmark(self):
+        user = User.create_user(dataserver=self.ds,
+                                username=u'sjohnson@nextthought.com')
+        service = UserService(user)
+        toExternalObject(service)
+
+        def timed(clear, iterations=200):
+            start = time.time()
+            for _ in range(iterations):
+                if clear:
+                    _named_link_views_cache.clear()
+                toExternalObject(service)
+            return (time.time() - start) / iterations * 1000
+
+        uncached = timed(True)
+        cached = timed(False)
+        print("\nService document: %.2fms uncached, %.2fms cached"
+              % (uncached, cached))
+
+
 class TestFriendsListContainerCollection(DataserverLayerTest, TestBaseMixin):
 
     @mock_dataserver.WithMockDSTrans
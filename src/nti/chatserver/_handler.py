@@ -42,6 +42,7 @@ from nti.chatserver.interfaces import IContacts
 from nti.chatserver.interfaces import IChatserver
 from nti.chatserver.interfaces import IPresenceInfo
 from nti.chatserver.interfaces import IChatEventHandler
+from nti.chatserver.interfaces import IChatMessageRateLimiter
 from nti.chatserver.interfaces import UserExitRoomEvent
 from nti.chatserver.interfaces import UserEnterRoomEvent
 
@@ -104,6 +105,9 @@ class _ChatHandlerSessionState(Persistent):
             for persistent rate-based throttling. On the other hand, if you're going to be
             writing something anyway (e.g., you have successfully posted a message to a chat
             room) then adding something here is probably not a problem.
+
+            For that reason, :attr:`message_post_rate_limit` is only used
+            when there is no :class:`.IChatMessageRateLimiter` that can decide.
     """
 
     @Lazy
@@ -181,13 +185,11 @@ class _ChatHandler(object):
         msg_info.sender_sid = self.session.session_id
         result = True
         # Rate limit *all* incoming chat messages
-        # pylint: disable=no-member
-        state = IChatHandlerSessionState(self.session)
-        if not state.message_post_rate_limit.consume():
+        if not self._consume_message_token(msg_info):
             if 'DATASERVER_SYNC_CHANGES' in os.environ:  # hack for testing
                 logger.warning(
-                    "Allowing message rate for %s to exceed throttle %s during integration testings.",
-                    self, state.message_post_rate_limit)
+                    "Allowing message rate for %s to exceed throttle during integration testings.",
+                    self)
             else:
                 raise MessageRateExceeded()
 
@@ -195,6 +197,16 @@ class _ChatHandler(object):
             result &= self._chatserver.post_message_to_room(room, msg_info)
         return result
 
+    def _consume_message_token(self, msg_info):
+        limiter = component.queryUtility(IChatMessageRateLimiter)
+        if limiter is not None:
+            result = limiter.consume(self.session.owner, msg_info.rooms or ())
+            if result is not None:
+                return result
+        # pylint: disable=no-member
+        state = IChatHandlerSessionState(self.session)
+        return state.message_post_rate_limit.consume()
+
     def enterRoom(self, room_info):
         room = None
 
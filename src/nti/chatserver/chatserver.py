@@ -35,6 +35,9 @@ from nti.chatserver.interfaces import IMeetingStorage
 
 from nti.chatserver.meeting import _Meeting
 
+from nti.chatserver.presencecache import presence_key
+from nti.chatserver.presencecache import PresenceCache
+
 from nti.dataserver.authentication import effective_principals
 
 from nti.dataserver.interfaces import IDataserver
@@ -150,44 +153,43 @@ class Chatserver(object):
         logger.info("Using redis for presence storage")
         return redis
 
+    @Lazy
+    def presence_cache(self):
+        return PresenceCache(self._redis)
+
     # We store presence data in redis. We do not wrap a transaction around it, nor do we
     # compress it. We do want it to expire at some point in the (distant) future in case
-    # of deleting users, etc. We store it as a pickle for speed. TODO: We may want to cache
-    # the objects locally?
+    # of deleting users, etc. We store it as a pickle for speed, and cache the objects
+    # locally (see :class:`.PresenceCache`), which works because we are the only
+    # ones who change them.
 
     def getPresenceOfUsers(self, usernames):
         # This implementation does not return a presence for users that are
         # unavailable because they have never set a presence, or their last
         # time seen was too long ago
-        if usernames:
-            keys = [
-                'users/' + username + '/presence' for username in usernames
-            ] 
-        else:
-            keys = None
-        if keys:
-            # pylint: disable=no-member
-            presence_pickles = self._redis.mget(keys)
-            presences = [
-                pickle.loads(p) for p in presence_pickles if p is not None
-            ]
-        else:
-            presences = ()
-        return presences
+        if not usernames:
+            return ()
+        # pylint: disable=no-member
+        presences = self.presence_cache.get_presences(usernames)
+        return [p for p in presences if p is not None]
 
     def setPresence(self, presence):
         # pylint: disable=no-member
         presence_ext = pickle.dumps(presence, pickle.HIGHEST_PROTOCOL)
-        return self._redis.setex('users/' + presence.username + '/presence',
-                                 # Recall that the timeout argument comes before
-                                 # the value argument with StrictRedis, matching
-                                 # the redis protocol
-                                 _PRESENCE_TTL,
-                                 presence_ext)
+        result = self._redis.setex(presence_key(presence.username),
+                                   # Recall that the timeout argument comes before
+                                   # the value argument with StrictRedis, matching
+                                   # the redis protocol
+                                   _PRESENCE_TTL,
+                                   presence_ext)
+        self.presence_cache.changed(presence.username)
+        return result
 
     def removePresenceOfUser(self, username):
         # pylint: disable=no-member
-        return self._redis.delete('users/' + username + '/presence')
+        result = self._redis.delete(presence_key(username))
+        self.presence_cache.changed(username)
+        return result
 
     # Low-level IO
 
@@ -29,6 +29,7 @@ from nti.dataserver.interfaces import IUser
 from nti.dataserver.interfaces import IZContained
 from nti.dataserver.interfaces import ILastModified
 from nti.dataserver.interfaces import IModeledContent
+from nti.dataserver.interfaces import IWriteBehindQueue
 from nti.dataserver.interfaces import IUserGeneratedData
 from nti.dataserver.interfaces import IModeledContentBody
 from nti.dataserver.interfaces import IShareableModeledContent
@@ -341,6 +342,25 @@ class IMessageInfoStorage(interface.Interface):
         """
 
 
+class IChatMessageRateLimiter(interface.Interface):
+    """
+    A utility that decides whether a chat message may be posted,
+    taking one token from a bucket for the sender and one from a
+    bucket for each room it is posted to.
+    """
+
+    def consume(username, room_ids=()):
+        """
+        Take a token for the user and each room, but only if there is
+        one available in every bucket.
+
+        :return: True if the message may be posted, False if a limit
+            is exceeded, or None if the limiter cannot tell (for example,
+            its storage is unavailable), in which case the caller
+            should apply its own limit.
+        """
+
+
 class IUserTranscriptStorage(interface.Interface):
     """
     An object that knows how to store transcripts for users
@@ -370,6 +390,38 @@ class IUserTranscriptStorage(interface.Interface):
     def remove_meeting(meeting):
         pass
 
+
+class ITranscriptWriteBehindQueue(IWriteBehindQueue):
+    """
+    A utility that records messages posted to a meeting and stores
+    them in the transcripts of their recipients later, in batches,
+    instead of in the transaction that posts them.
+    """
+
+    def enqueue(meeting, msg_info, recipients):
+        """
+        Record that the message should be added to the transcript of
+        each of the named recipients, once the current transaction
+        commits.
+
+        :return: True if the message was queued, False if it could
+            not be, in which case the caller should store it now.
+        """
+
+    def pending_messages(meeting, username):
+        """
+        Return a sequence of the messages posted to the meeting that
+        are waiting to be added to the transcript of the user.
+        """
+
+    def flush():
+        """
+        Add a batch of queued messages to their transcripts, in one
+        transaction.
+
+        :return: The number of queued messages handled.
+        """
+
 # Presence
 
 
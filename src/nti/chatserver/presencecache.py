@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A per-process cache of the presences the chatserver keeps in Redis.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from six.moves import cPickle as pickle
+
+import gevent
+
+from perfmetrics import statsd_client
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def presence_key(username):
+    return 'users/' + username + '/presence'
+
+
+class PresenceCache(object):
+    """
+    Remembers the presence (or the lack of one) of each user asked
+    about for :attr:`ttl` seconds, so rosters and contact lists don't
+    have to read and unpickle every presence from Redis each time.
+
+    Changes are published to :attr:`channel_name`, and a greenlet in
+    each process subscribed to it drops the changed entries. Until
+    that subscription is confirmed (or after it is lost), nothing is
+    cached.
+
+    The number of lookups answered from the cache and from Redis are
+    kept in :attr:`hits` and :attr:`misses`, and sent to statsd.
+    """
+
+    channel_name = 'users/presence/invalidations'
+
+    #: Don't try to subscribe more often than this, in seconds.
+    resubscribe_interval = 10
+
+    def __init__(self, redis, ttl=30, max_size=10000):
+        self._redis = redis
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # username -> (expiration, presence or None)
+        self._entries = {}
+        # Incremented for every change we see, so loads that
+        # overlap a change aren't cached.
+        self._invalidations = 0
+        self._listening = False
+        self._listener = None
+        self._listener_started = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+        client = statsd_client()
+        if client is not None:
+            if hits:
+                client.incr('nti.chatserver.presence_cache.hits', hits)
+            if misses:
+                client.incr('nti.chatserver.presence_cache.misses', misses)
+
+    def _ensure_listener(self):
+        if self._listener is not None and not self._listener.dead:
+            return
+        now = time.time()
+        if now - self._listener_started >= self.resubscribe_interval:
+            self._listener_started = now
+            self._listener = gevent.spawn(self._listen)
+
+    def _listen(self):
+        try:
+            sub = self._redis.pubsub()
+            sub.subscribe(self.channel_name)
+            for msg in sub.listen():
+                if msg['type'] == 'subscribe':
+                    self._listening = True
+                elif msg['type'] == 'message':
+                    username = msg['data']
+                    if isinstance(username, bytes):
+                        username = username.decode('utf-8')
+                    self.invalidate(username)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Lost presence invalidations")
+        finally:
+            # We can't know what we missed
+            self._listening = False
+            self.clear()
+
+    def invalidate(self, username):
+        self._invalidations += 1
+        self._entries.pop(username, None)
+
+    def clear(self):
+        self._invalidations += 1
+        self._entries.clear()
+
+    def changed(self, username):
+        """
+        Tell this and every other process that the presence
+        of the user has changed.
+        """
+        self.invalidate(username)
+        self._redis.publish(self.channel_name, username)
+
+    def _store(self, entries):
+        if len(self._entries) + len(entries) > self.max_size:
+            now = time.time()
+            self._entries = {k: v for k, v in self._entries.items()
+                             if v[0] > now}
+            if len(self._entries) + len(entries) > self.max_size:
+                self._entries = {}
+        self._entries.update(entries)
+
+    def get_presences(self, usernames):
+        """
+        Return a list of the presence of each user, in order,
+        with None for users that have no presence.
+        """
+        self._ensure_listener()
+        usernames = list(usernames)
+        listening = self._listening
+        now = time.time()
+        result = {}
+        missing = []
+        for username in usernames:
+            entry = self._entries.get(username) if listening else None
+            if entry is not None and entry[0] > now:
+                result[username] = entry[1]
+            else:
+                missing.append(username)
+        self._record(len(usernames) - len(missing), len(missing))
+
+        if missing:
+            invalidations = self._invalidations
+            # pylint: disable=no-member
+            data = self._redis.mget([presence_key(u) for u in missing])
+            loaded = {}
+            for username, presence_pickle in zip(missing, data):
+                presence = None
+                if presence_pickle is not None:
+                    presence = pickle.loads(presence_pickle)
+                result[username] = presence
+                loaded[username] = (now + self.ttl, presence)
+            if self._listening and invalidations == self._invalidations:
+                self._store(loaded)
+        return [result[u] for u in usernames]
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.kill()
+            self._listener = None
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rate limiting of chat messages, kept in Redis.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import math
+import time
+
+from redis.exceptions import RedisError
+
+from zope import component
+from zope import interface
+
+from nti.chatserver.interfaces import IChatMessageRateLimiter
+
+from nti.dataserver.interfaces import IRedisClient
+
+logger = __import__('logging').getLogger(__name__)
+
+#: Take a token from each of the buckets in KEYS, but only if every
+#: one of them has a token. ARGV is the current time, followed by the
+#: capacity, fill rate (tokens per second) and expiration (seconds)
+#: of each bucket. Returns 1 if the tokens were taken, 0 otherwise.
+_CONSUME_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local fill_rate = tonumber(ARGV[3 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'time')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - last) * fill_rate)
+    if tokens < 1 then
+        return 0
+    end
+    levels[i] = tokens - 1
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HMSET', key, 'tokens', tostring(levels[i]), 'time', ARGV[1])
+    redis.call('EXPIRE', key, ARGV[3 * i + 1])
+end
+return 1
+"""
+
+
+@interface.implementer(IChatMessageRateLimiter)
+class RedisChatMessageRateLimiter(object):
+    """
+    Token buckets for each user and each room, checked and updated
+    atomically by a Lua script in Redis, so posting a message doesn't
+    write to the database. Buckets that have filled back up expire.
+
+    Register an instance with different limits to change them;
+    a limit with a capacity of 0 is not applied.
+    """
+
+    key_prefix = 'chat/ratelimit/'
+
+    def __init__(self, user_capacity=30, user_fill_rate=2.0,
+                 room_capacity=120, room_fill_rate=10.0):
+        self.user_capacity = user_capacity
+        self.user_fill_rate = user_fill_rate
+        self.room_capacity = room_capacity
+        self.room_fill_rate = room_fill_rate
+
+    def _bucket_args(self, capacity, fill_rate):
+        # Once a bucket could have filled up, it may as well not exist
+        expires = int(math.ceil(capacity / fill_rate)) + 1
+        return [capacity, fill_rate, expires]
+
+    def consume(self, username, room_ids=()):
+        redis = component.queryUtility(IRedisClient)
+        if redis is None:
+            return None
+
+        keys = []
+        args = [time.time()]
+        if self.user_capacity:
+            keys.append(self.key_prefix + 'user/' + username)
+            args.extend(self._bucket_args(self.user_capacity,
+                                          self.user_fill_rate))
+        if self.room_capacity:
+            for room_id in sorted(set(room_ids)):
+                keys.append(self.key_prefix + 'room/' + room_id)
+                args.extend(self._bucket_args(self.room_capacity,
+                                              self.room_fill_rate))
+        if not keys:
+            return True
+
+        try:
+            script = redis.register_script(_CONSUME_SCRIPT)
+            return bool(script(keys=keys, args=args))
+        except RedisError:
+            logger.exception("Failed to check chat rate limit for %s", username)
+            return None
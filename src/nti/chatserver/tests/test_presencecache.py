@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import assert_that
+from hamcrest import has_property
+
+import unittest
+
+from six.moves import cPickle as pickle
+
+from nti.chatserver.presencecache import presence_key
+from nti.chatserver.presencecache import PresenceCache
+
+from nti.chatserver.presenceinfo import PresenceInfo
+
+from nti.dataserver.tests.mock_redis import InMemoryMockRedis
+
+
+class TestPresenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = InMemoryMockRedis()
+        self.cache = PresenceCache(self.redis)
+        # As if subscribed to invalidations
+        self.cache._ensure_listener = lambda: None
+        self.cache._listening = True
+
+    def _set_presence(self, username, show):
+        presence = PresenceInfo(type=u'available', show=show, username=username)
+        self.redis.set(presence_key(username), pickle.dumps(presence))
+
+    def test_caches_presences_and_absences(self):
+        self._set_presence(u'sjohnson', u'dnd')
+        cache = self.cache
+
+        presences = cache.get_presences([u'sjohnson', u'jason'])
+        assert_that(presences,
+                    contains(has_property('show', u'dnd'), none()))
+        assert_that(cache, has_property('misses', 2))
+
+        # Not read again, even if changed behind our back
+        self._set_presence(u'jason', u'xa')
+        presences = cache.get_presences([u'sjohnson', u'jason'])
+        assert_that(presences,
+                    contains(has_property('show', u'dnd'), none()))
+        assert_that(cache, has_property('hits', 2))
+        assert_that(cache.hit_rate, is_(0.5))
+
+        # Until we're told
+        cache.invalidate(u'jason')
+        presences = cache.get_presences([u'sjohnson', u'jason'])
+        assert_that(presences,
+                    contains(has_property('show', u'dnd'),
+                             has_property('show', u'xa')))
+        assert_that(cache, has_property('misses', 3))
+
+    def test_not_cached_when_not_listening(self):
+        self._set_presence(u'sjohnson', u'dnd')
+        cache = self.cache
+        cache._listening = False
+
+        cache.get_presences([u'sjohnson'])
+        self._set_presence(u'sjohnson', u'xa')
+        presences = cache.get_presences([u'sjohnson'])
+        assert_that(presences, contains(has_property('show', u'xa')))
+        assert_that(cache, has_property('hits', 0))
+
+    def test_changed_publishes(self):
+        self._set_presence(u'sjohnson', u'dnd')
+        cache = self.cache
+        cache.get_presences([u'sjohnson'])
+
+        self._set_presence(u'sjohnson', u'xa')
+        cache.changed(u'sjohnson')
+        presences = cache.get_presences([u'sjohnson'])
+        assert_that(presences, contains(has_property('show', u'xa')))
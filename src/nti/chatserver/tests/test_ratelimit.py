@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+
+from nti.testing.matchers import validly_provides as verifiably_provides
+
+import unittest
+
+from zope import component
+
+from nti.chatserver.interfaces import IChatMessageRateLimiter
+
+from nti.chatserver.ratelimit import RedisChatMessageRateLimiter
+
+from nti.dataserver.interfaces import IRedisClient
+
+from nti.dataserver.tests.mock_redis import InMemoryMockRedis
+
+
+class TestRedisChatMessageRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = InMemoryMockRedis()
+        component.getGlobalSiteManager().registerUtility(self.redis, IRedisClient)
+
+    def tearDown(self):
+        component.getGlobalSiteManager().unregisterUtility(self.redis, IRedisClient)
+
+    def test_provides(self):
+        assert_that(RedisChatMessageRateLimiter(),
+                    verifiably_provides(IChatMessageRateLimiter))
+
+    def test_user_limit(self):
+        limiter = RedisChatMessageRateLimiter(user_capacity=2, user_fill_rate=0.001)
+        assert_that(limiter.consume(u'sjohnson', [u'room']), is_(True))
+        assert_that(limiter.consume(u'sjohnson', [u'room']), is_(True))
+        assert_that(limiter.consume(u'sjohnson', [u'room']), is_(False))
+        # Others aren't affected
+        assert_that(limiter.consume(u'jason', [u'room']), is_(True))
+
+    def test_room_limit(self):
+        limiter = RedisChatMessageRateLimiter(room_capacity=2, room_fill_rate=0.001)
+        assert_that(limiter.consume(u'sjohnson', [u'room']), is_(True))
+        assert_that(limiter.consume(u'jason', [u'room', u'other']), is_(True))
+        # Nothing is taken when any bucket is empty...
+        assert_that(limiter.consume(u'jason', [u'other', u'room']), is_(False))
+        # ...so the other room still has a token
+        assert_that(limiter.consume(u'jason', [u'other']), is_(True))
+        assert_that(limiter.consume(u'jason', [u'other']), is_(False))
+
+    def test_no_redis(self):
+        component.getGlobalSiteManager().unregisterUtility(self.redis, IRedisClient)
+        assert_that(RedisChatMessageRateLimiter().consume(u'sjohnson'), is_(none()))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import print_function, absolute_import, division
+__docformat__ = "restructuredtext en"
+
+logger = __import__('logging').getLogger(__name__)
+
+generation = 34
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import site
+from zope.component.hooks import setHooks
+
+from zope.intid.interfaces import IIntIds
+
+from nti.contentsearch.searchers import is_ugd_text_searcher_registered
+
+from nti.contentsearch.text_index import IX_TEXT
+from nti.contentsearch.text_index import install_ugd_text_catalog
+
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IOIDResolver
+
+from nti.dataserver.metadata.index import IX_TOPICS
+from nti.dataserver.metadata.index import TP_USER_GENERATED_DATA
+
+from nti.dataserver.metadata.index import get_metadata_catalog
+
+
+@interface.implementer(IDataserver)
+class MockDataserver(object):
+
+    root = None
+
+    def get_by_oid(self, oid, ignore_creator=False):
+        resolver = component.queryUtility(IOIDResolver)
+        if resolver is None:
+            logger.warn("Using dataserver without a proper ISiteManager config.")
+        else:
+            return resolver.get_object_by_oid(oid, ignore_creator=ignore_creator)
+        return None
+
+
+def _index_ugd(text_catalog, intids):
+    result = 0
+    metadata = get_metadata_catalog()
+    if metadata is None:
+        return result
+    index = text_catalog[IX_TEXT]
+    for docid in metadata[IX_TOPICS][TP_USER_GENERATED_DATA].getIds():
+        obj = intids.queryObject(docid)
+        if obj is not None:
+            index.index_doc(docid, obj)
+            result += 1
+    return result
+
+
+def do_evolve(context, generation=generation):
+    setHooks()
+    conn = context.connection
+    root = conn.root()
+    dataserver_folder = root['nti.dataserver']
+
+    mock_ds = MockDataserver()
+    mock_ds.root = dataserver_folder
+    component.provideUtility(mock_ds, IDataserver)
+
+    with site(dataserver_folder):
+        assert  component.getSiteManager() == dataserver_folder.getSiteManager(), \
+                "Hooks not installed?"
+
+        logger.info('Evolution %s started.', generation)
+
+        result = 0
+        # Deployments with an external search service never read
+        # the catalog, so it isn't installed for them to maintain
+        if is_ugd_text_searcher_registered():
+            intids = component.getUtility(IIntIds)
+            catalog = install_ugd_text_catalog(dataserver_folder, intids)
+            result = _index_ugd(catalog, intids)
+
+    component.getGlobalSiteManager().unregisterUtility(mock_ds, IDataserver)
+    logger.info('Evolution %s done. %s item(s) indexed', generation, result)
+
+
+def evolve(context):
+    """
+    Evolve generation 34 by installing the user generated data
+    text catalog and indexing the existing data, if it is searched.
+    """
+    do_evolve(context)
@@ -9,7 +9,7 @@ __docformat__ = "restructuredtext en"
 
 logger = __import__('logging').getLogger(__name__)
 
-generation = 33
+generation = 34
 
 from zope.generations.generations import SchemaManager
 
@@ -26,4 +26,5 @@ class _ContentSearchSchemaManager(SchemaManager):
 
 
 def evolve(context):
-    pass
+    from nti.contentsearch.generations.evolve34 import do_evolve
+    do_evolve(context)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A searcher over the user generated data text index.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import heapq
+
+from zope import component
+from zope import interface
+
+from zope.intid.interfaces import IIntIds
+
+from nti.base._compat import text_
+
+from nti.contentsearch.interfaces import ISearcher
+from nti.contentsearch.interfaces import ISearchQuery
+
+from nti.contentsearch.search_hits import UserGeneratedDataSearchHit
+
+from nti.contentsearch.search_results import SuggestResults
+
+from nti.contentsearch.text_index import IX_TEXT
+from nti.contentsearch.text_index import get_terms
+from nti.contentsearch.text_index import get_ugd_text_catalog
+
+from nti.dataserver.interfaces import IUser
+
+from nti.dataserver.metadata.index import IX_MIMETYPE
+from nti.dataserver.metadata.index import IX_CREATEDTIME
+from nti.dataserver.metadata.index import IX_LASTMODIFIED
+
+from nti.dataserver.metadata.index import get_metadata_catalog
+
+from nti.ntiids.oids import to_external_ntiid_oid
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _score_key(item):
+    # Highest score first, then the lowest docid for a stable order
+    return (item[1], -item[0])
+
+
+@component.adapter(IUser)
+@interface.implementer(ISearcher)
+class UGDTextSearcher(object):
+    """
+    Ranks the user generated data matching the query terms with BM25,
+    restricted to the query's types and creation and modification
+    times, and returns the requested batch of the best hits.
+
+    Access to the hits is not checked here; that's the job of
+    the :class:`.ISearchHitPredicate` subscribers. The scores for a
+    query are kept only as long as this object, which is usually
+    created for each request, so each batch asked for searches again.
+    """
+
+    def __init__(self, user=None):
+        self.user = user
+        self._scores = {}
+
+    def _filter_docids(self, query):
+        catalog = get_metadata_catalog()
+        if catalog is None:
+            return None
+        result = None
+        intersection = catalog.family.IF.intersection
+        if query.searchOn:
+            docids = catalog[IX_MIMETYPE].apply({'any_of': query.searchOn})
+            result = intersection(result, docids)
+        for name, time_range in ((IX_CREATEDTIME, query.creationTime),
+                                 (IX_LASTMODIFIED, query.modificationTime)):
+            if time_range is not None:
+                between = (time_range.startTime, time_range.endTime)
+                docids = catalog[name].apply({'between': between})
+                result = intersection(result, docids)
+        return result
+
+    def _get_scores(self, query):
+        key = (query.term, query.language, tuple(query.searchOn or ()),
+               query.creationTime, query.modificationTime)
+        result = self._scores.get(key)
+        if result is None:
+            result = {}
+            catalog = get_ugd_text_catalog()
+            terms = get_terms(query.term, query.language or 'en')
+            if catalog is not None and terms:
+                docids = self._filter_docids(query)
+                if docids is None or docids:
+                    result = catalog[IX_TEXT].score(terms, docids)
+            self._scores[key] = result
+        return result
+
+    def _make_hit(self, obj, score):
+        hit = UserGeneratedDataSearchHit()
+        hit.Target = obj
+        hit.Score = score
+        hit.ID = hit.NTIID = text_(to_external_ntiid_oid(obj))
+        creator = getattr(obj, 'creator', None)
+        creator = getattr(creator, 'username', creator)
+        if creator:
+            hit.Creator = text_(creator)
+        container = getattr(obj, 'containerId', None)
+        hit.Containers = (text_(container),) if container else ()
+        mime_type = getattr(obj, 'mimeType', None) \
+                 or getattr(obj, 'mime_type', None)
+        hit.TargetMimeType = text_(mime_type or 'unknown')
+        hit.lastModified = getattr(obj, 'lastModified', None) or 0
+        return hit
+
+    def search(self, query, batch_start=0, batch_size=None, *unused_args, **unused_kwargs):
+        query = ISearchQuery(query)
+        if query.IsEmpty:
+            return ()
+        scores = self._get_scores(query)
+        end = batch_start + batch_size if batch_size else len(scores)
+        top = heapq.nlargest(end, scores.items(), key=_score_key)
+        intids = component.getUtility(IIntIds)
+        result = []
+        for docid, score in top[batch_start:end]:
+            obj = intids.queryObject(docid)
+            # Callers count the hits to find the end of the results,
+            # so one we can't resolve is still returned, as None
+            result.append(self._make_hit(obj, score) if obj is not None else None)
+        return result
+
+    def suggest(self, query, limit=10, *unused_args, **unused_kwargs):
+        query = ISearchQuery(query)
+        result = SuggestResults(Query=query)
+        catalog = get_ugd_text_catalog()
+        if catalog is not None and not query.IsEmpty:
+            result.extend(catalog[IX_TEXT].suggest(query.term, limit))
+        return result
+
+
+def is_ugd_text_searcher_registered(registry=component):
+    """
+    Whether user generated data is searched by the :class:`UGDTextSearcher`.
+    It isn't when there is an external search service, and then the
+    text catalog shouldn't be installed or maintained.
+    """
+    factory = registry.getSiteManager().adapters.lookup((IUser,), ISearcher)
+    return isinstance(factory, type) and issubclass(factory, UGDTextSearcher)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function, absolute_import, division
+__docformat__ = "restructuredtext en"
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_property
+from hamcrest import contains_inanyorder
+
+import unittest
+
+from zope import component
+
+from nti.contentsearch.search_query import QueryObject
+from nti.contentsearch.search_query import DateTimeRange
+
+from nti.contentsearch.interfaces import ISearcher
+
+from nti.contentsearch.searchers import UGDTextSearcher
+from nti.contentsearch.searchers import is_ugd_text_searcher_registered
+
+from nti.contentsearch.text_index import install_ugd_text_catalog
+
+from nti.dataserver.contenttypes.note import Note
+
+from nti.dataserver.contenttypes.highlight import Highlight
+
+from nti.dataserver.interfaces import IUser
+
+from nti.dataserver.users.users import User
+
+from nti.contentsearch.tests import SharedConfiguringTestLayer
+
+from nti.dataserver.tests import mock_dataserver
+
+NOTE_MIME_TYPE = u'application/vnd.nextthought.note'
+
+
+class TestUGDTextSearcher(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    username = u'ichigo@bleach.com'
+
+    def _add(self, user, obj, createdTime):
+        obj.creator = user
+        obj.containerId = u'tag:nextthought.com,2011-10:bleach-manga'
+        obj.createdTime = createdTime
+        user.addContainedObject(obj)
+
+    def _fixture(self):
+        with mock_dataserver.mock_db_trans(self.ds):
+            install_ugd_text_catalog(self.ds.dataserver_folder)
+            user = User.create_user(self.ds, username=self.username)
+            for i, text in enumerate((u'Shoot to kill',
+                                      u'Kill kill kill',
+                                      u'Bloom, split and deviate')):
+                note = Note()
+                note.body = (text,)
+                self._add(user, note, 1000 * (i + 1))
+            highlight = Highlight()
+            highlight.selectedText = u'Kill them all'
+            self._add(user, highlight, 4000)
+
+    def _created(self, hits):
+        return [x.Target.createdTime for x in hits]
+
+    @mock_dataserver.WithMockDS
+    def test_search_filtered(self):
+        self._fixture()
+        with mock_dataserver.mock_db_trans(self.ds):
+            searcher = UGDTextSearcher(User.get_user(self.username))
+
+            hits = searcher.search(QueryObject(term=u'kill'))
+            assert_that(hits, has_length(3))
+            # The most relevant first
+            assert_that(hits[0], has_property('Target',
+                                              has_property('createdTime', 2000)))
+            assert_that(hits[0], has_property('Creator', self.username))
+
+            query = QueryObject(term=u'kill', searchOn=(NOTE_MIME_TYPE,))
+            assert_that(self._created(searcher.search(query)),
+                        contains_inanyorder(1000, 2000))
+
+            creationTime = DateTimeRange(startTime=1500, endTime=5000)
+            query = QueryObject(term=u'kill', creationTime=creationTime)
+            assert_that(self._created(searcher.search(query)),
+                        contains_inanyorder(2000, 4000))
+
+            query = QueryObject(term=u'kill', searchOn=(NOTE_MIME_TYPE,),
+                                creationTime=creationTime)
+            assert_that(self._created(searcher.search(query)),
+                        contains(2000))
+
+            # Nothing of that type
+            query = QueryObject(term=u'kill',
+                                searchOn=(u'application/vnd.nextthought.redaction',))
+            assert_that(searcher.search(query), has_length(0))
+
+    @mock_dataserver.WithMockDS
+    def test_search_batches(self):
+        self._fixture()
+        with mock_dataserver.mock_db_trans(self.ds):
+            user = User.get_user(self.username)
+            query = QueryObject(term=u'kill')
+            everything = self._created(UGDTextSearcher(user).search(query))
+
+            # As each batch is asked for in its own request
+            first = UGDTextSearcher(user).search(query, batch_start=0, batch_size=2)
+            rest = UGDTextSearcher(user).search(query, batch_start=2, batch_size=2)
+            assert_that(first, has_length(2))
+            assert_that(rest, has_length(1))
+            assert_that(self._created(first + rest), is_(everything))
+
+            beyond = UGDTextSearcher(user).search(query, batch_start=3, batch_size=2)
+            assert_that(beyond, has_length(0))
+
+    @mock_dataserver.WithMockDS
+    def test_suggest(self):
+        self._fixture()
+        with mock_dataserver.mock_db_trans(self.ds):
+            searcher = UGDTextSearcher(User.get_user(self.username))
+            result = searcher.suggest(QueryObject(term=u'ki'))
+            assert_that(result, has_property('Suggestions', [u'kill']))
+
+            result = searcher.suggest(QueryObject(term=u'b'), limit=1)
+            assert_that(result, has_property('Suggestions', [u'bloom']))
+
+    def test_registered(self):
+        assert_that(is_ugd_text_searcher_registered(), is_(True))
+
+        class ExternalSearcher(object):
+            def __init__(self, user):
+                pass
+        gsm = component.getGlobalSiteManager()
+        gsm.registerAdapter(ExternalSearcher, (IUser,), ISearcher)
+        try:
+            assert_that(is_ugd_text_searcher_registered(), is_(False))
+        finally:
+            gsm.registerAdapter(UGDTextSearcher, (IUser,), ISearcher)
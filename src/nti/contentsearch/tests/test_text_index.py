@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function, absolute_import, division
+__docformat__ = "restructuredtext en"
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_entries
+from hamcrest import greater_than
+
+import unittest
+
+from nti.contentsearch.text_index import UGDTextIndex
+
+from nti.dataserver.contenttypes.note import Note
+
+from nti.contentsearch.tests import SharedConfiguringTestLayer
+
+
+class TestUGDTextIndex(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def _note(self, text):
+        note = Note()
+        note.body = (text,)
+        return note
+
+    def test_index_and_score(self):
+        index = UGDTextIndex()
+        index.index_doc(1, self._note(u'Shoot to kill'))
+        index.index_doc(2, self._note(u'Kill kill kill'))
+        index.index_doc(3, self._note(u'Bloom, split and deviate'))
+        index.index_doc(4, object())
+        assert_that(index.documentCount(), is_(3))
+
+        scores = index.score([u'kill'])
+        assert_that(scores, has_length(2))
+        assert_that(scores[2], greater_than(scores[1]))
+
+        scores = index.score([u'kill'], docids=(1, 3))
+        assert_that(list(scores), contains(1))
+
+        # Reindexing replaces the old terms
+        index.index_doc(2, self._note(u'Lightning flash'))
+        assert_that(index.score([u'kill']), has_length(1))
+        assert_that(index.score([u'flash']), has_entries(2, greater_than(0)))
+
+        index.unindex_doc(1)
+        index.unindex_doc(1)
+        assert_that(index.documentCount(), is_(2))
+        assert_that(index.score([u'kill']), has_length(0))
+        assert_that(index._totaldoclen(), is_(6))
+
+    def test_suggest(self):
+        index = UGDTextIndex()
+        index.index_doc(1, self._note(u'Rankle the seas and the skies'))
+        assert_that(index.suggest(u'S'), contains(u'seas', u'skies'))
+        assert_that(index.suggest(u's', limit=1), contains(u'seas'))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A full-text index of user generated data, stored in the database and
+scored with Okapi BM25, so searching doesn't need an external service.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import math
+
+import BTrees
+
+from BTrees.Length import Length
+
+from persistent import Persistent
+
+import six
+
+from zope import component
+from zope import interface
+
+from zope.catalog.interfaces import ICatalog
+from zope.catalog.interfaces import ICatalogIndex
+
+from zope.container.contained import Contained
+
+from zope.intid.interfaces import IIntIds
+
+from zope.location import locate
+
+from nti.contentfragments.interfaces import IPlainTextContentFragment
+
+from nti.contentsearch.content_utils import get_content
+
+from nti.dataserver.interfaces import IUserGeneratedData
+from nti.dataserver.interfaces import IDeletedObjectPlaceholder
+
+from nti.zope_catalog.catalog import Catalog
+
+#: The name of the utility that the Zope Catalog
+#: should be registered under
+CATALOG_NAME = 'nti.dataserver.++etc++ugd-text-catalog'
+
+IX_TEXT = 'text'
+
+#: The attributes of user generated data whose text we index.
+TEXT_ATTRIBUTES = ('title', 'description', 'selectedText', 'body', 'tags')
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _text_parts(value):
+    if not value:
+        return ()
+    if isinstance(value, six.string_types):
+        value = (value,)
+    elif not isinstance(value, (list, tuple)):
+        return ()
+    # Bodies mix text with canvases, media, etc
+    return [component.queryAdapter(x, IPlainTextContentFragment, name='text', default=u'')
+            for x in value]
+
+
+def get_ugd_text(obj):
+    """
+    Return the plain text of the user generated data object.
+    """
+    parts = []
+    for name in TEXT_ATTRIBUTES:
+        parts.extend(_text_parts(getattr(obj, name, None)))
+    return u' '.join(x for x in parts if x)
+
+
+def get_terms(text, language='en'):
+    """
+    Return the list of index terms in the text, in order.
+    """
+    return get_content(text, language).lower().split()
+
+
+def is_indexable(obj):
+    return  IUserGeneratedData.providedBy(obj) \
+        and not IDeletedObjectPlaceholder.providedBy(obj)
+
+
+@interface.implementer(ICatalogIndex)
+class UGDTextIndex(Persistent, Contained):
+    """
+    An inverted index from each term to the documents containing it
+    and the number of times it occurs in each, plus the length of each
+    document, which is all Okapi BM25 needs.
+
+    Only user generated data is indexed; everything else the catalog
+    hands us is ignored.
+    """
+
+    family = BTrees.family64
+
+    #: BM25 term frequency saturation
+    k1 = 1.2
+
+    #: BM25 document length normalization
+    b = 0.75
+
+    def __init__(self, family=None):
+        if family is not None:
+            self.family = family
+        self.clear()
+
+    def clear(self):
+        # term -> {docid: term frequency}
+        self._wordinfo = self.family.OO.BTree()
+        # docid -> sorted tuple of distinct terms
+        self._docwords = self.family.IO.BTree()
+        # docid -> number of terms
+        self._doclen = self.family.II.BTree()
+        self._totaldoclen = Length()
+        self._num_docs = Length()
+
+    def documentCount(self):
+        return self._num_docs()
+
+    def wordCount(self):
+        return len(self._wordinfo)
+
+    def _remove_posting(self, term, docid):
+        postings = self._wordinfo.get(term)
+        if postings is not None:
+            postings.pop(docid, None)
+            if not postings:
+                del self._wordinfo[term]
+
+    def index_doc(self, docid, value):
+        terms = get_terms(get_ugd_text(value)) if is_indexable(value) else ()
+        if not terms:
+            self.unindex_doc(docid)
+            return
+
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        words = tuple(sorted(counts))
+
+        old_words = self._docwords.get(docid)
+        if old_words is None:
+            self._num_docs.change(1)
+        else:
+            for term in set(old_words).difference(counts):
+                self._remove_posting(term, docid)
+            self._totaldoclen.change(-self._doclen.get(docid, 0))
+
+        # Reindexing unchanged text shouldn't write anything else
+        for term, count in counts.items():
+            postings = self._wordinfo.get(term)
+            if postings is None:
+                postings = self._wordinfo[term] = self.family.II.BTree()
+            if postings.get(docid) != count:
+                postings[docid] = count
+        if old_words != words:
+            self._docwords[docid] = words
+        if self._doclen.get(docid) != len(terms):
+            self._doclen[docid] = len(terms)
+        self._totaldoclen.change(len(terms))
+
+    def unindex_doc(self, docid):
+        words = self._docwords.pop(docid, None)
+        if words is None:
+            return
+        for term in words:
+            self._remove_posting(term, docid)
+        self._totaldoclen.change(-self._doclen.pop(docid, 0))
+        self._num_docs.change(-1)
+
+    def score(self, terms, docids=None):
+        """
+        Return a dictionary of the BM25 score of each document matching
+        any of the terms. If ``docids`` is given, only those documents
+        are considered.
+        """
+        result = {}
+        num_docs = self._num_docs()
+        if not num_docs:
+            return result
+        avgdl = self._totaldoclen() / num_docs
+        k1 = self.k1
+        b = self.b
+        doclen = self._doclen
+        for term in set(terms):
+            postings = self._wordinfo.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            if docids is not None and len(docids) < df:
+                matches = ((x, postings.get(x)) for x in docids)
+            else:
+                matches = postings.iteritems()
+            for docid, tf in matches:
+                if not tf or (docids is not None and docid not in docids):
+                    continue
+                norm = k1 * (1 - b + b * doclen.get(docid, avgdl) / avgdl)
+                result[docid] = result.get(docid, 0) + idf * tf * (k1 + 1) / (tf + norm)
+        return result
+
+    def apply(self, query):
+        """
+        Return a mapping from docid to score for the documents
+        matching the text ``query``.
+        """
+        return self.family.IF.Bucket(self.score(get_terms(query)))
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return up to ``limit`` indexed terms starting with ``prefix``.
+        """
+        prefix = prefix.lower()
+        result = []
+        for term in self._wordinfo.keys(min=prefix):
+            if not term.startswith(prefix) or len(result) >= limit:
+                break
+            result.append(term)
+        return result
+
+
+def get_ugd_text_catalog(registry=component):
+    return registry.queryUtility(ICatalog, name=CATALOG_NAME)
+
+
+def create_ugd_text_catalog(catalog=None, family=BTrees.family64):
+    if catalog is None:
+        catalog = Catalog(family=family)
+    index = UGDTextIndex(family=family)
+    locate(index, catalog, IX_TEXT)
+    catalog[IX_TEXT] = index
+    return catalog
+
+
+def install_ugd_text_catalog(site_manager_container, intids=None):
+    lsm = site_manager_container.getSiteManager()
+    intids = lsm.getUtility(IIntIds) if intids is None else intids
+    catalog = get_ugd_text_catalog(lsm)
+    if catalog is not None:
+        return catalog
+
+    catalog = create_ugd_text_catalog(family=intids.family)
+    locate(catalog, site_manager_container, CATALOG_NAME)
+    intids.register(catalog)
+    lsm.registerUtility(catalog,
+                        provided=ICatalog,
+                        name=CATALOG_NAME)
+
+    for index in catalog.values():
+        intids.register(index)
+    return catalog
@@ -57,6 +57,9 @@ from nti.dataserver.interfaces import InappropriateSiteError
 
 from nti.dataserver.meeting_container_storage import MeetingContainerStorage
 
+from nti.dataserver.memcache_client import PooledMemcacheClient
+from nti.dataserver.memcache_client import DEFAULT_POOL_SIZE as DEFAULT_MEMCACHE_POOL_SIZE
+
 from nti.dataserver.meeting_storage import CreatorBasedAnnotationMeetingStorage
 
 from nti.dataserver.sessions import SessionService
@@ -208,8 +211,6 @@ class MinimalDataserver(object):
         Creates and returns a memcache instance to use.
         """
 
-        # Import the python implementation
-        import memcache
         try:
             cache_servers = conf.main_conf.get('memcached', 'servers')
         except NoSectionError:
@@ -217,43 +218,18 @@ class MinimalDataserver(object):
             return
         # That will throw a ConfigParser.Error if the config is out of date;
         # but in buildout, it should always be up-to-date
+        pool_size = DEFAULT_MEMCACHE_POOL_SIZE
+        if conf.main_conf.has_option('memcached', 'pool_size'):
+            pool_size = conf.main_conf.getint('memcached', 'pool_size')
 
-        cache = memcache.Client(cache_servers.split())
-        logger.debug("Using MemCache servers at %s", cache_servers)
-
-        import pickle
-        cache.pickleProtocol = pickle.HIGHEST_PROTOCOL
-        # TODO: also do that for any outstanding relstorage we can get to,
-        # in each database and in each open connection, if any
-
-        import threading
-        # The underlying memcache object is not necessarily greenlet/thread safe
-        # (it wants to be greenlet local, but that doesn't work well with long-lived
-        # greenlets; see the monkey patch.) So we write an implementation that is
-        # TODO: How much of a penalty do we take for this? We probably want a real
-        # visible, manageable pool.
-
-        @interface.implementer(IMemcacheClient)
-        class _Client(object):
-
-            def __init__(self, cache):
-                self.cache = cache
-                self.lock = threading.Lock()
-
-            def get(self, *args, **kwargs):
-                with self.lock:
-                    return self.cache.get(*args, **kwargs)
-
-            def set(self, *args, **kwargs):
-                with self.lock:
-                    return self.cache.set(*args, **kwargs)
-
-            def delete(self, *args, **kwargs):
-                with self.lock:
-                    return self.cache.delete(*args, **kwargs)
+        cache = PooledMemcacheClient(cache_servers.split(), size=pool_size)
+        logger.debug("Using MemCache servers at %s (pool_size=%s)",
+                     cache_servers, pool_size)
+        # TODO: also set the pickle protocol for any outstanding relstorage
+        # we can get to, in each database and in each open connection, if any
 
         gsm = component.getGlobalSiteManager()
-        gsm.registerUtility(_Client(cache), IMemcacheClient)
+        gsm.registerUtility(cache, IMemcacheClient)
         # NOTE: This is not UDP based, it is TCP based, so we have to be careful
         # to close it. Our fork function uses disconnect_all, which simply
         # terminates the open sockets, if any; they all open back up
@@ -11,6 +11,11 @@ __docformat__ = "restructuredtext en"
 
 logger = __import__('logging').getLogger(__name__)
 
+import os
+import time
+
+from perfmetrics import statsd_client
+
 from zope import component
 
 from zope.container.interfaces import IContainerModifiedEvent
@@ -28,6 +33,8 @@ from zc.intid.interfaces import IBeforeIdRemovedEvent
 
 from nti.dataserver.activitystream_change import Change
 
+from nti.dataserver.activitystream_job import queue_stream_change_fanout
+
 from nti.dataserver.interfaces import IEntity
 from nti.dataserver.interfaces import IContained
 from nti.dataserver.interfaces import IObjectSharingModifiedEvent
@@ -38,11 +45,70 @@ from nti.dataserver.interfaces import IMentionsUpdateInfo
 from nti.dataserver.interfaces import TargetedStreamChangeEvent
 
 
+#: If this is a positive integer, a created object whose change expands to
+#: more recipients than this is only delivered to the directly targeted
+#: entity in the current transaction; the remaining recipients get the
+#: change from a deferred job (see
+#: :class:`nti.dataserver.activitystream_job.StreamChangeFanOutJob`).
+#: Large fan-outs otherwise make for huge, conflict-prone transactions.
+STREAM_FANOUT_DEFER_THRESHOLD = int(os.getenv('DATASERVER_STREAM_FANOUT_DEFER_THRESHOLD') or 0)
+
+
+def _expand_change_targets(target, change, accum):
+    """
+    Return a list of the leaf targets that should get the ``change``,
+    starting with ``target`` and (depth first) expanding anything that can be
+    iterated across into additional targets.
+
+    Each target (and change type) is only returned once within the given
+    ``accum`` state, and the creator of the change is never returned.
+    """
+    result = []
+    pending = [iter((target,))]
+    while pending:
+        target = next(pending[-1], None)
+        if target is None:
+            pending.pop()
+            continue
+        if target is change.creator:
+            continue
+
+        target_key = (target, change.type)
+        if target_key in accum:
+            continue
+        accum.add(target_key)
+        result.append(target)
+
+        # Make this work for DynamicFriendsLists.
+        # NOTE: We could now make it work for communities too, since
+        # we now have an implementation of that interface. However, that's
+        # different than what we were doing before, and probably inefficient,
+        # and probably needs some normalization.
+        # NOTE: Because of _get_dynamic_sharing_targets_for_read, there might actually
+        # be duplicate change objects that get eliminated at read time.
+        # But this ensures that the stream gets an object, bumps the notification
+        # count, and sends a real-time notice to connected sockets.
+        # TODO: Can we make it be just the later?
+        # Or remove _get_dynamic_sharing_targets_for_read?
+        pending.append(iter(ISharingTargetEntityIterable(target, ())))
+    return result
+
+
+def _should_defer_fanout(change, targets):
+    # Only creations can be rebuilt later: deletions are gone by the time
+    # the job runs, and modifications and shares depend on the old sharing.
+    return  STREAM_FANOUT_DEFER_THRESHOLD > 0 \
+        and len(targets) > STREAM_FANOUT_DEFER_THRESHOLD \
+        and change.type == Change.CREATED
+
+
 def _enqueue_change_to_target(target, change, accum=None):
     """
     Enqueue the ``change`` to the ``target``. If the ``target`` can be iterated
-    across to expand into additional targets, this method will recurse
-    to send the event to those additional targets.
+    across to expand into additional targets, the change is also sent to
+    those additional targets. The targets are expanded once, up front;
+    if there are very many of them, the change may be delivered to all
+    but the ``target`` by a deferred job (see :data:`STREAM_FANOUT_DEFER_THRESHOLD`).
 
     This method ensures that each leaf target only gets one change of a given type
     (within the given ``accum`` state).
@@ -50,35 +116,37 @@ def _enqueue_change_to_target(target, change, accum=None):
     This method ensures that the change is not directed to the creator
     of the change.
 
-    :param accum: A set used to hold recursion state.
+    :param accum: A set used to hold expansion state.
     """
 
-    if target is None or change is None or target is change.creator:
+    if target is None or change is None:
         return
 
     accum = set() if accum is None else accum
 
-    target_key = (target, change.type)
-    if target_key in accum:
-        return
-    accum.add(target_key)
-
-    # Fire the change off to the user
-    notify(TargetedStreamChangeEvent(change, target))
-
-    # Make this work for DynamicFriendsLists.
-    # NOTE: We could now make it work for communities too, since
-    # we now have an implementation of that interface. However, that's
-    # different than what we were doing before, and probably inefficient,
-    # and probably needs some normalization.
-    for nested_entity in ISharingTargetEntityIterable(target, ()):
-        # NOTE: Because of _get_dynamic_sharing_targets_for_read, there might actually
-        # be duplicate change objects that get eliminated at read time.
-        # But this ensures that the stream gets an object, bumps the notification
-        # count, and sends a real-time notice to connected sockets.
-        # TODO: Can we make it be just the later?
-        # Or remove _get_dynamic_sharing_targets_for_read?
-        _enqueue_change_to_target(nested_entity, change, accum=accum)
+    start = time.time()
+    targets = _expand_change_targets(target, change, accum)
+    deferred = ()
+    if _should_defer_fanout(change, targets):
+        targets, deferred = targets[:1], targets[1:]
+
+    # Fire the change off to the users
+    for entity in targets:
+        notify(TargetedStreamChangeEvent(change, entity))
+
+    if deferred:
+        queue_stream_change_fanout(change, deferred)
+        logger.info("Deferred delivery of %s change for %r to %s recipients",
+                    change.type, change.object, len(deferred))
+
+    fanout_size = len(targets) + len(deferred)
+    if fanout_size > 1:
+        client = statsd_client()
+        if client is not None:
+            client.incr('nti.dataserver.stream.fanout.recipients', fanout_size)
+            client.incr('nti.dataserver.stream.fanout.deferred', len(deferred))
+            client.timing('nti.dataserver.stream.fanout.time',
+                          int((time.time() - start) * 1000))
 
 
 # TODO: These listeners should probably be registered on something
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Deferred delivery of activity stream changes to large numbers of
+recipients.
+
+.. $Id$
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+from zope import component
+from zope import interface
+
+from zope.cachedescriptors.property import Lazy
+
+from zope.event import notify
+
+from zope.intid.interfaces import IIntIds
+
+from nti.dataserver.activitystream_change import Change
+
+from nti.dataserver.interfaces import IMentionsUpdateInfo
+
+from nti.dataserver.interfaces import TargetedStreamChangeEvent
+
+from nti.dataserver.job.decorators import RunJobInSite
+
+from nti.dataserver.job.interfaces import IScheduledJob
+
+from nti.dataserver.job.job import AbstractJob
+
+from nti.dataserver.job.utils import queue_scheduled_job
+
+from nti.ntiids.ntiids import find_object_with_ntiid
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IScheduledJob)
+class StreamChangeFanOutJob(AbstractJob):
+    """
+    Delivers a :const:`~.Change.CREATED` change for an object to
+    the given (already expanded) targets, as soon as possible
+    after the current transaction commits.
+
+    The targets are kept as a sorted list of their intids, which is
+    far smaller to queue than their NTIIDs when there are many, and
+    the change keeps the time of the original.
+    """
+
+    job_id_prefix = u'StreamChangeFanOut'
+
+    def __init__(self, change, targets):
+        super(StreamChangeFanOutJob, self).__init__(change.object)
+        intids = component.getUtility(IIntIds)
+        target_intids = set()
+        for target in targets:
+            intid = intids.queryId(target)
+            if intid is None:
+                logger.debug(u'Not delivering change to %r without an intid', target)
+            else:
+                target_intids.add(intid)
+        self.job_kwargs['change_type'] = change.type
+        self.job_kwargs['change_time'] = change.lastModified
+        self.job_kwargs['target_intids'] = sorted(target_intids)
+
+    @Lazy
+    def execution_time(self):
+        return self.utc_now
+
+    @Lazy
+    def job_id(self):
+        return '%s_%s_%s' % (self.job_id_prefix,
+                             self.job_kwargs['obj_ntiid'],
+                             self.utc_now)
+
+    @RunJobInSite
+    def __call__(self, *args, **kwargs):
+        object_ntiid = kwargs.get('obj_ntiid')
+        obj = find_object_with_ntiid(object_ntiid)
+        if obj is None:
+            logger.debug(u'Object with ntiid %s no longer exists', object_ntiid)
+            return
+
+        change = Change(kwargs.get('change_type'), obj)
+        change.creator = obj.creator
+        change_time = kwargs.get('change_time')
+        if change_time:
+            # Ordered in streams as of when it happened, not now
+            change.createdTime = change.lastModified = change_time
+        change.mentions_info = component.queryMultiAdapter((obj, set()),
+                                                           IMentionsUpdateInfo)
+        intids = component.getUtility(IIntIds)
+        count = 0
+        for target_intid in kwargs.get('target_intids') or ():
+            target = intids.queryObject(target_intid)
+            if target is None:
+                continue
+            notify(TargetedStreamChangeEvent(change, target))
+            count += 1
+        logger.info("Delivered deferred %s change for %s to %s recipients",
+                    change.type, object_ntiid, count)
+
+
+def queue_stream_change_fanout(change, targets):
+    """
+    Queue a job to deliver the ``change`` to each of the ``targets``.
+    """
+    return queue_scheduled_job(StreamChangeFanOutJob(change, targets))
@@ -38,6 +38,7 @@ from nti.dataserver.interfaces import IEntity
 from nti.dataserver.interfaces import ICreated
 from nti.dataserver.interfaces import ICommunity
 from nti.dataserver.interfaces import IPrincipal
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 from nti.dataserver.interfaces import IPermission
 from nti.dataserver.interfaces import IACLProvider
 from nti.dataserver.interfaces import IFriendsList
@@ -326,8 +327,14 @@ from ZODB.POSException import POSError
 
 
 @component.adapter(object)
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class ACLDecorator(Singleton):
+    """
+    Lets the ACL of the object be found from its external form.
+
+    The :class:`.IExternalizationCache` applies this again to the
+    copies it returns, so they aren't bound to a cached object.
+    """
 
     def decorateExternalMapping(self, orig, result):
         try:
@@ -80,14 +80,21 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import json
 import time
 
+import gevent
+
 from persistent import Persistent
 
+from redis.exceptions import RedisError
+
 from repoze.lru import lru_cache
 
 import six
 
+import transaction
+
 from ZODB.POSException import POSError
 
 from zope import component
@@ -102,6 +109,7 @@ from zope.intid.interfaces import IIntIds
 from nti.chatserver.interfaces import IMeeting
 from nti.chatserver.interfaces import IMessageInfo
 from nti.chatserver.interfaces import IUserTranscriptStorage
+from nti.chatserver.interfaces import ITranscriptWriteBehindQueue
 from nti.chatserver.interfaces import IMessageInfoPostedToRoomEvent
 
 from nti.coremetadata.mixins import ZContainedMixin
@@ -118,6 +126,8 @@ from nti.dataserver.interfaces import ITranscriptSummary
 
 from nti.dataserver.users.users import User
 
+from nti.dataserver.write_behind import AbstractRedisWriteBehindQueue
+
 from nti.dublincore.datastructures import PersistentCreatedModDateTrackingObject
 
 from nti.links import links
@@ -378,13 +388,33 @@ class _UserTranscriptStorageAdapter(object):
                     break
         return result
 
+    def _with_pending_messages(self, object_id, storage):
+        # Messages still in the write-behind queue belong in the
+        # transcript too, even if the storage hasn't been created yet
+        queue = component.queryUtility(ITranscriptWriteBehindQueue)
+        if queue is None:
+            return storage
+        if storage is not None:
+            meeting = storage.meeting
+        else:
+            meeting = ntiids.find_object_with_ntiid(get_meeting_oid(object_id))
+        if meeting is None:
+            return storage
+        pending = queue.pending_messages(meeting, self._user.username)
+        if pending:
+            storage = _PendingMeetingTranscriptStorage(meeting, self._user,
+                                                       storage, pending)
+        return storage
+
     def transcript_for_meeting(self, object_id):
         storage = self._storage_for_meeting(object_id)
+        storage = self._with_pending_messages(object_id, storage)
         result = Transcript(storage) if storage is not None else None
         return result
 
     def transcript_summary_for_meeting(self, object_id):
         storage = self._storage_for_meeting(object_id)
+        storage = self._with_pending_messages(object_id, storage)
         result = TranscriptSummary(storage) if storage is not None else None
         return result
 
@@ -503,17 +533,178 @@ def _ts_storage_for(owner):
     return storage
 
 
+class _PendingMeetingTranscriptStorage(object):
+    """
+    A transient view of the storage of a user's transcript of a
+    meeting, which may not exist yet, that also includes the messages
+    waiting in the write-behind queue. Private object, not public.
+    """
+
+    def __init__(self, meeting, creator, storage, pending):
+        self.meeting = meeting
+        self.creator = creator
+        self._storage = storage
+        self._pending = pending
+
+    def itervalues(self):
+        storage = self._storage
+        if storage is not None:
+            for msg in storage.itervalues():
+                yield msg
+        for msg in self._pending:
+            if storage is None or msg not in storage:
+                yield msg
+
+    def values(self):
+        return self.itervalues()
+
+
+#: Remove the entries in ARGV from the head of the list in KEYS[1],
+#: but only if they are still its head. Returns 1 if they were removed.
+_TRIM_HEAD_SCRIPT = """
+local head = redis.call('LRANGE', KEYS[1], 0, #ARGV - 1)
+if #head ~= #ARGV then
+    return 0
+end
+for i, entry in ipairs(ARGV) do
+    if head[i] ~= entry then
+        return 0
+    end
+end
+redis.call('LTRIM', KEYS[1], #ARGV, -1)
+return 1
+"""
+
+
+@interface.implementer(ITranscriptWriteBehindQueue)
+class RedisTranscriptWriteBehindQueue(AbstractRedisWriteBehindQueue):
+    """
+    Queues each posted message in Redis once, with the names of all
+    its recipients, and adds the messages to the transcripts of their
+    recipients in batches that load each user once.
+
+    A message is only queued after the transaction that posts it
+    commits, so the flusher never sees a message it can't load yet
+    (if Redis can't be reached then, the message is stored right
+    away in a new transaction). Entries are only removed from the
+    queue after the transaction storing them commits, and only if
+    they are still at its head: if our lock expired while storing a
+    large batch, another process may have stored and removed them,
+    and the entries after them must not be removed unstored.
+    """
+
+    queue_name = 'chat/transcripts/queue'
+    lock_name = 'chat/transcripts/queue/Lock'
+
+    job_name = u'flush_chat_transcripts'
+
+    #: How long, in seconds, the flushing greenlet waits between
+    #: batches when it has emptied the queue.
+    flush_interval = 1.0
+
+    def enqueue(self, meeting, msg_info, recipients):
+        redis = self._redis
+        intids = component.queryUtility(IIntIds)
+        if redis is None or intids is None or not meeting.containerId:
+            return False
+        meeting_id = intids.queryId(meeting)
+        msg_id = intids.queryId(msg_info)
+        if meeting_id is None or msg_id is None:
+            return False
+
+        entry = {'meeting': meeting_id,
+                 'message': msg_id,
+                 'recipients': sorted(recipients)}
+        transaction.get().addAfterCommitHook(self._push_after_commit,
+                                             args=(entry,))
+        return True
+
+    def _push_after_commit(self, success, entry):
+        if not success:
+            return
+        try:
+            self._redis.rpush(self.queue_name, json.dumps(entry))
+        except RedisError:
+            logger.exception("Failed to queue message %s for transcripts; storing it now",
+                             entry['message'])
+            gevent.spawn(self._runner, lambda: self._store([entry]),
+                         job_name=u'store_chat_transcripts')
+            return
+        self._ensure_flusher()
+
+    def _entries(self, start, end):
+        for entry in self._redis.lrange(self.queue_name, start, end):
+            yield json.loads(entry)
+
+    def pending_messages(self, meeting, username):
+        intids = component.queryUtility(IIntIds)
+        meeting_id = intids.queryId(meeting) if intids is not None else None
+        if self._redis is None or meeting_id is None:
+            return ()
+
+        result = []
+        seen = set()
+        try:
+            entries = list(self._entries(0, -1))
+        except RedisError:
+            logger.exception("Failed to read queued transcript messages")
+            return ()
+        for entry in entries:
+            msg_id = entry['message']
+            if      entry['meeting'] != meeting_id \
+                or username not in entry['recipients'] \
+                or msg_id in seen:
+                continue
+            seen.add(msg_id)
+            msg = intids.queryObject(msg_id)
+            if msg is not None:
+                result.append(msg)
+        return result
+
+    def _store(self, entries):
+        intids = component.getUtility(IIntIds)
+        storages = {}
+        for entry in entries:
+            meeting = intids.queryObject(entry['meeting'])
+            msg = intids.queryObject(entry['message'])
+            if meeting is None or msg is None:
+                # Deleted since
+                continue
+            for owner in entry['recipients']:
+                storage = storages.get(owner)
+                if storage is None:
+                    storage = storages[owner] = _ts_storage_for(owner)
+                storage.add_message(meeting, msg)
+
+    def _flush_batch(self, redis):
+        raw_entries = redis.lrange(self.queue_name, 0, self.batch_size - 1)
+        if raw_entries:
+            entries = [json.loads(x) for x in raw_entries]
+            self._runner(lambda: self._store(entries), job_name=self.job_name)
+            script = redis.register_script(_TRIM_HEAD_SCRIPT)
+            if not script(keys=[self.queue_name], args=raw_entries):
+                logger.warning("Transcript messages were flushed by another process")
+        return len(raw_entries)
+
+
 @component.adapter(IMessageInfo, IMessageInfoPostedToRoomEvent)
 def _save_message_to_transcripts_subscriber(msg_info, event):
     """
-    Event handler that saves messages to the appropriate transcripts.
+    Event handler that saves messages to the appropriate transcripts,
+    or queues them to be saved if there is a
+    :class:`.ITranscriptWriteBehindQueue`.
     """
     meeting = event.room
 
     change = Change(Change.CREATED, msg_info)
     change.creator = msg_info.Sender
 
-    for owner in set(event.recipients):
+    recipients = set(event.recipients)
+    queue = component.queryUtility(ITranscriptWriteBehindQueue)
+    if queue is not None and queue.enqueue(meeting, msg_info, recipients):
+        return
+
+    for owner in recipients:
         # pylint: disable=unused-variable
         __traceback_info__ = owner, meeting
         storage = _ts_storage_for(owner)
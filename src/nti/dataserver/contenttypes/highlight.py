@@ -18,6 +18,7 @@ from nti.dataserver.contenttypes.selectedrange import SelectedRange
 from nti.dataserver.contenttypes.selectedrange import SelectedRangeInternalObjectIO
 
 from nti.dataserver.interfaces import IHighlight
+from nti.dataserver.interfaces import IExternalizationCacheable
 from nti.dataserver.interfaces import IPresentationPropertyHolder
 
 from nti.schema.fieldproperty import createDirectFieldProperties
@@ -27,10 +28,13 @@ UserContentRoot = UserContentRoot  # BWC top-level import
 logger = __import__('logging').getLogger(__name__)
 
 
-@interface.implementer(IHighlight)
+@interface.implementer(IHighlight, IExternalizationCacheable)
 class Highlight(SelectedRange):
     """
     Implementation of a highlight.
+
+    Highlights externalize only their own state, so their external
+    form can be cached.
     """
     createDirectFieldProperties(IPresentationPropertyHolder)
     createDirectFieldProperties(IHighlight)
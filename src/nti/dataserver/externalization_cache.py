@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A per-process cache of the external form of persistent objects.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import six
+
+from collections import OrderedDict
+
+from ZODB.utils import z64
+
+from zope import component
+from zope import interface
+
+from zope.interface import providedBy
+
+from nti.dataserver.authorization_acl import ACLDecorator
+
+from nti.dataserver.interfaces import IExternalizationCache
+from nti.dataserver.interfaces import IAuthenticationPolicy
+from nti.dataserver.interfaces import IExternalizationCacheable
+from nti.dataserver.interfaces import ICacheableExternalDecorator
+
+from nti.externalization.interfaces import IExternalObjectDecorator
+from nti.externalization.interfaces import IExternalMappingDecorator
+
+try:
+    from pyramid.threadlocal import get_current_request
+except ImportError:  # pragma: no cover
+    def get_current_request():
+        return None
+
+logger = __import__('logging').getLogger(__name__)
+
+_DECORATOR_INTERFACES = (IExternalMappingDecorator, IExternalObjectDecorator)
+
+
+def audience_key(request=None):
+    """
+    Return a value identifying who an external form is being
+    created for: the effective principals of the current
+    authentication policy, the application URL of the request
+    and whether the request wants links that depend on the ACL.
+    Returns None if that can't be determined.
+    """
+    policy = component.queryUtility(IAuthenticationPolicy)
+    if policy is None:
+        return None
+    request = get_current_request() if request is None else request
+    principals = policy.effective_principals(request)
+    principals = frozenset(getattr(x, 'id', x) for x in principals or ())
+    return (principals,
+            getattr(request, 'application_url', None),
+            bool(getattr(request, 'acl_decoration', True)))
+
+
+def _copy(value):
+    # Externalized values are trees of dicts and lists;
+    # everything else is shared
+    if isinstance(value, dict):
+        result = type(value)()
+        for k, v in value.items():
+            result[k] = _copy(v)
+        return result
+    if isinstance(value, list):
+        return type(value)(_copy(x) for x in value)
+    return value
+
+
+def _approximate_size(value):
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            size += 64 + 16 * len(value)
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            size += 32 + 8 * len(value)
+            stack.extend(value)
+        elif isinstance(value, six.string_types):
+            size += 40 + len(value)
+        else:
+            size += 24
+    return size
+
+
+@interface.implementer(IExternalizationCache)
+class ExternalizationCache(object):
+    """
+    Remembers the external form of :class:`.IExternalizationCacheable`
+    objects, keyed by their ``_p_oid`` and ``_p_serial``, the
+    externalizer name and the audience (see :func:`audience_key`), up
+    to approximately :attr:`max_bytes`, discarding the least recently
+    used entries first.
+
+    Only committed objects that haven't been changed in the current
+    transaction are cached, and only when every external decorator
+    subscribed to them (with or without the request) is a
+    :class:`.ICacheableExternalDecorator`. A new serial means a new
+    key, so stale entries simply age out.
+
+    Each value is copied going in and coming out, so callers can
+    change what they're given. The :class:`.ACLDecorator` is applied
+    to each copy coming out, binding it to the object being
+    externalized rather than the one that was cached.
+    """
+
+    #: The number of object and request specifications whose
+    #: decorators we remember checking.
+    max_checked_specs = 1000
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        # key -> (size, external value)
+        self._entries = OrderedDict()
+        # (registry, specs) -> boolean
+        self._checked_specs = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _decorators_are_cacheable(self, obj, request):
+        registry = component.getSiteManager()
+        specs = (providedBy(obj), providedBy(request))
+        key = (registry, specs)
+        result = self._checked_specs.get(key)
+        if result is None:
+            result = True
+            for required in (specs[:1], specs):
+                for provided in _DECORATOR_INTERFACES:
+                    for factory in registry.adapters.subscriptions(required, provided):
+                        if not ICacheableExternalDecorator.implementedBy(factory):
+                            result = False
+            if len(self._checked_specs) >= self.max_checked_specs:
+                self._checked_specs.clear()
+            self._checked_specs[key] = result
+        return result
+
+    def _key(self, obj, name, audience):
+        if audience is None or not IExternalizationCacheable.providedBy(obj):
+            return None
+        jar = getattr(obj, '_p_jar', None)
+        if jar is None:
+            return None
+        # Changes saved in a savepoint aren't reflected in _p_changed
+        if getattr(jar, '_savepoint_storage', None) is not None:
+            return None
+        obj._p_activate()
+        if obj._p_changed or obj._p_serial == z64:
+            return None
+        if not self._decorators_are_cacheable(obj, get_current_request()):
+            return None
+        return (obj._p_oid, obj._p_serial, name, audience)
+
+    def _store(self, key, value):
+        size = _approximate_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (old_size, _) = self._entries.popitem(last=False)
+            self.bytes -= old_size
+
+    def externalize(self, obj, factory, name=u'', audience=None):
+        key = self._key(obj, name, audience)
+        if key is None:
+            return factory()
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.hits += 1
+            # Most recently used
+            self._entries[key] = entry
+            result = _copy(entry[1])
+            if isinstance(result, dict) and hasattr(result, '__dict__'):
+                ACLDecorator().decorateExternalMapping(obj, result)
+            return result
+        self.misses += 1
+        result = factory()
+        self._store(key, _copy(result))
+        return result
+
+    def clear(self):
+        self._entries.clear()
+        self._checked_specs.clear()
+        self.bytes = 0
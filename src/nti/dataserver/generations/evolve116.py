@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import site as current_site
+
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IOIDResolver
+
+generation = 116
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IDataserver)
+class MockDataserver(object):
+
+    root = None
+
+    def get_by_oid(self, oid, ignore_creator=False):
+        resolver = component.queryUtility(IOIDResolver)
+        if resolver is None:
+            logger.warning("Using dataserver without a proper ISiteManager.")
+        else:
+            return resolver.get_object_by_oid(oid, ignore_creator)
+        return None
+
+
+def _backfill_stream_cache_lengths(entity):
+    # pylint: disable=protected-access
+    entity._p_activate()
+    cache = entity.__dict__.get('streamCache')
+    if cache is None or not hasattr(cache, 'backfill_lengths'):
+        return 0
+    return cache.backfill_lengths()
+
+
+def do_evolve(context, generation=generation):  # pylint: disable=redefined-outer-name
+    conn = context.connection
+    ds_folder = conn.root()['nti.dataserver']
+
+    mock_ds = MockDataserver()
+    mock_ds.root = ds_folder
+    component.provideUtility(mock_ds, IDataserver)
+
+    with current_site(ds_folder):
+        assert component.getSiteManager() == ds_folder.getSiteManager(), \
+               "Hooks not installed?"
+
+        count = 0
+        users = ds_folder['users']
+        for entity in users.values():
+            count += _backfill_stream_cache_lengths(entity)
+
+    component.getGlobalSiteManager().unregisterUtility(mock_ds, IDataserver)
+    logger.info('Evolution %s done. %s stream container(s) updated',
+                generation, count)
+
+
+def evolve(context):
+    """
+    Evolve to generation 116 by adding length counters to the
+    stream cache containers of all entities.
+    """
+    do_evolve(context, generation)
@@ -130,7 +130,32 @@ from nti.coremetadata.interfaces import IRedisClient
 from nti.coremetadata.interfaces import IMemcachedClient
 
 IRedisClient = IRedisClient
-IMemcacheClient = IMemcachedClient  # BWC
+IMemcachedClient = IMemcachedClient
+
+
+class IMemcacheClient(IMemcachedClient):
+    """
+    A memcache client that can also work with many keys in a single
+    round trip.
+    """
+
+    def get_multi(keys, key_prefix=''):
+        """
+        Return a dictionary of the values found for the given keys.
+        Keys that are not found are not in the result.
+        """
+
+    def set_multi(mapping, time=0, key_prefix=''):
+        """
+        Store each key and value in the mapping.
+
+        :return: A list of the keys that could not be stored.
+        """
+
+    def delete_multi(keys, time=0, key_prefix=''):
+        """
+        Delete each of the given keys.
+        """
 
 # BWC exports
 from nti.site.interfaces import IHostSitesFolder
@@ -205,6 +230,27 @@ from nti.site.interfaces import ISiteTransactionRunner
 IDataserverTransactionRunner = ISiteTransactionRunner
 
 
+class IWriteBehindQueue(interface.Interface):
+    """
+    A utility that records data during requests and stores it in the
+    database later, in batches, instead of in the transactions of
+    those requests.
+    """
+
+    def flush():
+        """
+        Store a batch of the recorded data, in one transaction.
+
+        :return: The number of items handled.
+        """
+
+    def close():
+        """
+        Stop storing data in the background. Anything not yet stored
+        is kept to be stored later.
+        """
+
+
 class IOIDResolver(interface.Interface):
 
     def get_object_by_oid(oid_string, ignore_creator=False):
@@ -378,6 +424,67 @@ class IStreamChangeAcceptedByUser(interface.interfaces.IObjectEvent):
         "The specific entity that should see this change")
 
 
+class IStreamCacheRetentionPolicy(interface.Interface):
+    """
+    A utility that decides how long the changes in an entity's stream
+    cache are kept. How many are kept is up to each entity.
+    """
+
+    max_age = Number(title=u"The number of seconds changes are kept",
+                     description=u"If not given, changes are kept until there "
+                                 u"are too many of them.",
+                     min=0.0,
+                     required=False,
+                     default=None)
+
+
+class IExternalizationCacheable(interface.Interface):
+    """
+    A marker for persistent objects whose external form is determined
+    by their own persistent state (and that of their decorators, see
+    :class:`ICacheableExternalDecorator`), so it can be reused for as
+    long as their ``_p_serial`` doesn't change.
+
+    Objects that externalize other persistent objects, which can
+    change independently, must not provide this.
+    """
+
+
+class ICacheableExternalDecorator(interface.Interface):
+    """
+    Implemented by the factories of external mapping and object
+    decorators whose output depends only on the persistent state of
+    the object they decorate and on who is asking (the effective
+    principals and the application URL of the request).
+
+    An object's external form is only cached if all of its decorators
+    implement this.
+    """
+
+
+class IExternalizationCache(interface.Interface):
+    """
+    A utility remembering the external form of
+    :class:`IExternalizationCacheable` objects, by object, serial,
+    externalizer name and audience.
+    """
+
+    hits = Int(title=u"The number of externalizations found in the cache")
+
+    misses = Int(title=u"The number of cacheable externalizations not found in the cache")
+
+    def externalize(obj, factory, name=u'', audience=None):
+        """
+        Return the external form of ``obj``, calling ``factory``
+        to create it if there is no usable cached copy.
+
+        The caller owns the result and may change it.
+
+        :param audience: A hashable value identifying who the external
+            form is for. If None, nothing is cached.
+        """
+
+
 from zope.interface.interfaces import ObjectEvent
 
 
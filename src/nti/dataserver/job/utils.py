@@ -21,6 +21,10 @@ def create_and_queue_scheduled_job(obj):
     if job is None:
         logger.debug(u'No scheduled job implementation for %s' % obj)
         return
+    return queue_scheduled_job(job)
+
+
+def queue_scheduled_job(job):
     job = create_scheduled_job(job,
                                jobid=job.job_id,
                                timestamp=job.execution_time,
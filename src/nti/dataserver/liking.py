@@ -38,6 +38,7 @@ from nti.dataserver import rating as ranking
 from nti.dataserver.interfaces import ILikeable
 from nti.dataserver.interfaces import ILastModified
 from nti.dataserver.interfaces import IMemcacheClient
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 
 from nti.externalization.interfaces import IExternalMappingDecorator
 
@@ -203,7 +204,7 @@ def favorites_object(context, username, safe=False):
 
 
 @component.adapter(ILikeable)
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class LikeDecorator(Singleton):
     """
     For :class:`~.ILikeable` objects, records the number of times they
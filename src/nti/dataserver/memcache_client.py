@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A pooled memcache client.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import pickle
+import contextlib
+
+from gevent.queue import Empty
+from gevent.queue import LifoQueue
+
+import memcache
+
+from zope import interface
+
+from nti.dataserver.interfaces import IMemcacheClient
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The default number of :class:`memcache.Client` objects in the pool
+DEFAULT_POOL_SIZE = 10
+
+
+@interface.implementer(IMemcacheClient)
+class PooledMemcacheClient(object):
+    """
+    A greenlet safe :class:`.IMemcacheClient` that checks out a
+    :class:`memcache.Client` from a pool for each operation, blocking
+    if all of them are in use.
+
+    The underlying memcache client object is not greenlet/thread safe
+    (it wants to be greenlet local, but that doesn't work well with
+    long-lived greenlets; see the monkey patch) so no two greenlets may
+    use the same one at the same time. Clients are created as needed,
+    up to ``size``; like a :class:`gevent.pool.Pool`, this object reports
+    its ``size`` and its :meth:`free_count`.
+    """
+
+    MemcachedKeyError = memcache.Client.MemcachedKeyError
+    MemcachedKeyNoneError = memcache.Client.MemcachedKeyNoneError
+    MemcachedKeyTypeError = memcache.Client.MemcachedKeyTypeError
+    MemcachedKeyLengthError = memcache.Client.MemcachedKeyLengthError
+    MemcachedStringEncodingError = memcache.Client.MemcachedStringEncodingError
+    MemcachedKeyCharacterError = memcache.Client.MemcachedKeyCharacterError
+
+    def __init__(self, servers, size=DEFAULT_POOL_SIZE, client_factory=None):
+        """
+        :param list servers: The memcache server addresses.
+        :param int size: The maximum number of clients (connections to
+            each server) in the pool.
+        :keyword client_factory: If given, a callable of no arguments
+            used to create new clients.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be positive", size)
+        self.servers = servers
+        self.size = size
+        if client_factory is not None:
+            self._create_client = client_factory
+        self._clients = []
+        self._free = LifoQueue()
+
+    def _create_client(self):
+        client = memcache.Client(self.servers)
+        client.pickleProtocol = pickle.HIGHEST_PROTOCOL
+        return client
+
+    def free_count(self):
+        """
+        The number of clients that can be used without waiting.
+        """
+        return self._free.qsize() + self.size - len(self._clients)
+
+    @contextlib.contextmanager
+    def _client(self):
+        try:
+            client = self._free.get_nowait()
+        except Empty:
+            if len(self._clients) < self.size:
+                client = self._create_client()
+                self._clients.append(client)
+            else:
+                client = self._free.get()
+        try:
+            yield client
+        finally:
+            self._free.put(client)
+
+    def get(self, *args, **kwargs):
+        with self._client() as client:
+            return client.get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with self._client() as client:
+            return client.set(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with self._client() as client:
+            return client.delete(*args, **kwargs)
+
+    def get_multi(self, *args, **kwargs):
+        with self._client() as client:
+            return client.get_multi(*args, **kwargs)
+
+    def set_multi(self, *args, **kwargs):
+        with self._client() as client:
+            return client.set_multi(*args, **kwargs)
+
+    def delete_multi(self, *args, **kwargs):
+        with self._client() as client:
+            return client.delete_multi(*args, **kwargs)
+
+    def disconnect_all(self):
+        """
+        Close the sockets of all the clients. They open back up
+        as needed.
+        """
+        for client in self._clients:
+            client.disconnect_all()
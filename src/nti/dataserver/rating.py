@@ -37,6 +37,7 @@ from contentratings.storage import UserRatingStorage
 from nti.dataserver.interfaces import IRatable
 from nti.dataserver.interfaces import ILastModified
 from nti.dataserver.interfaces import IMemcacheClient
+from nti.dataserver.interfaces import ICacheableExternalDecorator
 
 from nti.externalization.interfaces import IExternalMappingDecorator
 
@@ -200,7 +201,7 @@ def rates_object(context, username):
 
 
 @component.adapter(IRatable)
-@interface.implementer(IExternalMappingDecorator)
+@interface.implementer(IExternalMappingDecorator, ICacheableExternalDecorator)
 class RatingDecorator(Singleton):
 
     def decorateExternalMapping(self, context, mapping):
@@ -15,10 +15,13 @@ import os
 import time
 import zlib
 import numbers
+import weakref
 import warnings
 import contextlib
 import transaction
 
+from collections import OrderedDict
+
 try:
     import cPickle as pickle
 except ImportError:
@@ -28,6 +31,8 @@ import simplejson as json
 
 import gevent
 
+from perfmetrics import statsd_client
+
 from persistent import Persistent
 
 from zope import component
@@ -43,6 +48,7 @@ from ZODB.loglevels import TRACE
 
 from nti.dataserver.interfaces import IDataserver
 from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IExternalizationCache
 from nti.dataserver.interfaces import ISessionService
 from nti.dataserver.interfaces import IAuthenticationPolicy
 from nti.dataserver.interfaces import SiteNotInstalledError
@@ -51,6 +57,8 @@ from nti.dataserver.interfaces import IUserNotificationEvent
 from nti.dataserver.interfaces import IDataserverTransactionRunner
 from nti.dataserver.interfaces import IImpersonatedAuthenticationPolicy
 
+from nti.dataserver.externalization_cache import audience_key
+
 from nti.externalization.externalization import toExternalObject
 
 from nti.socketio.interfaces import ISocketSession
@@ -83,6 +91,85 @@ def _NOP_CM():
     yield
 
 
+class _RedisWriteBuffer(object):
+    """
+    Collects the Redis writes a :class:`SessionService` makes during
+    one transaction so that they can be sent in a single pipeline
+    as the transaction commits.
+
+    Messages for the same queue are pushed together. Messages
+    published to the same channel are sent as a single envelope
+    (see :func:`_pack_cluster_msgs`) only if `envelopes` is true;
+    otherwise each is published by itself, as older versions
+    expect.
+    """
+
+    def __init__(self):
+        self.queues = OrderedDict()
+        self.channels = OrderedDict()
+
+    def rpush(self, queue_name, msg):
+        self.queues.setdefault(queue_name, []).append(msg)
+
+    def publish(self, channel_name, msg):
+        self.channels.setdefault(channel_name, []).append(msg)
+
+    def execute(self, redis, expiration, envelopes=False):
+        pipe = redis.pipeline()
+        for queue_name, msgs in self.queues.items():
+            pipe.rpush(queue_name, *msgs)
+            pipe.expire(queue_name, expiration)
+        for channel_name, msgs in self.channels.items():
+            if envelopes:
+                pipe.publish(channel_name, _pack_cluster_msgs(msgs))
+            else:
+                for msg in msgs:
+                    pipe.publish(channel_name, _pack_cluster_msgs([msg]))
+        pipe.execute()
+
+
+#: The prefix of a compressed cluster message envelope. This can never
+#: begin a pickle.
+_COMPRESSED_ENVELOPE_PREFIX = b'NTIZ'
+
+#: Pickled cluster messages at least this large are compressed.
+_COMPRESSION_THRESHOLD = 1024
+
+
+def _pack_cluster_msgs(msgs):
+    """
+    Return the bytes to publish on the cluster channel for the list of
+    ``[session_id, function_name, function_arg]`` messages.
+
+    A lone message is pickled by itself, just like it always was. Otherwise
+    the list is pickled as one envelope, which is compressed (and prefixed with
+    :data:`_COMPRESSED_ENVELOPE_PREFIX`) if it's large. Only nodes running
+    this version can read envelopes, so they are only sent when
+    :attr:`SessionService.cluster_message_envelopes` is enabled.
+    """
+    if len(msgs) == 1:
+        return pickle.dumps(msgs[0], pickle.HIGHEST_PROTOCOL)
+    data = pickle.dumps(msgs, pickle.HIGHEST_PROTOCOL)
+    if len(data) >= _COMPRESSION_THRESHOLD:
+        data = _COMPRESSED_ENVELOPE_PREFIX + zlib.compress(data)
+    return data
+
+
+def _unpack_cluster_msgs(data):
+    """
+    Return a sequence of the ``[session_id, function_name, function_arg]``
+    messages in the `data` received from the cluster channel. This may be
+    a single pickled message, as sent by older versions, or an envelope
+    produced by :func:`_pack_cluster_msgs`.
+    """
+    if data.startswith(_COMPRESSED_ENVELOPE_PREFIX):
+        data = zlib.decompress(data[len(_COMPRESSED_ENVELOPE_PREFIX):])
+    msgs = pickle.loads(data)
+    if msgs and isinstance(msgs[0], (list, tuple)):
+        return msgs
+    return (msgs,)
+
+
 @interface.implementer(ISessionService)
 class SessionService(object):
     """
@@ -100,10 +187,17 @@ class SessionService(object):
 
     channel_name = 'sessions/cluster_channel'
 
+    #: If true (the default), the session watchdog uses a single Redis
+    #: round trip to find the watched sessions that have sent a heartbeat
+    #: recently, and only loads the remaining sessions from the database.
+    watchdog_checks_redis_first = True
+
     def __init__(self):
         """
         """
         self.proxy_sessions = {}
+        # The pending writes for each open transaction
+        self._write_buffers = weakref.WeakKeyDictionary()
         # self.pub_socket = None
         # Note that we have no way to close these greenlets. We depend
         # on GC of this object to let them die when the last refs to
@@ -134,8 +228,7 @@ class SessionService(object):
                 if msg_dict['type'] != 'message':
                     continue
                 __traceback_info__ = msg_dict
-                msgs = msg_dict['data']
-                msgs = pickle.loads(msgs)  # TODO: Compression?
+                msgs = _unpack_cluster_msgs(msg_dict['data'])
 
                 # In our background greenlet, we begin and commit
                 # transactions around sending messages to
@@ -150,14 +243,29 @@ class SessionService(object):
                 # TODO: This should use a transaction manager in its explicit mode
                 # and it should actually cache the TransactionManager object locally.
                 try:
-                    transaction.begin()
-                    _ = self._dispatch_message_to_proxy(*msgs)
-                    transaction.commit()
+                    self._dispatch_incoming_cluster_msgs(msgs)
                 except Exception:
-                    logger.exception("Failed to dispatch incoming cluster message.")
+                    logger.exception("Failed to dispatch incoming cluster messages.")
 
         return gevent.spawn(read_incoming)
 
+    def _dispatch_incoming_cluster_msgs(self, msgs):
+        """
+        Dispatch a whole envelope of messages in one transaction. What
+        a message that fails did is rolled back to a savepoint, so it
+        isn't committed along with the others.
+        """
+        transaction.begin()
+        for msg in msgs:
+            savepoint = transaction.savepoint(optimistic=True)
+            try:
+                self._dispatch_message_to_proxy(*msg)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to dispatch incoming cluster message to %s.",
+                                 msg[0])
+                savepoint.rollback()
+        transaction.commit()
+
     def _spawn_session_watchdog(self):
         # A monotonic series, unlikely to wrap when we spawned
         my_sleep_adjustment = os.getpid() % 20
@@ -179,10 +287,16 @@ class SessionService(object):
                 # workers on a machine (which were forked almost simultaneously) don't
                 # all go through it at the same instant.
 
-                watching_sessions = list(self._watching_sessions)
-
-                # TODO: With the heartbeats in redis, we can check for valid sessions there.
-                # Only for invalid sessions will we have to hit the DB
+                t_start = time.time()
+                checked_sessions = list(self._watching_sessions)
+                watching_sessions = checked_sessions
+                if self.watchdog_checks_redis_first:
+                    # With the heartbeats in redis, we can check for valid sessions there.
+                    # Only for invalid sessions will we have to hit the DB
+                    try:
+                        watching_sessions = self._sessions_without_recent_heartbeat(checked_sessions)
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception("Failed to check session heartbeats; using the DB")
                 try:
                     # In the past, we have done this by having a single greenlet per
                     # session_id. While this was convenient and probably not too heavy weight from a greenlet
@@ -197,7 +311,9 @@ class SessionService(object):
                                         len(result),
                                         time.time() - t0 )
                         return result
-                    sessions = tx_runner(_get_sessions, retries=5, sleep=0.1)
+                    sessions = {}
+                    if watching_sessions:
+                        sessions = tx_runner(_get_sessions, retries=5, sleep=0.1)
                 except transaction.interfaces.TransientError:
                     # Try again later
                     logger.debug("Trying session poll later", exc_info=True)
@@ -217,8 +333,36 @@ class SessionService(object):
                 if cleaned_count:
                     logger.info( 'Cleaned up %s sessions (checked_count=%s)',
                                  cleaned_count, len(watching_sessions))
+
+                client = statsd_client()
+                if client is not None:
+                    client.incr('nti.sessions.watchdog.checked', len(checked_sessions))
+                    client.incr('nti.sessions.watchdog.db_checked', len(watching_sessions))
+                    client.incr('nti.sessions.watchdog.cleaned', cleaned_count)
+                    client.timing('nti.sessions.watchdog.duration',
+                                  int((time.time() - t_start) * 1000))
         return gevent.spawn(watchdog_sessions)
 
+    def _sessions_without_recent_heartbeat(self, session_ids):
+        """
+        Return the list of the given session ids that have not sent a heartbeat
+        within the :attr:`session_heartbeat_timeout` (or have no heartbeat at
+        all, e.g., because they are new), or that have been marked as
+        disconnecting (see :meth:`mark_session_disconnecting`), which
+        may still be sending heartbeats. Only these need to be checked in
+        the database to know if they are dead.
+        """
+        if not session_ids:
+            return []
+        keys = [self._heartbeat_key(x) for x in session_ids]
+        keys.extend(self._disconnecting_key(x) for x in session_ids)
+        values = self._redis.mget(keys)
+        heartbeats = values[:len(session_ids)]
+        disconnecting = values[len(session_ids):]
+        too_old = time.time() - self.session_heartbeat_timeout
+        return [sid for sid, heartbeat, marked in zip(session_ids, heartbeats, disconnecting)
+                if marked or float(heartbeat or '0') < too_old]
+
     def _dispatch_message_to_proxy(self, session_id, function_name, function_arg):
         handled = False
         proxy = self.get_proxy_session(session_id)
@@ -304,6 +448,17 @@ class SessionService(object):
             result = 60 * 2
         return result
 
+    @Lazy
+    def cluster_message_envelopes(self):
+        """
+        Whether the messages a transaction publishes to the cluster are
+        sent as one (possibly compressed) envelope. Older versions can't
+        read envelopes, so this is off unless the settings enable it,
+        which should only be done once every node can.
+        """
+        settings = component.queryUtility(ISocketSessionSettings)
+        return bool(getattr(settings, 'SessionClusterMessageEnvelopes', False))
+
     def _is_session_dead(self, session, max_age=None):
         if max_age is None:
             max_age = self.session_heartbeat_timeout
@@ -485,8 +640,15 @@ class SessionService(object):
         else:
             imp_user = _NOP_CM
 
+        cache = component.queryUtility(IExternalizationCache)
         with imp_user():
-            args = [toExternalObject(arg) for arg in args]
+            if cache is None:
+                args = [toExternalObject(arg) for arg in args]
+            else:
+                audience = audience_key()
+                args = [cache.externalize(arg, lambda arg=arg: toExternalObject(arg),
+                                          audience=audience)
+                        for arg in args]
 
         for s in all_sessions:
             logger.log(TRACE, "Dispatching %s to %s", name, s)
@@ -500,12 +662,27 @@ class SessionService(object):
         logger.info("Using redis for session storage")
         return redis
 
-    def _put_msg_to_redis(self, queue_name, msg):
-        self._redis.pipeline().rpush(queue_name, msg).expire(
-            queue_name, self.session_heartbeat_timeout * 2).execute()
+    def _write_buffer(self):
+        """
+        Return the :class:`_RedisWriteBuffer` for the current transaction,
+        arranging for it to be executed near the end of the commit the
+        first time it is used.
+        """
+        tx = transaction.get()
+        write_buffer = self._write_buffers.get(tx)
+        if write_buffer is None:
+            write_buffer = self._write_buffers[tx] = _RedisWriteBuffer()
+            transactions.do_near_end(target=self,
+                                     call=self._execute_write_buffer,
+                                     args=(tx,))
+        return write_buffer
 
-    def _publish_msg_to_redis(self, channel_name, msg):
-        self._redis.publish(channel_name, msg)  # No need to pipeline
+    def _execute_write_buffer(self, tx):
+        write_buffer = self._write_buffers.pop(tx, None)
+        if write_buffer is not None:
+            write_buffer.execute(self._redis,
+                                 self.session_heartbeat_timeout * 2,
+                                 self.cluster_message_envelopes)
 
     def _put_msg(self, meth, q_name, session_id, msg):
         sess = self._get_session(session_id)
@@ -518,12 +695,9 @@ class SessionService(object):
                 msg = ''
             else:
                 msg = zlib.compress(msg)
-            # We wind up with a lot of these data managers for a given transaction (e.g., one for every
-            # message to every session). We really would like to coallesce these into one, which we
-            # can do with some work
-            transactions.do_near_end(target=self,
-                                     call=self._put_msg_to_redis,
-                                     args=(queue_name, msg,))
+            # There may be many of these for a given transaction (e.g., one for every
+            # message to every session), so we coalesce them into one pipeline
+            self._write_buffer().rpush(queue_name, msg)
 
     def _publish_msg(self, name, session_id, msg_str):
         if msg_str is None:  # Disconnecting/kill(). These don't need to go to the cluster, handled locally
@@ -552,11 +726,8 @@ class SessionService(object):
         # node of the cluster, and to make the WebSockets case non-blocking (gevent). See also
         # socketio-server
         if not self._dispatch_message_to_proxy(session_id, name, msg_str):
-            transactions.do_near_end(target=self,
-                                     call=self._publish_msg_to_redis,
-                                     args=(self.channel_name,
-                                           pickle.dumps([session_id,
-                                                         name, msg_str], pickle.HIGHEST_PROTOCOL),))
+            self._write_buffer().publish(self.channel_name,
+                                         [session_id, name, msg_str])
 
     def queue_message_from_client(self, session_id, msg):
         self._put_msg('enqueue_message_from_client',
@@ -630,6 +801,21 @@ class SessionService(object):
                    .expire(key_name, self.session_heartbeat_timeout * 2) \
                    .execute()
 
+    def _disconnecting_key(self, session_id):
+        return 'sessions/' + session_id + '.disconnecting'
+
+    def mark_session_disconnecting(self, session_id):
+        """
+        Record that the session is no longer connected, so the watchdog
+        checks it in the database even if it has a recent heartbeat.
+
+        Like heartbeats, this isn't transactional; if the transaction
+        that disconnected the session aborts, the watchdog just checks a
+        live session.
+        """
+        key_name = self._disconnecting_key(session_id)
+        self._redis.setex(key_name, self.session_heartbeat_timeout * 2, b'1')
+
     def get_last_heartbeat_time(self, session_id, session=None):
         # TODO: This gets called a fair amount. Do we need to cache?
         key_name = self._heartbeat_key(session_id)
@@ -680,6 +866,14 @@ def _decrement_count_for_dead_socket(session, event):
     if redis.zscore(_session_active_keys, session.owner):
         redis.zincrby(_session_active_keys, -1, session.owner)
 
+
+@component.adapter(ISocketSession, ISocketSessionDisconnectedEvent)
+def _mark_disconnecting_socket(session, unused_event):
+    dataserver = component.queryUtility(IDataserver)
+    sessions = getattr(dataserver, 'session_manager', None)
+    if sessions is not None:
+        sessions.mark_session_disconnecting(session.session_id)
+
 deprecated('SessionServiceStorage', 'Use new session storage')
 class SessionServiceStorage(Persistent):
     pass
@@ -11,13 +11,17 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 import six
+import time
 import heapq
 import collections
 
+heapq_heappop = heapq.heappop
 heapq_heappush = heapq.heappush
+heapq_heapreplace = heapq.heapreplace
 heapq_heappushpop = heapq.heappushpop
 
 import BTrees
+from BTrees.Length import Length
 from BTrees.OOBTree import OOTreeSet
 
 import persistent
@@ -65,6 +69,7 @@ from nti.dataserver.interfaces import ObjectSharingModifiedEvent
 from nti.dataserver.interfaces import StopDynamicMembershipEvent
 from nti.dataserver.interfaces import StartDynamicMembershipEvent
 from nti.dataserver.interfaces import IUseNTIIDAsExternalUsername
+from nti.dataserver.interfaces import IStreamCacheRetentionPolicy
 from nti.dataserver.interfaces import ISharingTargetEntityIterable
 
 from nti.datastructures.datastructures import LastModifiedCopyingUserList
@@ -105,6 +110,17 @@ class _SharedContainedObjectStorage(IntidContainedStorage):
         check_contained_object_for_storage(contained)
 
 
+@interface.implementer(IStreamCacheRetentionPolicy)
+class StreamCacheRetentionPolicy(object):
+    """
+    A simple retention policy for stream caches. Register an instance
+    as a utility to apply it.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+
+
 class _SharedStreamCache(persistent.Persistent, Contained):
     """
     Implements the stream cache for users. Stores activitystream_change.Change
@@ -114,19 +130,24 @@ class _SharedStreamCache(persistent.Persistent, Contained):
     We store them keyed by their object's intid. This means that we can only
     store one change per object: the most recent.
     """
-    # TODO: We store Change objects indefinitely while
-    # they are in our stream. This keeps a weak ref to
-    # the object they are holding, which may otherwise go away.
-    # Should we be listening for the intid events and notice when an
-    # intid we care about vanishes?
+    # NOTE: We store Change objects while they are in our stream. This
+    # keeps a weak ref to the object they are holding, which may otherwise
+    # go away. Changes for objects whose intids have vanished, and changes
+    # older than the retention policy allows, are removed by :meth:`compact`.
 
     # TODO: Should the originating user own the change? That way it picks
     # a shard, and it goes away when the user does
 
     family = BTrees.family64
 
+    #: The maximum number of changes kept in each container. Entities
+    #: may keep more (e.g., communities).
     stream_cache_size = 50
 
+    #: If not None, the number of seconds changes are kept by :meth:`compact`,
+    #: unless an :class:`.IStreamCacheRetentionPolicy` is registered.
+    stream_cache_max_age = None
+
     def __init__(self, family=None):
         super(_SharedStreamCache, self).__init__()
         if family is not None:  # pragma: no cover
@@ -153,8 +174,41 @@ class _SharedStreamCache(persistent.Persistent, Contained):
         # (TODO: Right?)
         self._containers_modified = self.family.OO.BTree()
 
-        # TODO: I'm supposed to be storing a Length object separately and maintaing
-        # it for each BTree, as asking for their len() can be expensive
+        self._create_lengths()
+
+    # Map from string container ids to BTrees.Length.Length objects
+    # tracking the number of entries in the corresponding maps of
+    # ``_containers`` and ``_containers_modified``. Asking a BTree for
+    # its len() walks every bucket, which is too expensive to do on each
+    # write. Instances created before these existed have them added
+    # by evolve116 (or lazily on the next write).
+    _container_lengths = None
+    _modified_lengths = None
+
+    def _create_lengths(self):
+        self._container_lengths = self.family.OO.BTree()
+        self._modified_lengths = self.family.OO.BTree()
+
+    def _length_for(self, lengths, containers, containerId):
+        """
+        Return the :class:`Length` for `containerId` in `lengths`, creating
+        (and backfilling) it from the size of the map in `containers` if needed.
+        """
+        length = lengths.get(containerId)
+        if length is None:
+            container_map = containers.get(containerId)
+            length = Length(len(container_map) if container_map is not None else 0)
+            lengths[containerId] = length
+        return length
+
+    def _lengths_for(self, containerId):
+        """
+        Return a tuple of the (container, modified) lengths for `containerId`.
+        """
+        if self._container_lengths is None:
+            self._create_lengths()
+        return (self._length_for(self._container_lengths, self._containers, containerId),
+                self._length_for(self._modified_lengths, self._containers_modified, containerId))
 
     def _read_current(self, container):
         try:
@@ -186,9 +240,12 @@ class _SharedStreamCache(persistent.Persistent, Contained):
                 _containers[change_containerId] = container_map
 
         # And so at this point, `container_map` is an IOBTree
+        container_length, modified_length = self._lengths_for(change_containerId)
         obj_id = _getId(change.object, -1)
         old_change = container_map.get(obj_id)
         container_map[obj_id] = change
+        if old_change is None:
+            container_length.change(1)
 
         # Now save the modification info.
         # Note that container_map is basically a set on change.object, but
@@ -197,14 +254,59 @@ class _SharedStreamCache(persistent.Persistent, Contained):
         # and remove that timestamp from the modified map
         modified_map = self._containers_modified[change_containerId]
 
-        if old_change is not None:
-            modified_map.pop(_time_to_64bit_int(old_change.lastModified), None)
+        if old_change is not None \
+            and modified_map.pop(_time_to_64bit_int(old_change.lastModified), None) is not None:
+            modified_length.change(-1)
+
+        time_key = _time_to_64bit_int(change.lastModified)
+        if time_key not in modified_map:
+            modified_length.change(1)
+        modified_map[time_key] = obj_id
 
-        modified_map[_time_to_64bit_int(change.lastModified)] = obj_id
+        # If we're too big, start trimming. Expired changes are left
+        # for compact() to remove in bulk.
+        self._trim_container(change_containerId, container_map, modified_map,
+                             self.stream_cache_size)
 
-        # If we're too big, start trimming
-        while len(modified_map) > self.stream_cache_size:
-            oldest_id = modified_map.pop(modified_map.minKey())
+        # Change objects can wind up sent to multiple people in different shards
+        # They need to have an owning shard, otherwise it's not possible to pick
+        # one if they are reachable from multiple. So we add them here
+        # TODO: See comments above about making the user own these
+        if self._p_jar and getattr(change, '_p_jar', self) is None:
+            self._p_jar.add(change)
+
+        return change
+
+    def _retention_max_age(self):
+        """
+        Return the ``max_age`` to apply, from the registered
+        :class:`.IStreamCacheRetentionPolicy` if there is one. The
+        size of each container is always bounded by our own
+        :attr:`stream_cache_size`.
+        """
+        policy = component.queryUtility(IStreamCacheRetentionPolicy)
+        if policy is None:
+            return self.stream_cache_max_age
+        return policy.max_age
+
+    def _trim_container(self, containerId, container_map, modified_map,
+                        max_size, expired_time_key=None):
+        """
+        Remove the oldest changes from the container until it holds no
+        more than `max_size` of them, and none modified before `expired_time_key`.
+        Returns the number of changes removed.
+        """
+        container_length, modified_length = self._lengths_for(containerId)
+        removed = 0
+        # Checking the map itself guards against a counter that has
+        # drifted from the real size.
+        while modified_map:
+            oldest_key = modified_map.minKey()
+            if      modified_length() <= max_size \
+                and (expired_time_key is None or oldest_key >= expired_time_key):
+                break
+            oldest_id = modified_map.pop(oldest_key)
+            modified_length.change(-1)
             # If this pop fails, we are somehow corrupted, in that our state
             # doesn't match. It's a relatively minor corruption, however,
             # (the worst that happens is that the stream cache gets a bit too big) so
@@ -213,18 +315,61 @@ class _SharedStreamCache(persistent.Persistent, Contained):
             # this problem. their stream may need to be cleared
             try:
                 container_map.pop(oldest_id)
+                container_length.change(-1)
+                removed += 1
             except KeyError:  # pragma: no cover
                 logger.debug("Failed to pop oldest object with id %s in %s",
                              oldest_id, self)
+        return removed
 
-        # Change objects can wind up sent to multiple people in different shards
-        # They need to have an owning shard, otherwise it's not possible to pick
-        # one if they are reachable from multiple. So we add them here
-        # TODO: See comments above about making the user own these
-        if self._p_jar and getattr(change, '_p_jar', self) is None:
-            self._p_jar.add(change)
-
-        return change
+    def _drop_missing(self, containerId, container_map, modified_map, intids):
+        """
+        Remove the changes for objects that no longer have intids, without
+        loading the changes. Returns the number of changes removed.
+        """
+        container_length, modified_length = self._lengths_for(containerId)
+        missing = [(time_key, obj_id) for time_key, obj_id in modified_map.items()
+                   if obj_id != -1 and intids.queryObject(obj_id) is None]
+        removed = 0
+        for time_key, obj_id in missing:
+            del modified_map[time_key]
+            modified_length.change(-1)
+            if container_map.pop(obj_id, None) is not None:
+                container_length.change(-1)
+                removed += 1
+        return removed
+
+    def compact(self, now=None):
+        """
+        Apply the retention policy to every container, removing expired
+        changes in bulk, along with changes for objects that no
+        longer exist. Containers left empty are removed.
+
+        :keyword float now: The current time, used to find expired changes.
+        :return: The number of changes removed.
+        """
+        max_age = self._retention_max_age()
+        expired_time_key = None
+        if max_age is not None:
+            now = time.time() if now is None else now
+            expired_time_key = _time_to_64bit_int(max(now - max_age, 0.0))
+        intids = component.queryUtility(IIntIds)
+
+        removed = 0
+        for containerId in list(self._containers.keys()):
+            container_map = self._containers[containerId]
+            modified_map = self._containers_modified.get(containerId)
+            if modified_map is None:  # pragma: no cover
+                logger.warning("Corruption detected in %s", self)
+                continue
+            removed += self._trim_container(containerId, container_map, modified_map,
+                                            self.stream_cache_size, expired_time_key)
+            if intids is not None:
+                removed += self._drop_missing(containerId, container_map,
+                                              modified_map, intids)
+            if not container_map:
+                self.clearContainer(containerId)
+        return removed
 
     def deleteEqualContainedObject(self, contained, log_level=None):
         # pylint: disable=unused-variable
@@ -238,24 +383,50 @@ class _SharedStreamCache(persistent.Persistent, Contained):
         containerId = contained.containerId or ''  # Bucket into empty if None
 
         modified_map = self._containers_modified.get(containerId)
+        self._read_current(self._containers)
+        container_map = self._containers.get(containerId)
+        if modified_map is None and container_map is None:
+            return None
+
+        container_length, modified_length = self._lengths_for(containerId)
         if modified_map is not None:
             self._read_current(modified_map)
-            modified_map.pop(_time_to_64bit_int(contained.lastModified), None)
+            if modified_map.pop(_time_to_64bit_int(contained.lastModified), None) is not None:
+                modified_length.change(-1)
 
-        self._read_current(self._containers)
-        container_map = self._containers.get(containerId)
         if container_map is not None:
             self._read_current(container_map)
             if container_map.pop(obj_id, None) is not None:
+                container_length.change(-1)
                 return contained
 
     def clearContainer(self, containerId):
         self._containers.pop(containerId, None)
         self._containers_modified.pop(containerId, None)
+        if self._container_lengths is not None:
+            self._container_lengths.pop(containerId, None)
+            self._modified_lengths.pop(containerId, None)
 
     def clear(self):
         self._containers.clear()
         self._containers_modified.clear()
+        if self._container_lengths is not None:
+            self._container_lengths.clear()
+            self._modified_lengths.clear()
+
+    def backfill_lengths(self):
+        """
+        Ensure a length counter exists for every container, computing
+        the initial values from the maps themselves. Returns the number
+        of containers examined.
+        """
+        count = 0
+        for containerId in list(self._containers.keys()):
+            self._lengths_for(containerId)
+            count += 1
+        for containerId in list(self._containers_modified.keys()):
+            self._lengths_for(containerId)
+        return count
 
     def getContainer(self, containerId, defaultValue=None):
         """
@@ -265,7 +436,8 @@ class _SharedStreamCache(persistent.Persistent, Contained):
         for changes; if max is given and not none, that will be the upper bound timestamp (if max
         is greater than min, no changes are returned). A value of None for either
         boundary means no limit. This can be used to efficiently combine
-        streams, picking up only newer items.
+        streams, picking up only newer items. Likewise, ``iter_time_keys``
+        walks the container newest first without loading any changes.
         """
         containerId = containerId or ''  # Bucket into empty if None
         container = self._containers.get(containerId)
@@ -277,7 +449,10 @@ class _SharedStreamCache(persistent.Persistent, Contained):
             return container.values()
         # TODO: If needed, we could get a 'Last Modified' value for
         # this returned object using self._containers_modified
-        return _StreamValuesProxy(container, mod_container)
+        length = None
+        if self._container_lengths is not None:
+            length = self._container_lengths.get(containerId)
+        return _StreamValuesProxy(container, mod_container, length)
 
     def values(self):
         # Iter the keys and call getContainer to get wrapping
@@ -301,17 +476,20 @@ class _SharedStreamCache(persistent.Persistent, Contained):
 
 class _StreamValuesProxy(object):
 
-    __slots__ = ('_container', '_mod_container')
+    __slots__ = ('_container', '_mod_container', '_length')
 
-    def __init__(self, container, mod_container):
+    def __init__(self, container, mod_container, length=None):
         self._container = container
         self._mod_container = mod_container
+        self._length = length
 
     def __iter__(self):
         return iter(self._container.values())
 
     def __len__(self):
-        return len(self._container)  # VERY inefficient
+        if self._length is not None:
+            return self._length()
+        return len(self._container)  # VERY inefficient; not yet evolved
 
     def iter_between(self, min_age, max_age):
         min_time_key = _time_to_64bit_int(min_age) if min_age else None
@@ -322,6 +500,33 @@ class _StreamValuesProxy(object):
             if change is not None:
                 yield change
 
+    def iter_time_keys(self, min_age=None, max_age=None):
+        """
+        Iterate ``(time_key, obj_id)`` pairs, newest first, for the changes
+        modified between `min_age` and `max_age` (inclusive, with the same
+        meaning as in :meth:`iter_between`). Only the modification map is
+        read; use :meth:`get_change` to load the change for an ``obj_id``.
+
+        The time keys are the 64-bit integer forms of the modification times,
+        which order the same way the times do.
+        """
+        mod_container = self._mod_container
+        min_time_key = _time_to_64bit_int(min_age) if min_age else None
+        max_time_key = _time_to_64bit_int(max_age) if max_age else None
+        while True:
+            try:
+                time_key = mod_container.maxKey(max_time_key) \
+                           if max_time_key is not None else mod_container.maxKey()
+            except ValueError:  # Empty, or nothing at or below max
+                return
+            if min_time_key is not None and time_key < min_time_key:
+                return
+            yield time_key, mod_container[time_key]
+            max_time_key = time_key - 1
+
+    def get_change(self, obj_id):
+        return self._container.get(obj_id)
+
 
 def _set_of_usernames_from_named_lazy_set_of_wrefs(obj, name):
     result = set()
@@ -365,6 +570,44 @@ def _remove_entity_from_named_lazy_set_of_wrefs(self, name, entity):
         sets.discard(container, wref)
 
 
+class _ContainerVersions(persistent.Persistent):
+    """
+    Version stamps for the data a sharing target holds: one for each
+    container, one for its sharing relationships (which affect every
+    container) and one that changes with any of them. Each is a
+    :class:`BTrees.Length.Length` so that concurrent changes don't
+    conflict.
+    """
+
+    family = BTrees.family64
+
+    def __init__(self):
+        self._containers = self.family.OO.BTree()
+        self._relationships = Length()
+        self._all = Length()
+
+    def changed(self, containerId=None):
+        if containerId is None:
+            self._relationships.change(1)
+        else:
+            length = self._containers.get(containerId)
+            if length is None:
+                self._containers[containerId] = Length(1)
+            else:
+                length.change(1)
+        self._all.change(1)
+
+    def version(self, containerId=None):
+        if containerId is None:
+            return self._all()
+        length = self._containers.get(containerId)
+        # Both only ever increase, so the sum changes when either does
+        return (length() if length is not None else 0) + self._relationships()
+
+    def relationships_version(self):
+        return self._relationships()
+
+
 class _SharingContextCache(object):
     """
     Provisional API to enable some caching to happen
@@ -379,6 +622,9 @@ class _SharingContextCache(object):
         self.lastModified = 0
         self.communities_followed = None
         self.persons_followed = None
+        #: The number of change objects read out of stream
+        #: containers while answering stream requests.
+        self.changes_loaded = 0
 
     def updateLastModIfGreater(self, t):
         self.lastModified = max(self.lastModified, t)
@@ -533,6 +779,49 @@ class SharingTargetMixin(object):
         locate(result, self, 'containers_of_muted')
         return result
 
+    #: A :class:`_ContainerVersions`, created the first time
+    #: something changes.
+    _container_versions = None
+
+    def _noteContainerChanged(self, containerId=None):
+        """
+        Record that the data we hold for `containerId` changed or, if
+        no container is given, that our sharing relationships did.
+        """
+        versions = self._container_versions
+        if versions is None:
+            versions = self._container_versions = _ContainerVersions()
+            if getattr(self, '_p_jar', None) is not None:
+                self._p_jar.add(versions)
+        versions.changed(containerId)
+
+    def getContainerVersion(self, containerId=None):
+        """
+        Return a number that increases whenever the data we hold for
+        `containerId` (our own, shared with us or in our stream)
+        changes. If no container is given, it increases when any of it
+        does.
+        """
+        versions = self._container_versions
+        return versions.version(containerId) if versions is not None else 0
+
+    def getRelationshipsVersion(self):
+        """
+        Return a number that increases whenever our sharing
+        relationships (e.g., memberships) change, which can change
+        what we may read of the data held by others.
+        """
+        versions = self._container_versions
+        return versions.relationships_version() if versions is not None else 0
+
+    def getReadableContainerVersion(self, containerId=None):
+        """
+        Return a value that changes whenever the data we can read for
+        `containerId` (or for any container) changes. Cheap enough to
+        compare before doing any of the reading.
+        """
+        return ((self.username, self.getContainerVersion(containerId)),)
+
     def _lazy_create_ootreeset_for_wref(self):
         self._p_changed = True
         result = OOTreeSet()
@@ -613,6 +902,7 @@ class SharingTargetMixin(object):
 
         # Now move over anything that is muted
         self.__manage_mute()
+        self._noteContainerChanged()
 
     def unmute_conversation(self, root_ntiid_oid):
         if '_muted_oids' not in self.__dict__ or root_ntiid_oid is None:
@@ -623,6 +913,7 @@ class SharingTargetMixin(object):
         if sets.discard_p(self._muted_oids, root_ntiid_oid):
             # Now unmute anything required
             self.__manage_mute(mute=False)
+            self._noteContainerChanged()
 
     def is_muted(self, the_object):
         if IMutedInStream.providedBy(the_object):
@@ -686,6 +977,7 @@ class SharingTargetMixin(object):
         )
         # pylint: disable=no-member
         self._entities_accepted.add(wref)
+        self._noteContainerChanged()
         return True
 
     def stop_accepting_shared_data_from(self, source):
@@ -694,6 +986,7 @@ class SharingTargetMixin(object):
         _remove_entity_from_named_lazy_set_of_wrefs(
             self, '_entities_accepted', source
         )
+        self._noteContainerChanged()
         return True
 
     @property
@@ -726,6 +1019,7 @@ class SharingTargetMixin(object):
         )
         # pylint: disable=no-member
         self._entities_not_accepted.add(wref)
+        self._noteContainerChanged()
         return True
 
     def stop_ignoring_shared_data_from(self, source):
@@ -734,6 +1028,7 @@ class SharingTargetMixin(object):
         _remove_entity_from_named_lazy_set_of_wrefs(
             self, '_entities_not_accepted', source
         )
+        self._noteContainerChanged()
         return True
 
     def reset_shared_data_from(self, source):
@@ -751,6 +1046,7 @@ class SharingTargetMixin(object):
         wref = IWeakRef(source)
         for k in ("_entities_accepted", '_entities_not_accepted'):
             _remove_entity_from_named_lazy_set_of_wrefs(self, k, wref)
+        self._noteContainerChanged()
 
     def reset_all_shared_data(self):
         """
@@ -767,6 +1063,7 @@ class SharingTargetMixin(object):
         if '_entities_not_accepted' in self.__dict__:
             # pylint: disable=no-member,
             self._entities_not_accepted.clear()
+            self._noteContainerChanged()
 
     def reset_accepted_shared_data(self):
         """
@@ -775,6 +1072,7 @@ class SharingTargetMixin(object):
         if '_entities_accepted' in self.__dict__:
             # pylint: disable=no-member,
             self._entities_accepted.clear()
+            self._noteContainerChanged()
 
     @property
     # @deprecate("Prefer `entities_ignoring_shared_data_from`")
@@ -917,7 +1215,63 @@ class SharingTargetMixin(object):
             containerId, context_cache=context_cache
         )
 
-        for stream_container in stream_containers:
+        minAge = minAge if minAge is not None and minAge > 0 else None
+        maxAge = before if before is not None and before > 0 else None
+
+        def accept(change, _container_predicate):
+            if change is None:
+                return
+            context_cache.changes_loaded += 1
+            # If the heap is full, and this item is older than the oldest thing in the
+            # heap, no need to look any further
+            try:
+                change_lastModified = change.lastModified
+                if (   (minAge is not None and change_lastModified < minAge)
+                    or (before != -1 and change_lastModified >= before)):
+                    return
+            except KeyError:  # pragma: no cover
+                logger.warning("POSKeyError in stream %s", containerId)
+                return
+
+            if len(accumulator) == maxCount and change_lastModified <= accumulator[0][0]:
+                return
+
+            data = change.object
+            if data is None or context_cache._has_seen_object(data):
+                return
+
+            change_creator = change.creator
+            if (   not change.creator
+                or self.is_ignoring_shared_data_from(change_creator)
+                or IDeletedObjectPlaceholder.providedBy(data)
+                or self.is_muted(data)):
+                return
+
+            if _container_predicate is not None and not _container_predicate(change):
+                return
+
+            # Last, if the user supplied a predicate, try it.
+            if predicate is not None and not predicate(change):
+                return
+
+            # Yay, we got one
+            context_cache._note_seen_object(data)
+            context_cache.updateLastModIfGreater(change_lastModified)
+
+            heaped = (change_lastModified, change)
+            if not accumulator:  # starting out
+                accumulator.append(heaped)
+            elif len(accumulator) < maxCount:  # growing the heap
+                heapq_heappush(accumulator, heaped)
+            else:  # heap full, we may or may not have something newer
+                heapq_heappushpop(accumulator, heaped)
+
+        # Containers that can be walked newest-first by their time keys
+        # are merged together, k-way. Each entry in the merge heap is
+        # (-time_key, index, obj_id, key_iterator, container, predicate);
+        # the unique index keeps the comparison from going further.
+        merge_heap = []
+        for index, stream_container in enumerate(stream_containers):
             if () == stream_container:
                 continue
             _container_predicate = None
@@ -925,65 +1279,50 @@ class SharingTargetMixin(object):
                 _container_predicate = stream_container[1]
                 stream_container = stream_container[0]
 
+            if hasattr(stream_container, 'iter_time_keys'):
+                time_keys = stream_container.iter_time_keys(minAge, maxAge)
+                for time_key, obj_id in time_keys:
+                    merge_heap.append((-time_key, index, obj_id, time_keys,
+                                       stream_container, _container_predicate))
+                    break
+                continue
+
             if hasattr(stream_container, 'iter_between'):
-                minAge = minAge if minAge is not None and minAge > 0 else None
-                maxAge = before if before is not None and before > 0 else None
                 # Once the heap is full, we can start efficiently looking at only the newer
                 # changes (not even loading them from the database), if the container supports it.
-                # We can also do this upon request
+                container_min_age = minAge
                 if len(accumulator) >= maxCount:
-                    minAge = accumulator[0][0]
-
+                    container_min_age = accumulator[0][0]
                 stream_container = stream_container.iter_between(
-                    minAge, maxAge
+                    container_min_age, maxAge
                 )
 
             for change in stream_container:
-                if change is None:
-                    continue
-                # If the heap is full, and this item is older than the oldest thing in the
-                # heap, no need to look any further
-                try:
-                    change_lastModified = change.lastModified
-                    if (   (minAge is not None and change_lastModified < minAge)
-                        or (before != -1 and change_lastModified >= before)):
-                        continue
-                except KeyError:  # pragma: no cover
-                    logger.warning("POSKeyError in stream %s", containerId)
-                    continue
-
-                if len(accumulator) == maxCount and change_lastModified <= accumulator[0][0]:
-                    continue
-
-                data = change.object
-                if data is None or context_cache._has_seen_object(data):
-                    continue
-
-                change_creator = change.creator
-                if (   not change.creator
-                    or self.is_ignoring_shared_data_from(change_creator)
-                    or IDeletedObjectPlaceholder.providedBy(data)
-                    or self.is_muted(data)):
-                    continue
-
-                if _container_predicate is not None and not _container_predicate(change):
-                    continue
-
-                # Last, if the user supplied a predicate, try it.
-                if predicate is not None and not predicate(change):
-                    continue
-
-                # Yay, we got one
-                context_cache._note_seen_object(data)
-                context_cache.updateLastModIfGreater(change_lastModified)
-
-                heaped = (change_lastModified, change)
-                if not accumulator:  # starting out
-                    accumulator.append(heaped)
-                elif len(accumulator) < maxCount:  # growing the heap
-                    heapq_heappush(accumulator, heaped)
-                else:  # heap full, we may or may not have something newer
-                    heapq_heappushpop(accumulator, heaped)
+                accept(change, _container_predicate)
+
+        heapq.heapify(merge_heap)
+        before_time_key = _time_to_64bit_int(maxAge) if maxAge else None
+        while merge_heap:
+            neg_time_key, index, obj_id, time_keys, stream_container, _container_predicate = merge_heap[0]
+            # Once the heap is full, stop as soon as nothing left in any
+            # container can be newer than the oldest item we are keeping.
+            # Nothing beyond this point has been loaded from the database.
+            if     len(accumulator) >= maxCount \
+                and -neg_time_key <= _time_to_64bit_int(accumulator[0][0]):
+                break
+
+            # The time keys are inclusive of `before`, but the results are not;
+            # skip such changes without loading them
+            if before_time_key is None or -neg_time_key < before_time_key:
+                accept(stream_container.get_change(obj_id), _container_predicate)
+
+            for time_key, obj_id in time_keys:
+                heapq_heapreplace(merge_heap,
+                                  (-time_key, index, obj_id, time_keys,
+                                   stream_container, _container_predicate))
+                break
+            else:
+                heapq_heappop(merge_heap)
 
         if result is not None and accumulator:
             # We aren't accumulating for later, and we found data
@@ -1011,6 +1350,7 @@ class SharingTargetMixin(object):
         """
         Should run in a transaction.
         """
+        self._noteContainerChanged(change.containerId or u'')
         # We hope to only get changes for objects shared with us, but
         # we double check to be sure--force causes us to take incoming
         # creations/shares anyway. DELETES must always go through, regardless
@@ -1100,6 +1440,7 @@ class SharingSourceMixin(SharingTargetMixin):
         """
         # pylint: disable=no-member
         if self._entities_followed.add(IWeakRef(source)):
+            self._noteContainerChanged()
             _znotify(EntityFollowingEvent(self, source))
             _znotify(FollowerAddedEvent(source, self))
         return True
@@ -1111,6 +1452,7 @@ class SharingSourceMixin(SharingTargetMixin):
         _remove_entity_from_named_lazy_set_of_wrefs(
             self, '_entities_followed', source
         )
+        self._noteContainerChanged()
         _znotify(StopFollowingEvent(self, source))
 
     @property
@@ -1146,6 +1488,7 @@ class SharingSourceMixin(SharingTargetMixin):
         # calls jar.readCurrent; returns whether it actually changed
         # pylint: disable=no-member
         if self._dynamic_memberships.add(wref):
+            self._noteContainerChanged()
             _znotify(StartDynamicMembershipEvent(self, dynamic_sharing_target))
 
     def record_no_longer_dynamic_member(self, dynamic_sharing_target):
@@ -1159,6 +1502,7 @@ class SharingSourceMixin(SharingTargetMixin):
         _remove_entity_from_named_lazy_set_of_wrefs(
             self, '_dynamic_memberships', dynamic_sharing_target
         )
+        self._noteContainerChanged()
         _znotify(StopDynamicMembershipEvent(self, dynamic_sharing_target))
 
     @property
@@ -1221,6 +1565,19 @@ class SharingSourceMixin(SharingTargetMixin):
     def _get_entities_followed_for_read(self):
         return _iterable_of_entities_from_named_lazy_set_of_wrefs(self, '_entities_followed')
 
+    def getReadableContainerVersion(self, containerId=None):
+        # We also read what's held by the communities we're
+        # a member of or follow (see getSharedContainer and
+        # _get_stream_cache_containers)
+        others = set(self._get_dynamic_sharing_targets_for_read())
+        others.update(x for x in self._get_entities_followed_for_read()
+                      if IDynamicSharingTarget.providedBy(x))
+        others.discard(self)
+        result = super(SharingSourceMixin, self).getReadableContainerVersion(containerId)
+        return result + tuple(sorted((x.username, x.getContainerVersion(containerId))
+                                     for x in others
+                                     if hasattr(x, 'getContainerVersion')))
+
     def _get_stream_cache_containers(self, containerId, context_cache=None):
         if context_cache is None:
             context_cache = _SharingContextCache()
@@ -1344,8 +1701,15 @@ class SharingSourceMixin(SharingTargetMixin):
         return result
 
 
+from zope.intid.interfaces import IIntIdAddedEvent
 from zope.intid.interfaces import IIntIdRemovedEvent
 
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from contentratings.interfaces import IObjectRatedEvent
+
+from nti.dataserver.interfaces import IContained
+
 
 @component.adapter(IDynamicSharingTarget, IIntIdRemovedEvent)
 def SharingSourceMixin_dynamicsharingtargetdeleted(target, unused_event):
@@ -1370,6 +1734,42 @@ def SharingSourceMixin_dynamicsharingtargetdeleted(target, unused_event):
                 entity.stop_following(target)
 
 
+def _note_container_changed(entity, contained):
+    note = getattr(entity, '_noteContainerChanged', None)
+    if callable(note):
+        note(getattr(contained, 'containerId', None) or u'')
+
+
+def _note_creator_container_changed(contained):
+    # Incoming changes are noted by the targets themselves
+    # (_noticeChange); the creator only notes its own
+    _note_container_changed(getattr(contained, 'creator', None), contained)
+
+
+@component.adapter(IContained, IIntIdAddedEvent)
+def _contained_object_added(contained, unused_event):
+    _note_creator_container_changed(contained)
+
+
+@component.adapter(IContained, IIntIdRemovedEvent)
+def _contained_object_removed(contained, unused_event):
+    _note_creator_container_changed(contained)
+
+
+@component.adapter(IContained, IObjectModifiedEvent)
+def _contained_object_modified(contained, unused_event):
+    _note_creator_container_changed(contained)
+
+
+@component.adapter(IContained, IObjectRatedEvent)
+def _contained_object_rated(contained, unused_event):
+    # Ratings change what everyone who can see the object sees,
+    # but aren't sent to them as changes
+    _note_creator_container_changed(contained)
+    for target in getattr(contained, 'sharingTargets', None) or ():
+        _note_container_changed(target, contained)
+
+
 class DynamicSharingTargetMixin(SharingTargetMixin):
     """
     Instances represent communities or collections (e.g., tags)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import assert_that
+
+import fudge
+import unittest
+
+from zope import component
+from zope import interface
+
+from zope.intid.interfaces import IIntIds
+
+from nti.dataserver import activitystream
+
+from nti.dataserver.activitystream import _enqueue_change_to_target
+from nti.dataserver.activitystream import _expand_change_targets
+
+from nti.dataserver.activitystream_job import StreamChangeFanOutJob
+
+from nti.dataserver.interfaces import ISharingTargetEntityIterable
+
+
+class _Entity(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return '<%s>' % self.name
+
+
+@interface.implementer(ISharingTargetEntityIterable)
+class _Group(_Entity):
+
+    def __init__(self, name, members):
+        super(_Group, self).__init__(name)
+        self.members = members
+
+    def __iter__(self):
+        return iter(self.members)
+
+
+class _Change(object):
+
+    type = 'Created'
+
+    def __init__(self, creator):
+        self.creator = creator
+        self.object = None
+
+
+class TestActivityStream(unittest.TestCase):
+
+    def _targets(self):
+        creator = _Entity('creator')
+        a, b, c = _Entity('a'), _Entity('b'), _Entity('c')
+        nested = _Group('nested', [b, creator, a])
+        group = _Group('group', [a, nested, c, b])
+        return creator, group, nested, a, b, c
+
+    def test_expand_change_targets(self):
+        creator, group, nested, a, b, c = self._targets()
+        change = _Change(creator)
+
+        accum = set()
+        targets = _expand_change_targets(group, change, accum)
+        # Depth first, once each, never the creator
+        assert_that(targets, contains(group, a, nested, b, c))
+        # Already seen targets are not expanded again
+        assert_that(_expand_change_targets(nested, change, accum), is_([]))
+
+    @fudge.patch('nti.dataserver.activitystream.notify',
+                 'nti.dataserver.activitystream.queue_stream_change_fanout')
+    def test_large_fanout_deferred(self, fake_notify, fake_queue):
+        creator, group, nested, a, b, c = self._targets()
+        change = _Change(creator)
+
+        notified = []
+        fake_notify.is_callable().calls(lambda event: notified.append(event.entity))
+        fake_queue.expects_call().with_args(change, [a, nested, b, c]).times_called(1)
+
+        old_threshold = activitystream.STREAM_FANOUT_DEFER_THRESHOLD
+        activitystream.STREAM_FANOUT_DEFER_THRESHOLD = 1
+        try:
+            # Only creations are deferred.
+            change.type = 'Modified'
+            _enqueue_change_to_target(group, change)
+            assert_that(notified, contains(group, a, nested, b, c))
+
+            del notified[:]
+            change.type = 'Created'
+            _enqueue_change_to_target(group, change)
+            assert_that(notified, contains(group))
+        finally:
+            activitystream.STREAM_FANOUT_DEFER_THRESHOLD = old_threshold
+
+    @fudge.patch('nti.dataserver.job.job.to_external_ntiid_oid',
+                 'nti.dataserver.job.job.getSite')
+    def test_fanout_job_keeps_intids(self, fake_oid, fake_site):
+        creator, group, nested, a, b, c = self._targets()
+        change = _Change(creator)
+        change.lastModified = 42
+
+        class Site(object):
+            __name__ = u'dataserver2'
+        fake_oid.is_callable().returns(u'tag:nextthought.com,2011-10:x-OID-0x01')
+        fake_site.is_callable().returns(Site())
+
+        class IntIds(object):
+            ids = {a: 3, b: 1, c: 2}
+            def queryId(self, obj):
+                return self.ids.get(obj)
+        intids = IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(intids, IIntIds)
+        self.addCleanup(gsm.unregisterUtility, intids, IIntIds)
+
+        job = StreamChangeFanOutJob(change, [a, nested, b, c, b])
+        # Sorted and once each; those without intids are left out
+        assert_that(job.job_kwargs['target_intids'], is_([1, 2, 3]))
+        assert_that(job.job_kwargs['change_time'], is_(42))
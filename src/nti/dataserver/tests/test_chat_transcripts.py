@@ -8,6 +8,7 @@ __docformat__ = "restructuredtext en"
 # pylint: disable=W0212,R0904
 
 from hamcrest import is_
+from hamcrest import none
 from hamcrest import contains
 from hamcrest import not_none
 from hamcrest import has_entry
@@ -17,6 +18,7 @@ from hamcrest import assert_that
 from nti.testing.matchers import validly_provides
 from nti.testing.matchers import verifiably_provides
 
+import json
 import unittest
 
 try:
@@ -201,3 +203,128 @@ class TestChatTranscriptEvents(unittest.TestCase):
 			with mock_db_trans():
 				assert_that(chat_transcripts.transcript_for_user_in_room(uname, str(meeting.ID)),
 							 has_length(MSG_COUNT))
+
+class TestTranscriptWriteBehindQueue(unittest.TestCase):
+
+	layer = SharedConfiguringTestLayer
+
+	@WithMockDS
+	def test_flush_only_removes_what_it_stored(self):
+		queue = chat_transcripts.RedisTranscriptWriteBehindQueue()
+		queue.batch_size = 2
+		queue._runner = lambda func, **unused_kwargs: func()
+		redis = queue._redis
+		entries = [json.dumps({'message': i}) for i in range(4)]
+		redis.rpush(queue.queue_name, *entries)
+		try:
+			def store(batch):
+				# Our lock expired, and another process stored and
+				# removed the batch meanwhile
+				redis.ltrim(queue.queue_name, len(batch), -1)
+			queue._store = store
+			assert_that(queue.flush(), is_(2))
+			# The next batch is still there to be stored
+			assert_that(redis.lrange(queue.queue_name, 0, -1), is_(entries[2:]))
+
+			stored = []
+			queue._store = stored.extend
+			assert_that(queue.flush(), is_(2))
+			assert_that(stored, is_([{'message': 2}, {'message': 3}]))
+			assert_that(redis.llen(queue.queue_name), is_(0))
+		finally:
+			redis.delete(queue.queue_name)
+
+	@WithMockDS
+	def test_queued_messages_are_read_and_flushed(self):
+		queue = chat_transcripts.RedisTranscriptWriteBehindQueue()
+		# Flush by hand
+		queue._ensure_flusher = lambda: None
+		def runner(func, **unused_kwargs):
+			with mock_db_trans():
+				return func()
+		queue._runner = runner
+
+		class MockChatserver(object):
+			def send_event_to_user(self, *args):
+				pass
+		chatserver = MockChatserver()
+
+		gsm = component.getGlobalSiteManager()
+		gsm.registerUtility(queue, chat_interfaces.ITranscriptWriteBehindQueue)
+		gsm.registerUtility(chatserver, chat_interfaces.IChatserver)
+		try:
+			user_list = ['user1@nextthought', 'user2@nextthought']
+			meeting = Meeting()
+			meeting.containerId = 'the_container'
+			meeting.add_occupant_names(user_list, broadcast=False)
+			with mock_db_trans() as conn:
+				conn.add(meeting)
+				meeting_intid = component.getUtility(zc_intid.IIntIds).register(meeting)
+				meeting.id = oids.to_external_ntiid_oid(meeting, None)
+				meeting_id = meeting.ID
+				storage_ids = {}
+				for uname in user_list:
+					users.User.create_user(username=uname)
+					storage_ids[uname] = chat_transcripts._transcript_ntiid(meeting, uname)
+
+				msg = MessageInfo()
+				msg.containerId = meeting_id
+				msg.recipients = list(user_list)
+				msg.Sender = user_list[0]
+				meeting.post_message(msg)
+				msg_id = msg.ID
+
+			def assert_transcripts(stored):
+				for uname in user_list:
+					with mock_db_trans():
+						user = users.User.get_user(uname)
+						storage = user.getContainedObject('the_container', storage_ids[uname])
+						assert_that(storage, is_(not_none()) if stored else is_(none()))
+
+						transcript = chat_transcripts.transcript_for_user_in_room(uname, meeting_id)
+						assert_that(transcript, has_length(1))
+						assert_that(transcript.get_message(msg_id), is_(not_none()))
+
+			# Not stored yet, but part of the transcripts
+			assert_transcripts(False)
+
+			assert_that(queue.flush(), is_(1))
+			assert_that(queue.flush(), is_(0))
+			assert_transcripts(True)
+
+			# Messages aren't queued until their transaction commits,
+			# so a flush while it's open can't lose them...
+			with mock_db_trans():
+				msg = MessageInfo()
+				msg.containerId = meeting_id
+				msg.recipients = list(user_list)
+				msg.Sender = user_list[0]
+				meeting = component.getUtility(zc_intid.IIntIds).getObject(meeting_intid)
+				meeting.post_message(msg)
+				msg_id = msg.ID
+				assert_that(queue.flush(), is_(0))
+			assert_that(queue.flush(), is_(1))
+			for uname in user_list:
+				with mock_db_trans():
+					transcript = chat_transcripts.transcript_for_user_in_room(uname, meeting_id)
+					assert_that(transcript, has_length(2))
+					assert_that(transcript.get_message(msg_id), is_(not_none()))
+
+			# ...and those that never commit are never queued
+			class Abort(Exception):
+				pass
+			try:
+				with mock_db_trans():
+					msg = MessageInfo()
+					msg.containerId = meeting_id
+					msg.recipients = list(user_list)
+					msg.Sender = user_list[0]
+					meeting = component.getUtility(zc_intid.IIntIds).getObject(meeting_intid)
+					meeting.post_message(msg)
+					raise Abort()
+			except Abort:
+				pass
+			assert_that(queue.flush(), is_(0))
+		finally:
+			gsm.unregisterUtility(queue, chat_interfaces.ITranscriptWriteBehindQueue)
+			gsm.unregisterUtility(chatserver, chat_interfaces.IChatserver)
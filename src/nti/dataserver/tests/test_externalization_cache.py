@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_property
+
+import unittest
+
+import transaction
+
+from persistent import Persistent
+
+from ZODB import DB
+
+from ZODB.MappingStorage import MappingStorage
+
+from zope import component
+from zope import interface
+
+from nti.testing.matchers import verifiably_provides
+
+from nti.dataserver.externalization_cache import ExternalizationCache
+
+from nti.dataserver.interfaces import IExternalizationCache
+from nti.dataserver.interfaces import IExternalizationCacheable
+from nti.dataserver.interfaces import ICacheableExternalDecorator
+
+from nti.externalization.interfaces import IExternalMappingDecorator
+
+
+@interface.implementer(IExternalizationCacheable)
+class _Cacheable(Persistent):
+    value = 1
+
+
+class _IDecorated(interface.Interface):
+    pass
+
+
+@interface.implementer(IExternalMappingDecorator)
+class _Decorator(object):
+
+    def __init__(self, context):
+        self.context = context
+
+    def decorateExternalMapping(self, context, mapping):
+        pass
+
+
+@interface.implementer(ICacheableExternalDecorator)
+class _CacheableDecorator(_Decorator):
+    pass
+
+
+class TestExternalizationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DB(MappingStorage())
+        self.tm = transaction.TransactionManager()
+        self.conn = self.db.open(self.tm)
+        self.obj = self.conn.root()['obj'] = _Cacheable()
+        self.tm.commit()
+        self.cache = ExternalizationCache()
+        self.calls = 0
+
+    def tearDown(self):
+        self.tm.abort()
+        self.conn.close()
+        self.db.close()
+
+    def _externalize(self, obj=None, audience=u'sjohnson', name=u''):
+        obj = self.obj if obj is None else obj
+
+        def factory():
+            self.calls += 1
+            return {'Value': obj.value, 'Items': [1, 2]}
+        return self.cache.externalize(obj, factory, name, audience)
+
+    def _subscribe(self, factory):
+        interface.alsoProvides(self.obj, _IDecorated)
+        self.tm.commit()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerSubscriptionAdapter(factory, (_IDecorated,),
+                                        IExternalMappingDecorator)
+        self.addCleanup(gsm.unregisterSubscriptionAdapter, factory,
+                        (_IDecorated,), IExternalMappingDecorator)
+
+    def test_provides(self):
+        assert_that(self.cache, verifiably_provides(IExternalizationCache))
+
+    def test_cached_until_serial_changes(self):
+        first = self._externalize()
+        second = self._externalize()
+        assert_that(self.calls, is_(1))
+        assert_that(second, is_(first))
+        assert_that(self.cache, has_property('hits', 1))
+        assert_that(self.cache, has_property('misses', 1))
+
+        # Each caller gets their own copy
+        second['Items'].append(3)
+        assert_that(self._externalize()['Items'], is_([1, 2]))
+
+        self.obj.value = 2
+        self.tm.commit()
+        assert_that(self._externalize()['Value'], is_(2))
+        assert_that(self.calls, is_(2))
+
+    def test_keyed_by_audience_and_name(self):
+        self._externalize()
+        self._externalize(audience=u'jason')
+        self._externalize(name=u'summary')
+        assert_that(self.calls, is_(3))
+        assert_that(self.cache, has_length(3))
+
+        # Without an audience, nothing is cached
+        self._externalize(audience=None)
+        self._externalize(audience=None)
+        assert_that(self.calls, is_(5))
+        assert_that(self.cache, has_property('misses', 3))
+
+    def test_not_cached_when_changed_or_uncommitted(self):
+        self.obj.value = 2
+        self._externalize()
+        self._externalize()
+        assert_that(self.calls, is_(2))
+
+        self.tm.abort()
+        new = self.conn.root()['new'] = _Cacheable()
+        self._externalize(new)
+        self._externalize(new)
+        assert_that(self.calls, is_(4))
+        assert_that(self.cache, has_length(0))
+
+    def test_not_cached_with_uncacheable_decorator(self):
+        self._subscribe(_Decorator)
+        self._externalize()
+        self._externalize()
+        assert_that(self.calls, is_(2))
+
+    def test_cached_with_cacheable_decorator(self):
+        self._subscribe(_CacheableDecorator)
+        self._externalize()
+        self._externalize()
+        assert_that(self.calls, is_(1))
+
+    def test_least_recently_used_discarded(self):
+        others = []
+        for i in range(3):
+            other = self.conn.root()[str(i)] = _Cacheable()
+            others.append(other)
+        self.tm.commit()
+
+        self._externalize()
+        self.cache.max_bytes = self.cache.bytes * 2
+        self._externalize(others[0])
+        # Used again, so it's kept
+        self._externalize()
+        self._externalize(others[1])
+        assert_that(self.cache, has_length(2))
+
+        self._externalize()
+        self._externalize(others[0])
+        assert_that(self.calls, is_(4))
+        assert_that(self.cache.bytes, is_(self.cache.max_bytes))
+
+    def test_clear(self):
+        self._externalize()
+        self.cache.clear()
+        assert_that(self.cache, has_length(0))
+        assert_that(self.cache.bytes, is_(0))
+        self._externalize()
+        assert_that(self.calls, is_(2))
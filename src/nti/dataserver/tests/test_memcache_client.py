@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+import gevent
+
+from nti.testing.matchers import verifiably_provides
+
+from nti.dataserver.interfaces import IMemcacheClient
+
+from nti.dataserver.memcache_client import PooledMemcacheClient
+
+
+class MockClient(object):
+
+    def __init__(self):
+        self.data = {}
+        self.disconnected = False
+
+    def get(self, key):
+        gevent.sleep()
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+        return True
+
+    def get_multi(self, keys):
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def disconnect_all(self):
+        self.disconnected = True
+
+
+class TestPooledMemcacheClient(unittest.TestCase):
+
+    def _makeOne(self, size=2):
+        return PooledMemcacheClient(['localhost:11211'], size=size,
+                                    client_factory=MockClient)
+
+    def test_provides(self):
+        assert_that(self._makeOne(), verifiably_provides(IMemcacheClient))
+
+    def test_clients_created_as_needed(self):
+        pool = self._makeOne()
+        assert_that(pool.free_count(), is_(2))
+
+        with pool._client() as client:
+            assert_that(pool.free_count(), is_(1))
+            client.set('key', 'value')
+        assert_that(pool.free_count(), is_(2))
+        assert_that(pool._clients, has_length(1))
+
+        # The free client is reused
+        with pool._client() as client2:
+            assert_that(client2, is_(same_instance(client)))
+        assert_that(pool.get('key'), is_('value'))
+        assert_that(pool.get_multi(['key', 'missing']), is_({'key': 'value'}))
+
+        pool.disconnect_all()
+        assert_that(client.disconnected, is_(True))
+
+    def test_blocks_when_exhausted(self):
+        pool = self._makeOne(size=1)
+        greenlets = [gevent.spawn(pool.get, 'key') for _ in range(3)]
+        gevent.joinall(greenlets)
+        assert_that([g.value for g in greenlets], is_([None, None, None]))
+        assert_that(pool._clients, has_length(1))
+        assert_that(pool.free_count(), is_(1))
+
+    def test_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self._makeOne(size=0)
@@ -8,6 +8,7 @@ from __future__ import unicode_literals, absolute_import, print_function
 from hamcrest import assert_that,  is_, none, is_not, has_property
 from hamcrest import has_length
 from hamcrest import contains
+from hamcrest import less_than
 
 import sys
 import time
@@ -105,6 +106,45 @@ class TestSessionService(mock_dataserver.DataserverLayerTest):
         assert_that( proxy, has_property( 'c_msg', none() ) )
 
 
+    def test_failed_cluster_message_rolled_back(self):
+        class DataManager(object):
+            # Records changes, which can be rolled back to a savepoint
+            def __init__(self):
+                self.changes = []
+                self.committed = None
+            def savepoint(self):
+                length = len(self.changes)
+                class Savepoint(object):
+                    def rollback(sp):
+                        del self.changes[length:]
+                return Savepoint()
+            def abort(self, txn): pass
+            def tpc_begin(self, txn): pass
+            def commit(self, txn): pass
+            def tpc_vote(self, txn): pass
+            def tpc_finish(self, txn):
+                self.committed = list(self.changes)
+            def tpc_abort(self, txn): pass
+            def sortKey(self):
+                return 'DataManager'
+
+        data_manager = DataManager()
+        class Proxy(object):
+            def change(self, value):
+                if not data_manager.changes:
+                    transaction.get().join(data_manager)
+                data_manager.changes.append(value)
+                if value == 'bad':
+                    raise ValueError(value)
+
+        self.session_service.set_proxy_session('1', Proxy())
+        try:
+            self.session_service._dispatch_incoming_cluster_msgs(
+                [('1', 'change', 'good'), ('1', 'change', 'bad'), ('1', 'change', 'fine')])
+        finally:
+            self.session_service.set_proxy_session('1')
+        assert_that(data_manager.committed, contains('good', 'fine'))
+
     @WithMockDSTrans
     def test_create_delete_session(self):
         session = self.session_service.create_session( watch_session=False )
@@ -142,6 +182,68 @@ class TestSessionService(mock_dataserver.DataserverLayerTest):
         # XXX: Continuing the ugly hack, restore the old transaction.
         transaction.manager.manager._txn = tx
 
+    def test_write_buffer_coalesces(self):
+        class Pipeline(object):
+            def __init__(self):
+                self.calls = []
+            def __getattr__(self, name):
+                return lambda *args: self.calls.append((name,) + args)
+
+        pipe = Pipeline()
+        class Redis(object):
+            def pipeline(self):
+                return pipe
+
+        write_buffer = sessions._RedisWriteBuffer()
+        write_buffer.rpush('q1', b'a')
+        write_buffer.rpush('q2', b'b')
+        write_buffer.rpush('q1', b'c')
+        write_buffer.publish('chan', ['1', b'name', b'x'])
+        write_buffer.publish('chan', ['2', b'name', b'y'])
+        write_buffer.publish('other', ['3', b'name', b'z'])
+        write_buffer.execute(Redis(), 42)
+
+        # By default, every message is published by itself, in the
+        # format older versions read
+        def old_format(msg):
+            return sessions.pickle.dumps(msg, sessions.pickle.HIGHEST_PROTOCOL)
+        published = [x[1:] for x in pipe.calls if x[0] == 'publish']
+        assert_that(published, is_([('chan', old_format(['1', b'name', b'x'])),
+                                    ('chan', old_format(['2', b'name', b'y'])),
+                                    ('other', old_format(['3', b'name', b'z']))]))
+
+        del pipe.calls[:]
+        write_buffer.execute(Redis(), 42, envelopes=True)
+
+        assert_that(pipe.calls[:4], is_([('rpush', 'q1', b'a', b'c'),
+                                         ('expire', 'q1', 42),
+                                         ('rpush', 'q2', b'b'),
+                                         ('expire', 'q2', 42)]))
+        assert_that(pipe.calls[-1], is_(('execute',)))
+
+        published = {x[1]: sessions._unpack_cluster_msgs(x[2]) for x in pipe.calls[4:6]}
+        assert_that(published['chan'], is_([['1', b'name', b'x'], ['2', b'name', b'y']]))
+        # Single messages still go out in the old format.
+        assert_that(published['other'], is_((['3', b'name', b'z'],)))
+
+    def test_cluster_msg_envelopes(self):
+        msg = ['1', b'queue_message_to_client', b'x']
+        # The old format, a single pickled message
+        old_data = sessions.pickle.dumps(msg, sessions.pickle.HIGHEST_PROTOCOL)
+        assert_that(sessions._pack_cluster_msgs([msg]), is_(old_data))
+        assert_that(sessions._unpack_cluster_msgs(old_data), is_((msg,)))
+
+        msgs = [msg, ['2', b'queue_message_to_client', b'y']]
+        assert_that(sessions._unpack_cluster_msgs(sessions._pack_cluster_msgs(msgs)),
+                    is_(msgs))
+
+        # Large envelopes are compressed
+        msgs = [[str(i), b'queue_message_to_client', b'x' * 100] for i in range(100)]
+        data = sessions._pack_cluster_msgs(msgs)
+        assert_that(data.startswith(sessions._COMPRESSED_ENVELOPE_PREFIX), is_(True))
+        assert_that(len(data), is_(less_than(len(sessions.pickle.dumps(msgs, sessions.pickle.HIGHEST_PROTOCOL)))))
+        assert_that(sessions._unpack_cluster_msgs(data), is_(msgs))
+
     @WithMockDSTrans
     def test_clear_disconnect_timeout(self):
         session = self.session_service.create_session( watch_session=False )
@@ -150,6 +252,29 @@ class TestSessionService(mock_dataserver.DataserverLayerTest):
         self.session_service.clear_disconnect_timeout( session.session_id, 42 )
         assert_that( self.session_service.get_last_heartbeat_time( session.session_id ), is_( 42 ) )
 
+    @WithMockDSTrans
+    def test_sessions_without_recent_heartbeat(self):
+        service = self.session_service
+        service.clear_disconnect_timeout('alive')
+        service.clear_disconnect_timeout('stale',
+                                         time.time() - service.session_heartbeat_timeout - 1)
+
+        assert_that(service._sessions_without_recent_heartbeat(['alive', 'stale', 'new']),
+                    is_(['stale', 'new']))
+        assert_that(service._sessions_without_recent_heartbeat([]), is_([]))
+
+    @WithMockDSTrans
+    def test_disconnecting_sessions_with_recent_heartbeat(self):
+        service = self.session_service
+        service.clear_disconnect_timeout('alive')
+        service.clear_disconnect_timeout('disconnecting')
+        service.mark_session_disconnecting('disconnecting')
+
+        # Heartbeats may keep arriving after the session disconnects;
+        # it still needs to be checked
+        assert_that(service._sessions_without_recent_heartbeat(['alive', 'disconnecting']),
+                    is_(['disconnecting']))
+
     @WithMockDSTrans
     def test_old_sessions_cleaned_up(self):
         session = self.session_service.create_session(watch_session=False)
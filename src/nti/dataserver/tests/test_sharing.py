@@ -24,9 +24,16 @@ import fudge
 import time
 import persistent
 
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+
+from nti.dataserver.interfaces import IStreamCacheRetentionPolicy
+
 
 from nti.dataserver.sharing import _SharedStreamCache as StreamCache
 from nti.dataserver.sharing import SharingTargetMixin
+from nti.dataserver.sharing import StreamCacheRetentionPolicy
 from nti.dataserver.sharing import _SharingContextCache
 
 class Change(persistent.Persistent):
@@ -96,6 +103,97 @@ class TestStreamSharedCache(unittest.TestCase):
 			assert_that( keys(), has_item( i.id ) )
 
 
+	@fudge.patch( 'nti.dataserver.sharing._getId' )
+	def test_length_counters(self, fake_getId):
+		def getId( obj, default=None ):
+			return obj.id
+		fake_getId.is_callable().calls( getId )
+
+		cache = StreamCache()
+		cache.stream_cache_size = 3
+
+		changes = []
+		for i in range(5):
+			c = Change(); c.id = i; c.lastModified = i + 1
+			changes.append( c )
+			cache.addContainedObject( c )
+
+		def lengths():
+			return (cache._container_lengths['foo'](),
+					cache._modified_lengths['foo']())
+
+		assert_that( cache.getContainer( 'foo' ), has_length( 3 ) )
+		assert_that( lengths(), is_( (3, 3) ) )
+
+		# Replacing an object's change does not grow the container
+		c42 = Change(); c42.id = 4; c42.lastModified = 10
+		cache.addContainedObject( c42 )
+		assert_that( cache.getContainer( 'foo' ), has_length( 3 ) )
+		assert_that( lengths(), is_( (3, 3) ) )
+
+		cache.deleteEqualContainedObject( c42 )
+		assert_that( cache.getContainer( 'foo' ), has_length( 2 ) )
+		assert_that( lengths(), is_( (2, 2) ) )
+
+		# Deleting something missing changes nothing
+		cache.deleteEqualContainedObject( changes[0] )
+		assert_that( lengths(), is_( (2, 2) ) )
+
+		# Instances from before the counters existed are backfilled
+		del cache._container_lengths
+		del cache._modified_lengths
+		assert_that( cache.getContainer( 'foo' ), has_length( 2 ) )
+		assert_that( cache.backfill_lengths(), is_( 1 ) )
+		assert_that( lengths(), is_( (2, 2) ) )
+
+		cache.clearContainer( 'foo' )
+		assert_that( cache._container_lengths.get( 'foo' ), is_( None ) )
+
+	@fudge.patch( 'nti.dataserver.sharing._getId' )
+	def test_compact(self, fake_getId):
+		def getId( obj, default=None ):
+			return obj.id
+		fake_getId.is_callable().calls( getId )
+
+		cache = StreamCache()
+		cache.stream_cache_size = 10
+		for i in range(5):
+			c = Change(); c.id = i; c.lastModified = i + 1
+			cache.addContainedObject( c )
+		c = Change(); c.id = 5; c.lastModified = 100; c.containerId = 'bar'
+		cache.addContainedObject( c )
+
+		class IntIds(object):
+			missing = ()
+			def queryObject(self, obj_id):
+				return None if obj_id in self.missing else obj_id
+		intids = IntIds()
+		gsm = component.getGlobalSiteManager()
+		gsm.registerUtility( intids, IIntIds )
+		try:
+			# Nothing expires by default
+			assert_that( cache.compact( now=1000 ), is_( 0 ) )
+
+			intids.missing = (3,)
+			cache.stream_cache_size = 3
+			gsm.registerUtility( StreamCacheRetentionPolicy( max_age=500 ),
+								 IStreamCacheRetentionPolicy )
+			# At time 502, the changes modified before time 2 are expired,
+			# and there can only be 3 changes in 'foo'; the change for 3
+			# has also gone missing.
+			assert_that( cache.compact( now=502 ), is_( 3 ) )
+			assert_that( list( cache.getContainer( 'foo' ) ),
+						 is_( [cache._containers['foo'][2], cache._containers['foo'][4]] ) )
+			assert_that( cache._container_lengths['foo'](), is_( 2 ) )
+			assert_that( cache.getContainer( 'bar' ), has_length( 1 ) )
+
+			# Later, everything has expired and the empty containers are gone
+			assert_that( cache.compact( now=1000 ), is_( 3 ) )
+			assert_that( list( cache.keys() ), is_( [] ) )
+		finally:
+			gsm.unregisterUtility( intids, IIntIds )
+			gsm.unregisterUtility( provided=IStreamCacheRetentionPolicy )
+
 	def test_muted_none_container_id( self ):
 		class SharingTarget(SharingTargetMixin,persistent.Persistent): pass
 		sharingtarget = SharingTarget()
@@ -179,3 +277,79 @@ class TestStreamSharedCache(unittest.TestCase):
 		assert_that( result[0], has_property( 'id', before_id - 1 ) )
 		expected = list( reversed( all_changes[290:300] ) )
 		assert_that( result, is_( expected ) )
+
+	@time_monotonically_increases
+	@fudge.patch( 'nti.dataserver.sharing._getId' )
+	def test_stream_merge_loads_only_needed(self, fake_getId):
+		def getId( obj, default=None ):
+			return obj.id
+		fake_getId.is_callable().calls( getId )
+
+		# Several caches, as if from communities we follow, merged together
+		caches = [StreamCache() for _ in range(5)]
+		class SharingTarget(SharingTargetMixin,persistent.Persistent):
+			def _get_stream_cache_containers(self, containerId, context_cache=None):
+				return [c.getContainer( containerId, () ) for c in caches]
+		sharingtarget = SharingTarget()
+		sharingtarget.username = 'foo@bar'
+
+		all_changes = [] # from oldest to newest
+		for i in range(100):
+			change = Change()
+			change.id = i
+			change.lastModified = time.time()
+			change.creator = 'me'
+			all_changes.append( change )
+			cache = caches[i % len(caches)]
+			cache.stream_cache_size = 100
+			cache.addContainedObject( change )
+
+		context_cache = _SharingContextCache()
+		result = sharingtarget.getContainedStream( 'foo', maxCount=10,
+												   context_cache=context_cache )
+		assert_that( result, is_( list(reversed(all_changes[90:])) ) )
+		# Nothing older than the tenth item was loaded
+		assert_that( context_cache.changes_loaded, is_( 10 ) )
+
+		# Paging backwards is the same
+		context_cache = _SharingContextCache()
+		result = sharingtarget.getContainedStream( 'foo', maxCount=10,
+												   before=all_changes[50].lastModified,
+												   context_cache=context_cache )
+		assert_that( result, is_( list(reversed(all_changes[40:50])) ) )
+		assert_that( context_cache.changes_loaded, is_( 10 ) )
+
+		# Rejected items do not count against the page
+		context_cache = _SharingContextCache()
+		result = sharingtarget.getContainedStream( 'foo', maxCount=10,
+												   context_cache=context_cache,
+												   predicate=lambda c: c.id % 2 )
+		assert_that( result, has_length( 10 ) )
+		assert_that( result[0], has_property( 'id', 99 ) )
+		assert_that( context_cache.changes_loaded, is_( 19 ) )
+
+class TestContainerVersions(unittest.TestCase):
+
+	def test_versions(self):
+		class SharingTarget(SharingTargetMixin,persistent.Persistent):
+			username = 'target'
+		target = SharingTarget()
+		assert_that( target.getContainerVersion( 'foo' ), is_( 0 ) )
+		assert_that( target.getContainerVersion(), is_( 0 ) )
+		assert_that( target.getRelationshipsVersion(), is_( 0 ) )
+
+		target._noteContainerChanged( 'foo' )
+		assert_that( target.getContainerVersion( 'foo' ), is_( 1 ) )
+		assert_that( target.getContainerVersion( 'bar' ), is_( 0 ) )
+		assert_that( target.getContainerVersion(), is_( 1 ) )
+		assert_that( target.getRelationshipsVersion(), is_( 0 ) )
+
+		# Relationships affect every container
+		target._noteContainerChanged()
+		assert_that( target.getContainerVersion( 'foo' ), is_( 2 ) )
+		assert_that( target.getContainerVersion( 'bar' ), is_( 1 ) )
+		assert_that( target.getContainerVersion(), is_( 2 ) )
+		assert_that( target.getRelationshipsVersion(), is_( 1 ) )
+
+		assert_that( target.getReadableContainerVersion( 'foo' ),
+					 is_( (('target', 2),) ) )
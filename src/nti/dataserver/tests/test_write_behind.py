@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+
+import unittest
+
+from zope import component
+
+from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IWriteBehindQueue
+
+from nti.dataserver.tests import mock_redis
+
+from nti.dataserver.write_behind import AbstractRedisWriteBehindQueue
+from nti.dataserver.write_behind import _close_write_behind_queues
+
+
+class _Queue(AbstractRedisWriteBehindQueue):
+
+    lock_name = 'test/write_behind/Lock'
+    job_name = u'test_write_behind'
+
+    def __init__(self):
+        super(_Queue, self).__init__()
+        self.batches = []
+
+    def _flush_batch(self, redis):
+        self.batches.append(redis.get(self.lock_name) is not None)
+        return 1
+
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        gsm = component.getGlobalSiteManager()
+        self.redis = mock_redis.InMemoryMockRedis()
+        gsm.registerUtility(self.redis, IRedisClient)
+        self.queue = _Queue()
+        gsm.registerUtility(self.queue, IWriteBehindQueue, name=u'test')
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.redis, IRedisClient)
+        gsm.unregisterUtility(self.queue, IWriteBehindQueue, name=u'test')
+        self.queue.close()
+
+    def test_flush_holds_lock(self):
+        assert_that(self.queue.flush(), is_(1))
+        assert_that(self.queue.batches, is_([True]))
+        assert_that(self.redis.get(_Queue.lock_name), is_(none()))
+
+        # Someone else is flushing
+        lock = self.redis.lock(_Queue.lock_name, 60)
+        lock.acquire()
+        assert_that(self.queue.flush(), is_(0))
+        lock.release()
+
+    def test_closed_with_dataserver(self):
+        self.queue._ensure_flusher()
+        flusher = self.queue._flusher
+        _close_write_behind_queues(None)
+        assert_that(self.queue._flusher, is_(none()))
+        assert_that(flusher.dead, is_(True))
@@ -53,6 +53,7 @@ from nti.coremetadata.schema import ExtendedCompoundModeledContentBody
 
 from nti.dataserver.interfaces import InvalidData
 from nti.dataserver.interfaces import ILastModified
+from nti.dataserver.interfaces import IWriteBehindQueue
 from nti.dataserver.interfaces import checkCannotBeBlank
 from nti.dataserver.interfaces import FieldCannotBeOnlyWhitespace
 
@@ -1177,6 +1178,51 @@ class ICommunityPolicyManagementUtility(interface.Interface):
                               required=True)
 
 
+class ILastSeenWriteBehindQueue(IWriteBehindQueue):
+    """
+    A utility that records when users were last seen, overall and in
+    particular contexts, and stores those times on the users later,
+    in batches, instead of in the transaction of the request that saw
+    them.
+    """
+
+    def record(user, timestamp):
+        """
+        Record that the user was seen at the given time.
+
+        :return: True if the time was recorded, False if it could
+            not be, in which case the caller should store it now.
+        """
+
+    def record_contexts(user, context_ids, timestamp):
+        """
+        Record that the user processed the given contexts at the
+        given time.
+
+        :return: True if the times were recorded, False if they could
+            not be, in which case the caller should store them now.
+        """
+
+    def last_seen_time(username):
+        """
+        Return the last time recorded for the user that hasn't
+        been stored yet, or None.
+        """
+
+    def last_seen_times():
+        """
+        Return a mapping from username to the last time recorded for
+        the user that hasn't been stored yet, for all users.
+        """
+
+    def flush():
+        """
+        Store a batch of the recorded times, in one transaction.
+
+        :return: The number of times handled.
+        """
+
+
 class IPasswordChangedEvent(IObjectEvent):
     """
     Fired after an entity's password is changed
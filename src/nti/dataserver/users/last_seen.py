@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Storing when users were last seen after the requests that saw them.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import json
+
+from redis.exceptions import RedisError
+
+from zope import component
+from zope import interface
+
+from zope.event import notify
+
+from nti.coremetadata.interfaces import IContextLastSeenContainer
+from nti.coremetadata.interfaces import UserLastSeenUpdatedEvent
+
+from nti.dataserver.interfaces import IUser
+
+from nti.dataserver.users.interfaces import ILastSeenWriteBehindQueue
+
+from nti.dataserver.users.users import User
+
+from nti.dataserver.write_behind import AbstractRedisWriteBehindQueue
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _field(username, context_id=None):
+    return json.dumps([username, context_id])
+
+
+def _pending_last_seen_times(queue, request):
+    # Listings show many users, so read all the pending times once
+    try:
+        return request._v_nti_pending_last_seen_times
+    except AttributeError:
+        result = request._v_nti_pending_last_seen_times = queue.last_seen_times()
+        return result
+
+
+def get_last_seen_time(user, request=None):
+    """
+    Return the time the user was last seen, including any time
+    waiting in the :class:`.ILastSeenWriteBehindQueue`.
+
+    :keyword request: If given, the times waiting in the queue are
+        read once for this request, which is much cheaper when the
+        times of many users are needed.
+    """
+    result = user.lastSeenTime
+    queue = component.queryUtility(ILastSeenWriteBehindQueue)
+    if queue is not None:
+        if request is not None:
+            pending = _pending_last_seen_times(queue, request).get(user.username)
+        else:
+            pending = queue.last_seen_time(user.username)
+        if pending is not None and pending > result:
+            result = pending
+    return result
+
+
+@interface.implementer(ILastSeenWriteBehindQueue)
+class RedisLastSeenWriteBehindQueue(AbstractRedisWriteBehindQueue):
+    """
+    Keeps the latest time each user was seen, overall and in each
+    context, in a Redis hash, and stores them on the users, notifying
+    :class:`.UserLastSeenUpdatedEvent` (which updates the last seen
+    time index) there instead of in the request.
+
+    The flushing process moves the pending hash aside before storing
+    it, so times recorded meanwhile aren't lost.
+    """
+
+    pending_name = 'users/lastseen/pending'
+    flushing_name = 'users/lastseen/flushing'
+    lock_name = 'users/lastseen/Lock'
+
+    job_name = u'flush_last_seen_times'
+
+    def _record(self, fields, timestamp):
+        redis = self._redis
+        if redis is None:
+            return False
+        try:
+            redis.hmset(self.pending_name,
+                        {field: repr(float(timestamp)) for field in fields})
+        except RedisError:
+            logger.exception("Failed to record last seen times")
+            return False
+        self._ensure_flusher()
+        return True
+
+    def record(self, user, timestamp):
+        return self._record((_field(user.username),), timestamp)
+
+    def record_contexts(self, user, context_ids, timestamp):
+        fields = [_field(user.username, x) for x in context_ids or ()]
+        return self._record(fields, timestamp) if fields else True
+
+    def last_seen_time(self, username):
+        redis = self._redis
+        if redis is None:
+            return None
+        field = _field(username)
+        try:
+            values = redis.pipeline() \
+                          .hget(self.pending_name, field) \
+                          .hget(self.flushing_name, field) \
+                          .execute()
+        except RedisError:
+            logger.exception("Failed to read last seen times")
+            return None
+        values = [float(x) for x in values if x is not None]
+        return max(values) if values else None
+
+    def last_seen_times(self):
+        redis = self._redis
+        if redis is None:
+            return {}
+        try:
+            hashes = redis.pipeline() \
+                          .hgetall(self.flushing_name) \
+                          .hgetall(self.pending_name) \
+                          .execute()
+        except RedisError:
+            logger.exception("Failed to read last seen times")
+            return {}
+        result = {}
+        for values in hashes:
+            for field, value in values.items():
+                username, context_id = json.loads(field)
+                if context_id is None:
+                    value = float(value)
+                    if value > result.get(username, 0):
+                        result[username] = value
+        return result
+
+    def _store(self, entries):
+        users = {}
+        for (username, context_id), timestamp in entries:
+            user = users.get(username)
+            if user is None:
+                user = users[username] = User.get_user(username)
+            if not IUser.providedBy(user):
+                # Deleted since
+                continue
+            if context_id is None:
+                if user.update_last_seen_time(timestamp):
+                    notify(UserLastSeenUpdatedEvent(user))
+            else:
+                container = IContextLastSeenContainer(user, None)
+                if container is not None:
+                    container.append(context_id, timestamp)
+
+    def _flush_batch(self, redis):
+        # Whatever a failed flush left behind goes first
+        if not redis.exists(self.flushing_name):
+            if not redis.exists(self.pending_name):
+                return 0
+            redis.rename(self.pending_name, self.flushing_name)
+        fields = redis.hkeys(self.flushing_name)[:self.batch_size]
+        if not fields:
+            return 0
+        values = redis.hmget(self.flushing_name, fields)
+        entries = [(json.loads(field), float(value))
+                   for field, value in zip(fields, values)
+                   if value is not None]
+        self._runner(lambda: self._store(entries), job_name=self.job_name)
+        redis.hdel(self.flushing_name, *fields)
+        return len(fields)
@@ -46,6 +46,8 @@ from nti.dataserver.users.interfaces import IRestrictedUserProfile
 
 from nti.dataserver.users.entity import Entity
 
+from nti.dataserver.users.last_seen import get_last_seen_time
+
 from nti.externalization.externalization import toExternalObject
 from nti.externalization.externalization import decorate_external_mapping
 from nti.externalization.externalization import to_standard_external_dictionary
@@ -371,7 +373,8 @@ class _UserAdminSummaryExternalObject(_UserSummaryExternalObject):
 
     def _do_toExternalObject(self, **kwargs):
         extDict = super(_UserAdminSummaryExternalObject, self)._do_toExternalObject(**kwargs)
-        extDict['lastSeenTime'] = self.entity.lastSeenTime
+        extDict['lastSeenTime'] = get_last_seen_time(self.entity,
+                                                   get_current_request())
         extDict['lastLoginTime'] = self.entity.lastLoginTime
         return extDict
 UserAdminSummaryExternalObject = _UserAdminSummaryExternalObject
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+"""
+Apply the stream cache retention policy to the stream caches of
+all entities and their friends lists (including dynamic friends
+lists), removing expired changes and changes for objects that no
+longer exist.
+
+Compaction is meant to be run by operations (e.g., from cron) as
+a separate process; it walks every entity, and doing that from a
+job inside the application servers would compete with requests for
+the database and the connection caches.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.monkey import patch_relstorage_all_except_gevent_on_import
+patch_relstorage_all_except_gevent_on_import.patch()
+
+import os
+import sys
+import time
+import argparse
+
+from zope import component
+
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+from nti.dataserver.utils import run_with_dataserver
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _entity_usernames():
+    dataserver = component.getUtility(IDataserver)
+    return list(dataserver.users_folder.keys())
+
+
+def _stream_cache_owners(entity):
+    """
+    The entity and the friends lists it owns, which have their own
+    stream caches.
+    """
+    yield entity
+    friends_lists = getattr(entity, 'friendsLists', None)
+    if friends_lists is not None:
+        for friends_list in friends_lists.values():
+            yield friends_list
+
+
+def _compact_stream_cache(owner, now=None):
+    # Don't create a cache just to compact it
+    owner._p_activate()  # pylint: disable=protected-access
+    cache = owner.__dict__.get('streamCache')
+    if cache is not None and hasattr(cache, 'compact'):
+        return cache.compact(now=now)
+    return 0
+
+
+def _compact_stream_caches(usernames, now=None):
+    dataserver = component.getUtility(IDataserver)
+    users_folder = dataserver.users_folder
+    removed = 0
+    for username in usernames:
+        entity = users_folder.get(username)
+        if entity is None:
+            continue
+        for owner in _stream_cache_owners(entity):
+            removed += _compact_stream_cache(owner, now)
+    return removed
+
+
+def compact_stream_caches(batch_size=100):
+    """
+    Compact the stream caches of all entities and their friends
+    lists, committing after each `batch_size` entities to keep the
+    transactions small.
+
+    :return: The number of changes removed.
+    """
+    runner = component.getUtility(IDataserverTransactionRunner)
+    usernames = runner(_entity_usernames)
+    now = time.time()
+    removed = 0
+    for i in range(0, len(usernames), batch_size):
+        batch = usernames[i:i + batch_size]
+        removed += runner(lambda batch=batch: _compact_stream_caches(batch, now),
+                          retries=5, sleep=0.1)
+    logger.info("Removed %s stream change(s) for %s entities",
+                removed, len(usernames))
+    return removed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compact entity stream caches")
+    arg_parser.add_argument('-v', '--verbose', help="Be verbose",
+                            action='store_true', dest='verbose')
+    arg_parser.add_argument('-b', '--batch-size',
+                            dest='batch_size',
+                            type=int,
+                            default=100,
+                            help="The number of entities to compact in each transaction")
+    args = arg_parser.parse_args()
+
+    env_dir = os.getenv('DATASERVER_DIR')
+    if not env_dir or not os.path.exists(env_dir) and not os.path.isdir(env_dir):
+        raise IOError("Invalid dataserver environment root directory")
+
+    run_with_dataserver(environment_dir=env_dir,
+                        verbose=args.verbose,
+                        minimal_ds=True,
+                        use_transaction_runner=False,
+                        function=lambda: compact_stream_caches(args.batch_size))
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+from nti.dataserver.users.users import User
+
+from nti.dataserver.utils import nti_create_friendslist as nti_cfl
+
+from nti.dataserver.utils.nti_compact_stream_caches import _compact_stream_caches
+
+from nti.dataserver.tests import mock_dataserver
+
+from nti.testing.base import ConfiguringTestBase
+
+
+class _StreamCache(object):
+
+    def __init__(self, removed):
+        self.removed = removed
+        self.now = None
+
+    def compact(self, now=None):
+        self.now = now
+        return self.removed
+
+
+class TestCompactStreamCaches(ConfiguringTestBase):
+
+    set_up_packages = ('nti.dataserver',)
+
+    @mock_dataserver.WithMockDSTrans
+    def test_compacts_friends_lists(self):
+        ds = mock_dataserver.current_mock_ds
+        owner = User.create_user(ds, username=u'nt@nti.com', password=u'temp001')
+        friend = User.create_user(ds, username=u'friend@nti.com', password=u'temp001')
+        dfl = nti_cfl.create_friends_list(owner, u'dfl@nti.com', u'mydfl',
+                                          [friend.username], dynamic=True)
+
+        owner.__dict__['streamCache'] = _StreamCache(1)
+        dfl.__dict__['streamCache'] = _StreamCache(2)
+
+        removed = _compact_stream_caches([owner.username, friend.username,
+                                          u'missing@nti.com'],
+                                         now=42)
+        assert_that(removed, is_(3))
+        assert_that(dfl.streamCache.now, is_(42))
+        # No cache is created for entities without one
+        assert_that('streamCache' in friend.__dict__, is_(False))
+
+        del owner.__dict__['streamCache']
+        del dfl.__dict__['streamCache']
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Support for storing data recorded in Redis during requests in the
+database later, in batches.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import gevent
+
+from redis.exceptions import RedisError
+
+import transaction
+
+from zope import component
+from zope import interface
+
+from zope.cachedescriptors.property import Lazy
+
+from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IWriteBehindQueue
+from nti.dataserver.interfaces import IDataserverClosedEvent
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IWriteBehindQueue)
+class AbstractRedisWriteBehindQueue(object):
+    """
+    Base for utilities that keep data in Redis and store it in the
+    database on a greenlet, each batch in one transaction, so that
+    the requests producing the data don't write to (or conflict on)
+    the objects it belongs to.
+
+    One process at a time flushes, holding :attr:`lock_name`.
+    Subclasses implement :meth:`_flush_batch` to store a batch and
+    remove it from Redis only after its transaction commits, so
+    storing something twice (when a transaction is retried) must be
+    harmless.
+    """
+
+    lock_name = None
+
+    #: The job name given to the transaction runner
+    job_name = None
+
+    #: How long, in seconds, the flushing greenlet waits between
+    #: batches when it has stored everything.
+    flush_interval = 5.0
+
+    #: The most items we store in one transaction.
+    batch_size = 500
+
+    lock_timeout = 60
+
+    def __init__(self):
+        self._flusher = None
+
+    @property
+    def _redis(self):
+        return component.queryUtility(IRedisClient)
+
+    @Lazy
+    def _runner(self):
+        return component.getUtility(IDataserverTransactionRunner)
+
+    def _flush_batch(self, redis):
+        """
+        Store a batch, holding the lock.
+
+        :return: The number of items handled.
+        """
+        raise NotImplementedError()
+
+    def flush(self):
+        redis = self._redis
+        if redis is None:
+            return 0
+        lock = redis.lock(self.lock_name, self.lock_timeout)
+        if not lock.acquire(blocking=False):
+            # Someone else is flushing
+            return 0
+        try:
+            return self._flush_batch(redis)
+        finally:
+            try:
+                lock.release()
+            except RedisError:  # expired
+                pass
+
+    def _flush_loop(self):
+        while True:
+            gevent.sleep(self.flush_interval)
+            try:
+                while self.flush() >= self.batch_size:
+                    pass
+            except transaction.interfaces.TransientError:
+                # Try again later
+                logger.debug("Trying %s later", self.job_name, exc_info=True)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to run %s", self.job_name)
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.dead:
+            self._flusher = gevent.spawn(self._flush_loop)
+
+    def close(self):
+        if self._flusher is not None:
+            self._flusher.kill()
+            self._flusher = None
+
+
+@component.adapter(IDataserverClosedEvent)
+def _close_write_behind_queues(unused_event):
+    # Whatever hasn't been stored stays in Redis for the next flush
+    for queue in component.getAllUtilitiesRegisteredFor(IWriteBehindQueue):
+        queue.close()
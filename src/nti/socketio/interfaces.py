@@ -409,3 +409,13 @@ class ISocketSessionSettings(interface.Interface):
                                         description=u"How long a client is silent (no pings) before we consider them inactive",
                                         default=120,
                                         required=False)
+
+    SessionReaderMaxFramesPerTransaction = Int(title=u"Session reader frames per transaction",
+                                               description=u"The most frames already received from a websocket client that are read in one transaction",
+                                               default=1,
+                                               required=False)
+
+    SessionClusterMessageEnvelopes = Bool(title=u"Session cluster message envelopes",
+                                          description=u"Whether the messages for other nodes from one transaction are published together. Only enable once every node can read them.",
+                                          default=False,
+                                          required=False)
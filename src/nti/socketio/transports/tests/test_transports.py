@@ -3,6 +3,8 @@
 from hamcrest import (assert_that, is_, has_length, only_contains, has_property, has_item, has_entry,
 					  not_none)
 
+import time
+
 import gevent
 import transaction
 
@@ -156,6 +158,73 @@ class TestWebSocket(ConfiguringTestBase):
 		assert_that( session, has_property( 'killed', True ) )
 		assert_that( reader, has_property( 'run_loop', False ) )
 
+	@mock_dataserver.WithMockDS
+	def test_reader_batched(self):
+		class Socket(object):
+			protocol = protocol.SocketIOProtocolFormatter1()
+		class Session(object):
+			last_heartbeat_time = 0
+			connected = True
+			killed = False
+			heartbeats = 0
+			socket = Socket()
+			def __init__(self): self.messages = []
+			def kill(self):
+				self.killed = True
+			def heartbeat(self):
+				self.heartbeats += 1
+			def queue_message_from_client(self, msg):
+				self.messages.append(msg)
+		class Service(object):
+			session = None
+			loads = 0
+			def get_session( self, sid, **kwargs ):
+				self.loads += 1
+				return self.session
+
+		proxy = _WebsocketSessionEventProxy()
+		socket = WebSocket()
+		session = Session()
+		service = Service()
+		service.session = session
+
+		reader = _WebSocketReader( 1, proxy, service, (), socket )
+		reader.max_frames_per_transaction = 10
+		reader.heartbeat_update_time = 30
+
+		# Heartbeats that aren't recent are read, the last one only
+		socket.queue.put( b'2::' )
+		socket.queue.put( b'2::' )
+		greenlet = gevent.spawn( reader._run )
+		gevent.sleep( 0.1 )
+		assert_that( service, has_property( 'loads', 1 ) )
+		assert_that( reader, has_property( 'heartbeat_count', 2 ) )
+		assert_that( reader, has_property( 'transaction_count', 1 ) )
+		assert_that( session, has_property( 'heartbeats', 1 ) )
+
+		# Recent heartbeats alone don't load the session
+		reader.last_heartbeat_time = time.time()
+		socket.queue.put( b'2::' )
+		socket.queue.put( b'2::' )
+		gevent.sleep( 0.1 )
+		assert_that( service, has_property( 'loads', 1 ) )
+		assert_that( reader, has_property( 'heartbeat_count', 4 ) )
+
+		# Everything waiting is read in one transaction
+		socket.queue.put( b'2::' )
+		socket.queue.put( protocol.SocketIOProtocolFormatter1().make_event( 'foo' ) )
+		socket.queue.put( protocol.SocketIOProtocolFormatter1().make_event( 'bar' ) )
+		socket.queue.put( None )
+		greenlet.join( 1 )
+
+		assert_that( service, has_property( 'loads', 2 ) )
+		assert_that( reader, has_property( 'transaction_count', 2 ) )
+		assert_that( reader, has_property( 'frame_count', 5 ) )
+		assert_that( session, has_property( 'heartbeats', 2 ) )
+		assert_that( session.messages, has_length( 2 ) )
+		assert_that( session, has_property( 'killed', True ) )
+		assert_that( reader, has_property( 'run_loop', False ) )
+
 class MockSession(object):
 	heartbeat_is_transactional = False
 	socket = None
@@ -24,6 +24,8 @@ import transaction.interfaces
 
 import geventwebsocket.exceptions
 
+from perfmetrics import statsd_client
+
 from nti.dataserver.interfaces import IDataserver
 
 from nti.dataserver.sessions import SessionService
@@ -32,6 +34,8 @@ from nti.socketio import interfaces
 
 from nti.socketio.interfaces import ISocketSessionSettings
 
+from ._base import Empty
+from ._base import Queue
 from ._base import sleep
 from ._base import Greenlet
 from ._base import catch_all
@@ -119,11 +123,25 @@ class _WebSocketSender(_AbstractWebSocketOperator):
 
 class _WebSocketReader(_AbstractWebSocketOperator):
 	message = None
+	messages = ()
 
 	# Cache of some stuff from the session
 	last_heartbeat_time = 0
 	connected = False
 
+	#: When reading several frames per transaction, the most bytes of
+	#: frames we decode in one transaction.
+	max_bytes_per_transaction = 64 * 1024
+
+	#: When reading several frames per transaction, the longest we spend,
+	#: in seconds, collecting frames the client has already sent.
+	max_batch_time = 0.05
+
+	# Counters, also sent to statsd
+	transaction_count = 0
+	frame_count = 0
+	heartbeat_count = 0
+
 	@Lazy
 	def heartbeat_update_time(self):
 		settings = component.queryUtility(ISocketSessionSettings)
@@ -132,7 +150,19 @@ class _WebSocketReader(_AbstractWebSocketOperator):
 			result = self.session_service.session_heartbeat_timeout // 2
 		return result
 
+	@Lazy
+	def max_frames_per_transaction(self):
+		settings = component.queryUtility(ISocketSessionSettings)
+		result = getattr(settings, 'SessionReaderMaxFramesPerTransaction', None)
+		return result or 1
+
 	def _do_read(self):
+		return self._do_read_messages((self.message,))
+
+	def _do_read_batch(self):
+		return self._do_read_messages(self.messages)
+
+	def _do_read_messages(self, messages):
 		session = self.get_session()
 		if session is None:
 			# Kill the greenlet
@@ -141,54 +171,145 @@ class _WebSocketReader(_AbstractWebSocketOperator):
 
 		self.last_heartbeat_time = session.last_heartbeat_time
 		self.connected = session.connected
-		if self.message is None:
-			# Kill the greenlet
-			self.session_proxy.queue_message_to_client(None)
-			# and the session
-			safe_kill_session( session, 'on transfer of None across reading channel' )
-			return False
+		for message in messages:
+			if message is None:
+				# Kill the greenlet
+				self.session_proxy.queue_message_to_client(None)
+				# and the session
+				safe_kill_session( session, 'on transfer of None across reading channel' )
+				return False
 
-		try:
-			decode_packet_to_session( session, session.socket, self.message, doom_transaction=False )
-		except ValueError:
-			logger.exception( "Failed to read packets from websocket; killing session %s", self.session_id )
-			# Kill the greenlet
-			self.session_proxy.queue_message_to_client(None)
-			# We don't doom this transaction, we want to commit the death
-			# transaction.doom()
-			safe_kill_session( session, 'on failure to read packet from WS' )
-			return False
+			try:
+				decode_packet_to_session( session, session.socket, message, doom_transaction=False )
+			except ValueError:
+				logger.exception( "Failed to read packets from websocket; killing session %s", self.session_id )
+				# Kill the greenlet
+				self.session_proxy.queue_message_to_client(None)
+				# We don't doom this transaction, we want to commit the death
+				# transaction.doom()
+				safe_kill_session( session, 'on failure to read packet from WS' )
+				return False
 
 		return True
 
+	def _is_recent_heartbeat(self, message):
+		# This is tightly coupled to session implementation and lifetime. We send
+		# pings every 5s.
+		return	message == b"2::" \
+			and self.connected \
+			and self.last_heartbeat_time >= (time.time() - self.heartbeat_update_time)
+
+	def _record(self, frames, heartbeats=0):
+		if frames:
+			self.transaction_count += 1
+			self.frame_count += frames
+		self.heartbeat_count += heartbeats
+		client = statsd_client()
+		if client is not None:
+			if frames:
+				client.incr('nti.socketio.websocket.reader.transactions')
+				client.incr('nti.socketio.websocket.reader.frames', frames)
+			if heartbeats:
+				client.incr('nti.socketio.websocket.reader.heartbeats', heartbeats)
+
 	def _run(self):
 		try:
-			while self.run_loop:
-				sleep()
-				self.message = self.websocket.receive()
-
-				# This is tightly coupled to session implementation and lifetime. We send
-				# pings every 5s.
-				if 	  self.message == b"2::" \
-				  and self.connected \
-				  and self.last_heartbeat_time >= (time.time() - self.heartbeat_update_time):
-					continue
-
-				if not self.run_loop:
-					break
-
-				# Try for up to 2 seconds to receive this message. If it fails,
-				# drop it and wait for the next one. That's better than dying altogether, right?
-				try:
-					self.run_loop &= run_job_in_site( self._do_read, retries=20, sleep=0.1, site_names=self.session_originating_site_names )
-				except transaction.interfaces.TransientError:
-					logger.exception( "Failed to receive message (%s) from websocket; ignoring and continuing %s",
-									  self.message[0:50], self.session_id )
+			if self.max_frames_per_transaction > 1:
+				self._run_batched()
+			else:
+				self._run_single()
 		finally:
 			# Need to make sure we always send a signal to our sender to shut
 			# down in case we exist abnormally. Otherwise we'll leak greenlets.
 			self.session_proxy.client_queue.put_nowait(None)
 
+	def _run_single(self):
+		while self.run_loop:
+			sleep()
+			self.message = self.websocket.receive()
+
+			if self._is_recent_heartbeat(self.message):
+				continue
+
+			if not self.run_loop:
+				break
+
+			# Try for up to 2 seconds to receive this message. If it fails,
+			# drop it and wait for the next one. That's better than dying altogether, right?
+			try:
+				self.run_loop &= run_job_in_site( self._do_read, retries=20, sleep=0.1, site_names=self.session_originating_site_names )
+			except transaction.interfaces.TransientError:
+				logger.exception( "Failed to receive message (%s) from websocket; ignoring and continuing %s",
+								  self.message[0:50], self.session_id )
+
+	def _receive_frames(self, frames):
+		# Runs in its own greenlet, so that while we are in a transaction
+		# the frames the client sends are read and waiting for us.
+		try:
+			while True:
+				message = self.websocket.receive()
+				frames.put(message)
+				if message is None:
+					break
+		except Exception as e: # pylint:disable=broad-except
+			frames.put(e)
+
+	def _next_batch(self, frames):
+		batch = [frames.get()]
+		size = len(batch[0] or b'')
+		deadline = time.time() + self.max_batch_time
+		while	batch[-1] is not None \
+			and not isinstance(batch[-1], Exception) \
+			and len(batch) < self.max_frames_per_transaction \
+			and size < self.max_bytes_per_transaction \
+			and time.time() < deadline:
+			try:
+				frame = frames.get_nowait()
+			except Empty:
+				# Let the receiver read anything already buffered
+				sleep()
+				if frames.empty():
+					break
+				continue
+			batch.append(frame)
+			size += len(frame or b'')
+		return batch
+
+	def _run_batched(self):
+		frames = Queue()
+		receiver = Greenlet.spawn(self._receive_frames, frames)
+		try:
+			while self.run_loop:
+				sleep()
+				batch = self._next_batch(frames)
+				error = batch[-1] if isinstance(batch[-1], Exception) else None
+				if error is not None:
+					batch.pop()
+
+				heartbeats = [m for m in batch if m == b"2::"]
+				if batch and len(heartbeats) == len(batch):
+					# Heartbeats only. Like _run_single, we skip them
+					# until the last one we read in a transaction is
+					# no longer recent, and then read just the last one,
+					# which also notices if the session was killed.
+					self._record(0, len(heartbeats))
+					batch = () if self._is_recent_heartbeat(batch[-1]) else batch[-1:]
+
+				if batch and self.run_loop:
+					self.messages = batch
+					try:
+						self.run_loop &= run_job_in_site( self._do_read_batch, retries=20, sleep=0.1,
+														  site_names=self.session_originating_site_names )
+					except transaction.interfaces.TransientError:
+						logger.exception( "Failed to receive %s messages (%s) from websocket; ignoring and continuing %s",
+										  len(batch), (batch[0] or b'')[0:50], self.session_id )
+					self._record(len(batch))
+
+				if error is not None:
+					raise error
+		finally:
+			receiver.kill()
+
 class _WebSocketPinger(_AbstractWebSocketOperator):
 
 	def __init__(self, *args, **kwargs):